@@ -0,0 +1,170 @@
+"""
+Actor/learner self-play training for the neural AI
+
+N actor processes play self-play games with their own copy of the policy
+network and stream each game's transitions (packed bitboards, see
+modern_ai.ReplayBuffer) to the learner through a multiprocessing queue.
+The learner trains continuously and publishes its weights every
+`publish_every` steps into shared-memory tensors; actors pick up the new
+version between games.
+"""
+
+import queue
+import random
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from modern_ai import ModernOthelloAI, ReplayBuffer, SelfPlayTrainer
+
+
+def _actor_loop(worker_id, model_format, shared_weights, version, epsilon, lock, experiences, stop, seed):
+    """Worker process: play games with the latest published weights until stopped."""
+    from board import Board
+    from game import Game
+
+    torch.set_num_threads(1)
+    random.seed(seed + worker_id)
+    np.random.seed(seed + worker_id)
+    ai = ModernOthelloAI(inference_only=True, model_format=model_format[0], model_options=model_format[1])
+    ai.memory = ReplayBuffer(capacity=128)
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    seen = -1
+    while not stop.is_set():
+        if version.value != seen:
+            with lock:
+                ai.policy_net.load_state_dict(shared_weights)
+                seen = version.value
+                ai.epsilon = epsilon.value
+        ai.memory.pos = ai.memory.size = 0
+        winner, _ = trainer.play_game(training=True)
+        game = ai.memory.get(np.arange(len(ai.memory)))
+        while not stop.is_set():
+            try:
+                experiences.put((worker_id, winner, game), timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+
+class ActorLearnerTrainer:
+    """Train `ai` from self-play games generated by `num_workers` actor processes"""
+
+    def __init__(self, ai, num_workers=4, publish_every=50, queue_size=256, seed=0):
+        self.ai = ai
+        self.num_workers = num_workers
+        self.publish_every = publish_every
+        self.queue_size = queue_size
+        self.seed = seed
+        self.num_episodes = 0
+        self.total_wins_black = 0
+        self.total_wins_white = 0
+        self.total_draws = 0
+
+    def _receive(self, item):
+        _, winner, game = item
+        self.ai.memory.push_many(*game)
+        self.num_episodes += 1
+        if winner == 'B':
+            self.total_wins_black += 1
+        elif winner == 'W':
+            self.total_wins_white += 1
+        else:
+            self.total_draws += 1
+        # Same exploration schedule as SelfPlayTrainer.train: decay per game
+        self.ai.epsilon = max(0.01, self.ai.epsilon * 0.995)
+        return len(game[1])
+
+    def _publish(self):
+        with self.lock:
+            for name, tensor in self.ai.policy_net.state_dict().items():
+                self.shared_weights[name].copy_(tensor)
+            self.epsilon.value = self.ai.epsilon
+            self.version.value += 1
+
+    def train(self, seconds=None, steps=None, report_interval=10.0, save_interval=None, on_save=None):
+        """Run actors and learner until `seconds` elapse or `steps` train steps are done.
+
+        If given, on_save(episodes_done) is called every `save_interval` games.
+
+        Returns a stats dict with games/sec, samples/sec (transitions the
+        learner trained on) and learner utilisation (share of wall time
+        spent in train_step).
+        """
+        if seconds is None and steps is None:
+            raise ValueError("train() needs seconds or steps")
+        ctx = mp.get_context('spawn')
+        self.shared_weights = {name: tensor.detach().cpu().clone().share_memory_()
+                               for name, tensor in self.ai.policy_net.state_dict().items()}
+        self.version = ctx.Value('i', 0, lock=False)
+        self.epsilon = ctx.Value('d', self.ai.epsilon, lock=False)
+        self.lock = ctx.Lock()
+        experiences = ctx.Queue(self.queue_size)
+        stop = ctx.Event()
+        workers = [ctx.Process(target=_actor_loop, daemon=True,
+                               args=(i, (self.ai.model_format, self.ai.model_options),
+                                     self.shared_weights, self.version, self.epsilon, self.lock,
+                                     experiences, stop, self.seed))
+                   for i in range(self.num_workers)]
+        for worker in workers:
+            worker.start()
+
+        games, transitions, done_steps, busy, losses = 0, 0, 0, 0.0, []
+        next_save = (self.num_episodes // save_interval + 1) * save_interval if save_interval else None
+        start = last_report = time.perf_counter()
+        try:
+            while True:
+                elapsed = time.perf_counter() - start
+                if (seconds is not None and elapsed >= seconds) or (steps is not None and done_steps >= steps):
+                    break
+                # Take whatever games have arrived; block only while the buffer is too small to train
+                try:
+                    block = len(self.ai.memory) < self.ai.batch_size
+                    while True:
+                        transitions += self._receive(experiences.get(timeout=0.1) if block
+                                                     else experiences.get_nowait())
+                        games += 1
+                        block = False
+                except queue.Empty:
+                    pass
+                if on_save and next_save is not None and self.num_episodes >= next_save:
+                    on_save(self.num_episodes)
+                    next_save += save_interval
+                if len(self.ai.memory) < self.ai.batch_size:
+                    continue
+                t0 = time.perf_counter()
+                losses.append(self.ai.train_step())
+                busy += time.perf_counter() - t0
+                done_steps += 1
+                if done_steps % self.publish_every == 0:
+                    self._publish()
+                if report_interval and time.perf_counter() - last_report >= report_interval:
+                    last_report = time.perf_counter()
+                    print(f"Games: {games} | Steps: {done_steps} | "
+                          f"Loss: {np.mean(losses[-100:]):.4f} | ε: {self.ai.epsilon:.4f} | "
+                          f"Weights v{self.version.value}")
+        finally:
+            stop.set()
+            while any(worker.is_alive() for worker in workers):
+                try:
+                    while True:
+                        experiences.get_nowait()
+                except queue.Empty:
+                    pass
+                for worker in workers:
+                    worker.join(0.05)
+        wall = time.perf_counter() - start
+        return {
+            'workers': self.num_workers,
+            'seconds': wall,
+            'games': games,
+            'transitions': transitions,
+            'steps': done_steps,
+            'games_per_sec': games / wall,
+            'samples_per_sec': done_steps * self.ai.batch_size / wall,
+            'utilisation': busy / wall,
+            'weight_versions': self.version.value,
+            'loss': float(np.mean(losses[-100:])) if losses else 0.0,
+        }
@@ -1,5 +1,56 @@
+import json
+import math
+import os
 import random
+import time
+import zlib
+from bitboard import (CORNERS, flips, from_board, iter_squares, legal_moves,
+                      popcount, stable_discs)
 from constants import DIRECTIONS
+from position_cache import EXACT, LOWER, UPPER, position_key
+
+INF = 10**9
+
+# Evaluation weights: per corner, per disc, per move of mobility, per stable disc.
+# tune_weights.py fits replacements into eval_weights.json, loaded at import.
+EVAL_TERMS = ('corner', 'disc', 'mobility', 'stability')
+DEFAULT_EVAL_WEIGHTS = {'corner': 25, 'disc': 2, 'mobility': 3, 'stability': 4}
+EVAL_WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_weights.json')
+
+# Search configuration per difficulty for the alpha-beta engine.
+# probcut_t is the Multi-ProbCut cut threshold in standard deviations
+# (None disables selective search); time_limit caps iterative deepening;
+# positions with at most endgame_empties empty squares are solved exactly
+# (within time_limit, falling back to the iterative-deepening search).
+SEARCH_SETTINGS = {
+    'hard': {'depth': 3, 'probcut_t': None, 'time_limit': None, 'endgame_empties': 8},
+    'expert': {'depth': 8, 'probcut_t': 1.5, 'time_limit': 2.0, 'endgame_empties': 10},
+}
+
+# The endgame solver only pays for a stability bound once alpha is high enough
+# for 64 - 2 * stable(opponent) to possibly fall below it.
+STABILITY_CUTOFF_MIN = 8
+
+# Persistent search cache shared across processes; enabled by use_position_cache().
+# Only nodes at least CACHE_MIN_DEPTH deep are looked up and stored.
+POSITION_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'position_cache.bin')
+# Part of every cache key: bump it when the meaning of cached scores changes
+CACHE_VERSION = 2
+CACHE_MIN_DEPTH = 2
+_position_cache = None
+
+PROBCUT_PARAMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'probcut_params.json')
+
+# Fallback Multi-ProbCut parameters {deep_depth: [(shallow_depth, a, b, sigma), ...]}
+# used until fit_probcut.py has been run.
+DEFAULT_PROBCUT_PARAMS = {
+    3: [(1, 1.0, 0.0, 18.0)],
+    4: [(2, 1.0, 0.0, 16.0)],
+    5: [(1, 1.0, 0.0, 24.0), (3, 1.0, 0.0, 16.0)],
+    6: [(2, 1.0, 0.0, 22.0), (4, 1.0, 0.0, 14.0)],
+    7: [(3, 1.0, 0.0, 20.0), (5, 1.0, 0.0, 14.0)],
+    8: [(4, 1.0, 0.0, 20.0), (6, 1.0, 0.0, 14.0)],
+}
 
 
 def _flip_count(board, row, col, color):
@@ -18,83 +69,294 @@ def _flip_count(board, row, col, color):
     return total
 
 
-def _evaluate(board, color):
-    """Heuristic evaluation from perspective of `color`.
+def _load_eval_weights(path=EVAL_WEIGHTS_FILE):
+    """Load evaluation weights written by tune_weights.py.
+
+    Missing terms keep their DEFAULT_EVAL_WEIGHTS value; a missing or
+    unreadable file gives the defaults.
+    """
+    weights = dict(DEFAULT_EVAL_WEIGHTS)
+    if not os.path.exists(path):
+        return weights
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        weights.update({term: float(data['weights'][term]) for term in EVAL_TERMS if term in data['weights']})
+    except (OSError, ValueError, KeyError, TypeError):
+        return dict(DEFAULT_EVAL_WEIGHTS)
+    return weights
 
-    Weighted sum of:
-    - corner occupancy (high)
+
+EVAL_WEIGHTS = _load_eval_weights()
+
+
+def _eval_terms(me, opp):
+    """Evaluation features from the perspective of `me`, in EVAL_TERMS order.
+
+    - corner occupancy difference
     - disk difference
-    - mobility (number of moves)
+    - mobility (number of moves) difference
+    - stable disc difference
     """
-    opponent = 'W' if color == 'B' else 'B'
-    # corners
-    corners = [(0, 0), (0, board.size - 1), (board.size - 1, 0), (board.size - 1, board.size - 1)]
-    corner_score = 0
-    for r, c in corners:
-        if board.grid[r][c] == color:
-            corner_score += 25
-        elif board.grid[r][c] == opponent:
-            corner_score -= 25
-
-    # disk difference
-    my_discs = 0
-    opp_discs = 0
-    for row in board.grid:
-        for cell in row:
-            if cell == color:
-                my_discs += 1
-            elif cell == opponent:
-                opp_discs += 1
-    disc_diff = my_discs - opp_discs
-
-    # mobility
-    my_moves = len(board.get_valid_moves(color))
-    opp_moves = len(board.get_valid_moves(opponent))
-    mobility = my_moves - opp_moves
-
-    return corner_score + 2 * disc_diff + 3 * mobility
-
-
-def _minimax(board, color, depth, maximizing, orig_color):
-    """Depth-limited minimax without alpha-beta for simplicity (depth small).
+    return (popcount(me & CORNERS) - popcount(opp & CORNERS),
+            popcount(me) - popcount(opp),
+            popcount(legal_moves(me, opp)) - popcount(legal_moves(opp, me)),
+            popcount(stable_discs(me, opp)) - popcount(stable_discs(opp, me)))
+
+
+def _evaluate_bits(me, opp):
+    """Heuristic evaluation of bitboards from the perspective of `me`.
+
+    Weighted sum of the _eval_terms features with EVAL_WEIGHTS.
+    """
+    corner_score, disc_diff, mobility, stability = _eval_terms(me, opp)
+    w = EVAL_WEIGHTS
+    return (w['corner'] * corner_score + w['disc'] * disc_diff
+            + w['mobility'] * mobility + w['stability'] * stability)
+
+
+def _evaluate(board, color):
+    """Heuristic evaluation from perspective of `color` (see _evaluate_bits)."""
+    return _evaluate_bits(*from_board(board, color))
+
+
+def pack_positions(boards, colors):
+    """Pack boards into an (N, 2) uint64 array of (player, opponent) masks for evaluate_many."""
+    import numpy as np
+    return np.array([from_board(b, c) for b, c in zip(boards, colors)], dtype=np.uint64).reshape(-1, 2)
+
+
+def evaluate_many(positions, chunk_size=65536):
+    """Vectorized _evaluate_bits over an (N, 2) uint64 array of (player, opponent) masks.
+
+    Every term runs as NumPy uint64 bit operations, so results are identical
+    to the scalar evaluator.  Positions are processed in chunks to bound the
+    size of temporaries.  Returns an array of N scores.
+    """
+    import numpy as np
+    positions = np.asarray(positions, dtype=np.uint64).reshape(-1, 2)
+    chunks = [_evaluate_bits(positions[i:i + chunk_size, 0], positions[i:i + chunk_size, 1])
+              for i in range(0, len(positions), chunk_size)]
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+
+def _solve(me, opp, alpha, beta, passed=False, stats=None, deadline=None):
+    """Exact endgame alpha-beta on bitboards (fail-hard).
+
+    Returns the final disc difference for the side to move.  Before expanding
+    a node the opponent's stable discs bound our best possible result:
+    64 - 2 * stable(opponent); if that cannot beat alpha the node is cut.
+    """
+    if stats is not None:
+        stats['nodes'] = stats.get('nodes', 0) + 1
+        if deadline is not None and stats['nodes'] % 256 == 0 and time.perf_counter() > deadline:
+            raise _SearchTimeout()
+    moves = legal_moves(me, opp)
+    if not moves:
+        if passed:
+            return popcount(me) - popcount(opp)
+        return -_solve(opp, me, -beta, -alpha, True, stats, deadline)
+
+    if alpha >= STABILITY_CUTOFF_MIN:
+        upper = 64 - 2 * popcount(stable_discs(opp, me))
+        if upper <= alpha:
+            if stats is not None:
+                stats['stability_cuts'] = stats.get('stability_cuts', 0) + 1
+            return alpha
+        if upper < beta:
+            beta = upper
+
+    for sq in iter_squares(moves):
+        bit = 1 << sq
+        f = flips(me, opp, bit)
+        sc = -_solve(opp ^ f, me | f | bit, -beta, -alpha, False, stats, deadline)
+        if sc > alpha:
+            alpha = sc
+            if alpha >= beta:
+                break
+    return alpha
+
+
+def solve_endgame(board, color, stats=None, time_limit=None):
+    """Perfect play for `color` to the end of the game.
+
+    Returns (score, move) where score is the final disc difference, or
+    (None, None) if the solve does not finish within `time_limit` seconds.
+    """
+    if stats is None:
+        stats = {}
+    deadline = time.perf_counter() + time_limit if time_limit else None
+    me, opp = from_board(board, color)
+    alpha, best_move = -INF, None
+    try:
+        for sq in iter_squares(legal_moves(me, opp)):
+            bit = 1 << sq
+            f = flips(me, opp, bit)
+            sc = -_solve(opp ^ f, me | f | bit, -INF, -alpha, False, stats, deadline)
+            if sc > alpha:
+                alpha, best_move = sc, divmod(sq, 8)
+    except _SearchTimeout:
+        return None, None
+    return alpha, best_move
+
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when an iterative-deepening time budget runs out."""
+
+
+def _load_probcut_params(path=PROBCUT_PARAMS_FILE):
+    """Load Multi-ProbCut regression parameters written by fit_probcut.py.
+
+    Returns a dict {deep_depth: [(shallow_depth, a, b, sigma), ...]}; falls back
+    to DEFAULT_PROBCUT_PARAMS when the file is missing or unreadable.
+    """
+    if not os.path.exists(path):
+        return dict(DEFAULT_PROBCUT_PARAMS)
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return {int(d): [tuple(check) for check in checks] for d, checks in data['params'].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        return dict(DEFAULT_PROBCUT_PARAMS)
+
+
+PROBCUT_PARAMS = _load_probcut_params()
+
+
+def use_position_cache(path=POSITION_CACHE_FILE, num_slots=1 << 18):
+    """Open (creating if needed) the on-disk position cache used by the search.
+
+    Pass path=None to disable it.  Returns the cache or None.
+    """
+    global _position_cache
+    from position_cache import PositionCache
+    if _position_cache is not None:
+        _position_cache.close()
+    _position_cache = PositionCache(path, num_slots) if path else None
+    return _position_cache
+
+
+def _cache_salt(probcut_t):
+    """Cached scores are only valid for the weights and selectivity that produced them."""
+    settings = (CACHE_VERSION, tuple(EVAL_WEIGHTS[t] for t in EVAL_TERMS), probcut_t)
+    if probcut_t is not None:
+        settings += (sorted((d, [tuple(check) for check in checks]) for d, checks in PROBCUT_PARAMS.items()),)
+    return zlib.crc32(repr(settings).encode())
+
+
+def _cache_salts(probcut_t):
+    """Salts for one search: its own selectivity and the plain ProbCut shallow searches."""
+    if _position_cache is None:
+        return None
+    return {probcut_t: _cache_salt(probcut_t), None: _cache_salt(None)}
+
+
+def _negamax(board, color, depth, alpha, beta, probcut_t=None, stats=None, deadline=None, salts=None):
+    """Depth-limited alpha-beta search in negamax form (fail-hard).
+
+    Scores are from the perspective of `color` (the side to move).  When
+    `probcut_t` is set, Multi-ProbCut is tried at depths that have regression
+    parameters: a shallow search predicts the deep score as a*v + b with error
+    sigma, and the node is cut when the prediction clears the window by
+    `probcut_t` standard deviations.  With a position cache enabled, nodes
+    are looked up before they are expanded and their bounds stored after;
+    `salts` (from _cache_salts) is built once per search and passed down.
 
     Returns (score, move) where move is None or (r,c)
     """
-    moves = board.get_valid_moves(color)
-    opponent = 'W' if color == 'B' else 'B'
+    if stats is not None:
+        stats['nodes'] = stats.get('nodes', 0) + 1
+        if deadline is not None and stats['nodes'] % 256 == 0 and time.perf_counter() > deadline:
+            raise _SearchTimeout()
 
+    moves = board.get_valid_moves(color)
     if depth == 0 or not moves:
-        return _evaluate(board, orig_color), None
+        return _evaluate(board, color), None
+
+    key = None
+    if _position_cache is not None and depth >= CACHE_MIN_DEPTH:
+        if salts is None:
+            salts = _cache_salts(probcut_t)
+        key = position_key(*from_board(board, color), salts[probcut_t])
+        entry = _position_cache.lookup(*key)
+        if entry is not None:
+            cached_depth, flag, score, cached_move = entry
+            if cached_depth >= depth and (flag == EXACT or (flag == LOWER and score >= beta)
+                                          or (flag == UPPER and score <= alpha)):
+                if stats is not None:
+                    stats['cache_cutoffs'] = stats.get('cache_cutoffs', 0) + 1
+                return score, cached_move
+            # Otherwise the cached best move is searched first
+            if cached_move in moves:
+                moves.remove(cached_move)
+                moves.insert(0, cached_move)
+
+    if probcut_t is not None and depth in PROBCUT_PARAMS:
+        for shallow, a, b, sigma in PROBCUT_PARAMS[depth]:
+            # deep >= beta is likely when a*v + b >= beta + t*sigma
+            bound = math.ceil((probcut_t * sigma + beta - b) / a)
+            if beta < INF and _negamax(board, color, shallow, bound - 1, bound, None, stats, deadline, salts)[0] >= bound:
+                if stats is not None:
+                    stats['probcut_cuts'] = stats.get('probcut_cuts', 0) + 1
+                return beta, None
+            # deep <= alpha is likely when a*v + b <= alpha - t*sigma
+            bound = math.floor((-probcut_t * sigma + alpha - b) / a)
+            if alpha > -INF and _negamax(board, color, shallow, bound, bound + 1, None, stats, deadline, salts)[0] <= bound:
+                if stats is not None:
+                    stats['probcut_cuts'] = stats.get('probcut_cuts', 0) + 1
+                return alpha, None
 
+    opponent = 'W' if color == 'B' else 'B'
     best_move = None
-    if maximizing:
-        best_score = -10**9
-        for m in moves:
-            b2 = board.clone()
-            b2.place_disc(m[0], m[1], color)
-            sc, _ = _minimax(b2, opponent, depth - 1, False, orig_color)
-            if sc > best_score:
-                best_score = sc
-                best_move = m
-        return best_score, best_move
-    else:
-        best_score = 10**9
-        for m in moves:
-            b2 = board.clone()
-            b2.place_disc(m[0], m[1], color)
-            sc, _ = _minimax(b2, opponent, depth - 1, True, orig_color)
-            if sc < best_score:
-                best_score = sc
-                best_move = m
-        return best_score, best_move
+    for m in moves:
+        b2 = board.clone()
+        b2.place_disc(m[0], m[1], color)
+        sc, _ = _negamax(b2, opponent, depth - 1, -beta, -alpha, probcut_t, stats, deadline, salts)
+        sc = -sc
+        if sc > alpha:
+            alpha = sc
+            best_move = m
+            if alpha >= beta:
+                break
+    if key is not None:
+        flag = UPPER if best_move is None else LOWER if alpha >= beta else EXACT
+        _position_cache.store(*key, depth, flag, alpha, best_move)
+    if best_move is None:
+        best_move = moves[0]
+    return alpha, best_move
+
+
+def search(board, color, depth, probcut_t=None, time_limit=None, stats=None):
+    """Iterative-deepening alpha-beta search up to `depth` plies.
+
+    With `time_limit` (seconds) the deepest fully completed iteration wins.
+    Returns (score, move, depth_reached); depth_reached is 0 if not even the
+    first iteration finished in time.
+    """
+    if stats is None:
+        stats = {}
+    deadline = time.perf_counter() + time_limit if time_limit else None
+    salts = _cache_salts(probcut_t)
+    result = (None, None, 0)
+    for d in range(1, depth + 1):
+        try:
+            score, move = _negamax(board, color, d, -INF, INF, probcut_t, stats, deadline, salts)
+        except _SearchTimeout:
+            break
+        result = (score, move, d)
+    return result
 
 
 def choose_move(board, color, difficulty='medium'):
-    """Choose a move for color on board with difficulty: 'easy', 'medium', 'hard'.
+    """Choose a move for color on board with difficulty: 'easy', 'medium', 'hard', 'expert'.
 
     - easy: random valid move
     - medium: corner-first then max-flips (greedy)
-    - hard: minimax depth 3 (selects best evaluated move)
+    - hard: alpha-beta depth 3 (selects best evaluated move)
+    - expert: time-limited iterative deepening with Multi-ProbCut
+    - hard/expert solve the last few empties exactly (solve_endgame)
+
+    Search depth and selectivity come from SEARCH_SETTINGS.
     """
     moves = board.get_valid_moves(color)
     if not moves:
@@ -121,11 +383,21 @@ def choose_move(board, color, difficulty='medium'):
                 best.append((r, c))
         return random.choice(best)
 
-    if difficulty == 'hard':
-        # depth 3 minimax (you can increase depth at cost of CPU)
-        depth = 3
-        _, move = _minimax(board, color, depth, True, color)
-        return move
+    if difficulty in SEARCH_SETTINGS:
+        settings = SEARCH_SETTINGS[difficulty]
+        time_limit = settings['time_limit']
+        empties = sum(cell is None for row in board.grid for cell in row)
+        if empties <= settings['endgame_empties']:
+            # With a time budget the solver gets half; the search keeps the rest
+            start = time.perf_counter()
+            _, move = solve_endgame(board, color, time_limit=time_limit / 2 if time_limit else None)
+            if move is not None:
+                return move
+            time_limit -= time.perf_counter() - start
+        _, move, _ = search(board, color, settings['depth'],
+                            probcut_t=settings['probcut_t'],
+                            time_limit=time_limit)
+        return move if move else random.choice(moves)
 
     # fallback
     return random.choice(moves)
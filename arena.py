@@ -0,0 +1,247 @@
+"""
+Arena matches between Othello agents
+
+An agent is either a classic AI difficulty ('easy', 'medium', 'hard',
+'expert', see ai.py), a path to a neural AI checkpoint or unix:SOCKET for a
+running inference_server.py.  Games are played in pairs from the same
+random opening with colours swapped, spread over a process pool; the result
+is agent A's score with a confidence interval and the matching Elo
+difference.
+
+With --promote, candidate A replaces the incumbent model file (agent B,
+which must be the --promote-to file) only when it scores at least
+--threshold against it:
+    python arena.py othello_model_ep500.pth othello_model_final.pth --games 200 --promote
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import time
+
+from board import Board
+from game import Game
+
+CLASSIC_AGENTS = ('easy', 'medium', 'hard', 'expert')
+
+_agents = None   # per worker process: (agent_a, agent_b)
+
+
+def make_agent(spec):
+    """choose(board, color, valid_moves) callable for a difficulty name, checkpoint path or unix:SOCKET."""
+    if spec in CLASSIC_AGENTS:
+        import ai
+        return lambda board, color, moves: ai.choose_move(board, color, spec)
+    if spec.startswith('unix:'):
+        # A running inference_server.py: every worker shares its model and batches
+        from inference_server import InferenceClient
+        return InferenceClient(spec[len('unix:'):]).choose_move
+    if not os.path.exists(spec):
+        raise ValueError(f"agent must be one of {', '.join(CLASSIC_AGENTS)}, a checkpoint path or unix:SOCKET, "
+                         f"got {spec!r}")
+    from modern_ai import ModernOthelloAI
+    # Loaded once per worker; every worker shares the mapped weights
+    model = ModernOthelloAI.for_inference(spec, mmap=True)
+    return lambda board, color, moves: model.choose_move(board, color, moves, training=False)
+
+
+def random_opening(rng, plies):
+    """Sequence of (color, move) from `plies` uniformly random legal moves."""
+    board = Board()
+    game = Game(board)
+    opening = []
+    while len(opening) < plies and not game.check_game_over():
+        moves = board.get_valid_moves(game.current_player)
+        if moves:
+            move = rng.choice(moves)
+            board.place_disc(*move, game.current_player)
+            opening.append((game.current_player, move))
+        game.switch_player()
+    return opening
+
+
+def play_game(black, white, opening=()):
+    """Play one game after replaying `opening`; returns (winner, counts)."""
+    board = Board()
+    game = Game(board)
+    for color, move in opening:
+        board.place_disc(*move, color)
+        game.current_player = 'W' if color == 'B' else 'B'
+    players = {'B': black, 'W': white}
+    while not game.check_game_over():
+        moves = board.get_valid_moves(game.current_player)
+        if not moves:
+            game.switch_player()
+            continue
+        move = players[game.current_player](board, game.current_player, moves)
+        board.place_disc(*move, game.current_player)
+        game.switch_player()
+    return game.winner()
+
+
+def _init_worker(spec_a, spec_b, threads):
+    global _agents
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _agents = (make_agent(spec_a), make_agent(spec_b))
+
+
+def _play_pair(task):
+    """Both colour assignments from one opening; returns [(a_color, winner, counts), ...]."""
+    pair, seed, opening_plies = task
+    rng = random.Random(seed * 1000003 + pair)
+    random.seed(rng.random())
+    try:
+        import numpy as np
+        np.random.seed(rng.randrange(2**32))
+    except ImportError:
+        pass
+    opening = random_opening(rng, opening_plies)
+    agent_a, agent_b = _agents
+    results = []
+    for a_color in ('B', 'W'):
+        black, white = (agent_a, agent_b) if a_color == 'B' else (agent_b, agent_a)
+        winner, counts = play_game(black, white, opening)
+        results.append((a_color, winner, counts))
+    return results
+
+
+def score_interval(wins, draws, losses, z=1.96):
+    """(score, low, high): A's mean score (win 1, draw 0.5) with a normal-approximation interval."""
+    n = wins + draws + losses
+    if n == 0:
+        return 0.5, 0.0, 1.0
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    half = z * math.sqrt(variance / n)
+    return score, max(0.0, score - half), min(1.0, score + half)
+
+
+def elo_difference(score):
+    """Elo rating difference implied by an expected score (clamped away from 0 and 1)."""
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+
+def run_match(spec_a, spec_b, games=100, workers=None, opening_plies=4, seed=0, threads=1, verbose=True):
+    """Play `games` games (rounded up to an even number) of A against B.
+
+    workers=0 plays in this process; otherwise games are spread over a pool
+    of `workers` processes (default: CPU count), each loading both agents once.
+    Returns a stats dict with wins/draws/losses from A's point of view,
+    score, score_low/score_high (95% interval), elo (with elo_low/elo_high)
+    and games_per_sec.
+    """
+    pairs = (games + 1) // 2
+    tasks = [(pair, seed, opening_plies) for pair in range(pairs)]
+    tally = {'wins': 0, 'draws': 0, 'losses': 0, 'disc_margin': 0}
+    start = time.perf_counter()
+
+    def record(results):
+        for a_color, winner, counts in results:
+            b_color = 'W' if a_color == 'B' else 'B'
+            if winner is None:
+                tally['draws'] += 1
+            elif winner == a_color:
+                tally['wins'] += 1
+            else:
+                tally['losses'] += 1
+            tally['disc_margin'] += counts[a_color] - counts[b_color]
+
+    if workers == 0:
+        _init_worker(spec_a, spec_b, threads)
+        results_iter = map(_play_pair, tasks)
+        pool = None
+    else:
+        workers = min(workers or os.cpu_count() or 1, pairs)
+        ctx = multiprocessing.get_context('spawn')
+        pool = ctx.Pool(workers, initializer=_init_worker, initargs=(spec_a, spec_b, threads))
+        results_iter = pool.imap_unordered(_play_pair, tasks)
+    try:
+        for done, results in enumerate(results_iter, 1):
+            record(results)
+            if verbose and done % max(1, pairs // 10) == 0:
+                played = 2 * done
+                print(f"   {played}/{2 * pairs} games | +{tally['wins']} ={tally['draws']} -{tally['losses']} | "
+                      f"{played / (time.perf_counter() - start):.2f} games/s")
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    wall = time.perf_counter() - start
+    played = 2 * pairs
+    score, low, high = score_interval(tally['wins'], tally['draws'], tally['losses'])
+    return {
+        'agent_a': spec_a,
+        'agent_b': spec_b,
+        'games': played,
+        'wins': tally['wins'],
+        'draws': tally['draws'],
+        'losses': tally['losses'],
+        'score': score,
+        'score_low': low,
+        'score_high': high,
+        'elo': elo_difference(score),
+        'elo_low': elo_difference(low),
+        'elo_high': elo_difference(high),
+        'mean_disc_margin': tally['disc_margin'] / played,
+        'seconds': wall,
+        'games_per_sec': played / wall,
+    }
+
+
+def promote(candidate, destination='othello_model_final.pth'):
+    """Copy `candidate` over `destination` atomically (the old file is kept as *.prev)."""
+    tmp = f"{destination}.tmp{os.getpid()}"
+    shutil.copyfile(candidate, tmp)
+    if os.path.exists(destination):
+        shutil.copyfile(destination, destination + '.prev')
+    os.replace(tmp, destination)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play an arena match between two Othello agents")
+    parser.add_argument('agent_a', help=f"checkpoint path, unix:SOCKET or classic difficulty ({', '.join(CLASSIC_AGENTS)})")
+    parser.add_argument('agent_b', help="opponent, same forms as agent_a")
+    parser.add_argument('--games', type=int, default=100, help="games to play (colours alternate in pairs)")
+    parser.add_argument('--workers', type=int, help="processes (default: CPU count, 0 = this process)")
+    parser.add_argument('--threads', type=int, default=1, help="torch threads per worker")
+    parser.add_argument('--opening-plies', type=int, default=4,
+                        help="random moves before the agents take over; each opening is played with both colours")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--promote', action='store_true',
+                        help="copy agent_a over --promote-to if it scores at least --threshold")
+    parser.add_argument('--threshold', type=float, default=0.55, help="score A needs for promotion")
+    parser.add_argument('--promote-to', default='othello_model_final.pth')
+    args = parser.parse_args()
+    if args.promote and (args.agent_a in CLASSIC_AGENTS or args.agent_a.startswith('unix:')):
+        parser.error("--promote needs agent_a to be a checkpoint path")
+    if args.promote and os.path.realpath(args.agent_b) != os.path.realpath(args.promote_to):
+        parser.error(f"--promote needs agent_b to be the incumbent --promote-to file ({args.promote_to})")
+
+    print(f"⚔️  {args.agent_a} vs {args.agent_b}: {args.games} games, {args.opening_plies}-ply random openings")
+    stats = run_match(args.agent_a, args.agent_b, games=args.games, workers=args.workers,
+                      opening_plies=args.opening_plies, seed=args.seed, threads=args.threads)
+    print(f"\n📊 {args.agent_a}: +{stats['wins']} ={stats['draws']} -{stats['losses']} "
+          f"(mean disc margin {stats['mean_disc_margin']:+.1f})")
+    print(f"   Score {stats['score']:.3f} [95% CI {stats['score_low']:.3f}-{stats['score_high']:.3f}] | "
+          f"Elo {stats['elo']:+.0f} [{stats['elo_low']:+.0f}, {stats['elo_high']:+.0f}]")
+    print(f"   {stats['games_per_sec']:.2f} games/s over {stats['seconds']:.1f}s")
+
+    if args.promote:
+        if stats['score'] >= args.threshold:
+            promote(args.agent_a, args.promote_to)
+            print(f"🏆 Promoted {args.agent_a} to {args.promote_to} "
+                  f"(score {stats['score']:.3f} >= {args.threshold})")
+        else:
+            print(f"🚫 Not promoted: score {stats['score']:.3f} < {args.threshold}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Batched self-play for the neural AI
+
+Advances many games in lockstep over NumPy bitboard arrays: each ply every
+game that needs a move is encoded at once, the policy network runs a single
+batched forward pass, illegal squares are masked and epsilon-greedy moves
+are picked for all games together.  Finished games are scored, pushed to
+the replay buffer and their slots refilled with fresh games.
+
+Transitions and rewards match SelfPlayTrainer.play_game.
+"""
+
+import numpy as np
+import torch
+
+from bitboard import flips, legal_moves, popcount
+from encoding import encode_bitboards, unpack_bits
+
+MAX_PLIES = 60
+# board.Board's starting layout: black on (3, 4) and (4, 3), white on (3, 3) and (4, 4)
+_START_BLACK = (1 << 28) | (1 << 35)
+_START_WHITE = (1 << 27) | (1 << 36)
+
+
+class BatchedSelfPlayTrainer:
+    """Play self-play games `num_slots` at a time into `ai.memory`"""
+
+    def __init__(self, ai, num_slots=256, seed=None):
+        self.ai = ai
+        self.num_slots = num_slots
+        self.rng = np.random.default_rng(seed)
+        self.num_episodes = 0
+        self.total_wins_black = 0
+        self.total_wins_white = 0
+        self.total_draws = 0
+        self.positions = 0
+        self.dataset = None   # optional selfplay_dataset.ShardWriter recording every game
+
+    def _reset(self, slots):
+        """Start new games in `slots` (black to move)."""
+        self.me[slots] = _START_BLACK
+        self.opp[slots] = _START_WHITE
+        self.white[slots] = False
+        self.plies[slots] = 0
+
+    def _select_moves(self, me, opp, moves, training):
+        """Square index per game: masked argmax of Q, or a uniform legal move with prob. epsilon."""
+        legal = unpack_bits(moves).astype(bool)
+        with torch.inference_mode():
+            q = self.ai.policy_net(torch.from_numpy(encode_bitboards(me, opp)).to(self.ai.device))
+        q = q.cpu().numpy()
+        q[~legal] = -np.inf
+        choice = q.argmax(axis=1)
+        if training:
+            explore = self.rng.random(len(me)) < self.ai.epsilon
+            if explore.any():
+                noise = self.rng.random((int(explore.sum()), 64))
+                noise[~legal[explore]] = -1.0
+                choice[explore] = noise.argmax(axis=1)
+        return choice
+
+    def _finish(self, slot):
+        """Score a finished game and push its transitions to the replay buffer."""
+        black = self.opp[slot] if self.white[slot] else self.me[slot]
+        white = self.me[slot] if self.white[slot] else self.opp[slot]
+        counts = {'B': int(popcount(int(black))), 'W': int(popcount(int(white)))}
+        if counts['B'] > counts['W']:
+            winner = 'B'
+            self.total_wins_black += 1
+        elif counts['W'] > counts['B']:
+            winner = 'W'
+            self.total_wins_white += 1
+        else:
+            winner = None
+            self.total_draws += 1
+        self.num_episodes += 1
+
+        n = self.plies[slot]
+        mover_white = self.hist_white[slot, :n]
+        diff = (counts['B'] - counts['W']) / 64.0
+        score_diff = np.where(mover_white, -diff, diff)
+        if winner is None:
+            outcome = np.zeros(n)
+        else:
+            outcome = np.where(mover_white == (winner == 'W'), 1.0, -1.0)
+        rewards = (outcome + score_diff * 0.1).astype(np.float32)
+        if self.dataset is not None:
+            margin = counts['B'] - counts['W']
+            self.dataset.add_game(self.hist_states[slot, :n, 0], self.hist_states[slot, :n, 1],
+                                  self.hist_actions[slot, :n], np.where(mover_white, -margin, margin))
+        done = 1.0 if winner is not None else 0.0
+        self.ai.memory.push_many(self.hist_states[slot, :n], self.hist_actions[slot, :n], rewards,
+                                 self.hist_next[slot, :n], np.full(n, done), self.hist_legal[slot, :n])
+        return winner, counts
+
+    def play_games(self, num_games, training=True):
+        """Play `num_games` games; returns a list of (winner, counts) in finishing order."""
+        slots = min(self.num_slots, num_games)
+        self.me = np.zeros(slots, dtype=np.uint64)
+        self.opp = np.zeros(slots, dtype=np.uint64)
+        self.white = np.zeros(slots, dtype=bool)
+        self.plies = np.zeros(slots, dtype=np.int64)
+        self.hist_states = np.zeros((slots, MAX_PLIES, 2), dtype=np.uint64)
+        self.hist_next = np.zeros((slots, MAX_PLIES, 2), dtype=np.uint64)
+        self.hist_legal = np.zeros((slots, MAX_PLIES), dtype=np.uint64)
+        self.hist_actions = np.zeros((slots, MAX_PLIES), dtype=np.int8)
+        self.hist_white = np.zeros((slots, MAX_PLIES), dtype=bool)
+        active = np.ones(slots, dtype=bool)
+        self._reset(np.arange(slots))
+        started = slots
+        results = []
+
+        net = self.ai.policy_net
+        was_training = net.training
+        net.eval()
+        try:
+            while active.any():
+                idx = np.flatnonzero(active)
+                me, opp = self.me[idx], self.opp[idx]
+                moves = legal_moves(me, opp)
+
+                # Side to move has no move: pass, or end the game if neither side can move
+                stuck = moves == 0
+                if stuck.any():
+                    over = stuck & (legal_moves(opp, me) == 0)
+                    passing = idx[stuck & ~over]
+                    self.me[passing], self.opp[passing] = self.opp[passing], self.me[passing]
+                    self.white[passing] ^= True
+                    for slot in idx[over]:
+                        results.append(self._finish(slot))
+                        if started < num_games:
+                            self._reset([slot])
+                            started += 1
+                        else:
+                            active[slot] = False
+                    keep = ~stuck
+                    idx, me, opp, moves = idx[keep], me[keep], opp[keep], moves[keep]
+                    if not len(idx):
+                        continue
+
+                # One forward pass for every game that has a move
+                squares = self._select_moves(me, opp, moves, training)
+                bits = np.left_shift(np.uint64(1), squares.astype(np.uint64))
+                flipped = flips(me, opp, bits)
+                new_me = me | flipped | bits
+                new_opp = opp ^ flipped
+
+                # Next states are stored from the side to move: the opponent unless it has to pass
+                next_legal = legal_moves(new_opp, new_me)
+                passes = next_legal == 0
+                if passes.any():
+                    next_legal[passes] = legal_moves(new_me[passes], new_opp[passes])
+                ply = self.plies[idx]
+                self.hist_states[idx, ply, 0], self.hist_states[idx, ply, 1] = me, opp
+                self.hist_next[idx, ply, 0] = np.where(passes, new_me, new_opp)
+                self.hist_next[idx, ply, 1] = np.where(passes, new_opp, new_me)
+                self.hist_legal[idx, ply] = next_legal
+                self.hist_actions[idx, ply] = squares
+                self.hist_white[idx, ply] = self.white[idx]
+                self.plies[idx] = ply + 1
+                self.positions += len(idx)
+
+                self.me[idx], self.opp[idx] = new_opp, new_me
+                self.white[idx] ^= True
+        finally:
+            net.train(was_training)
+        return results
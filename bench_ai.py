@@ -0,0 +1,193 @@
+"""
+Benchmarks for the classic AI (ai.py)
+
+Run a section by name, e.g.:
+    python bench_ai.py probcut --positions 20 --time 1.0
+    python bench_ai.py stability --positions 5 --empties 10
+    python bench_ai.py batch
+    python bench_ai.py cache --positions 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+import ai
+import bitboard
+from bitboard import random_position
+
+
+def _per_call_us(fn, args_list, repeat=5):
+    """Best-of-`repeat` mean cost in microseconds of fn(*args) over args_list."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for a in args_list:
+            fn(*a)
+        best = min(best, time.perf_counter() - start)
+    return best / len(args_list) * 1e6
+
+
+def bench_probcut(args):
+    """Depth reached and move agreement: Multi-ProbCut vs full-width at equal time."""
+    rng = random.Random(args.seed)
+    positions = []
+    while len(positions) < args.positions:
+        board, color = random_position(rng)
+        if board.get_valid_moves(color):
+            positions.append((board, color))
+
+    print(f"⏱️  {len(positions)} positions, {args.time:.2f}s per move, t={args.t}")
+    full_depths, mpc_depths = [], []
+    agree_time = agree_depth = 0
+    full_nodes = mpc_nodes = cuts = 0
+    for board, color in positions:
+        full_stats, mpc_stats = {}, {}
+        _, full_move, full_depth = ai.search(board, color, args.max_depth,
+                                             time_limit=args.time, stats=full_stats)
+        _, mpc_move, mpc_depth = ai.search(board, color, args.max_depth, probcut_t=args.t,
+                                           time_limit=args.time, stats=mpc_stats)
+        full_depths.append(full_depth)
+        mpc_depths.append(mpc_depth)
+        full_nodes += full_stats.get('nodes', 0)
+        mpc_nodes += mpc_stats.get('nodes', 0)
+        cuts += mpc_stats.get('probcut_cuts', 0)
+        agree_time += mpc_move == full_move
+        # Same depth, no time limit: how often selectivity changes the move
+        _, ref_move = ai._negamax(board, color, mpc_depth, -ai.INF, ai.INF) if mpc_depth else (None, full_move)
+        agree_depth += mpc_move == ref_move
+
+    n = len(positions)
+    print(f"{'':<14}{'avg depth':>10}{'max depth':>10}{'nodes/s':>10}")
+    print(f"{'full-width':<14}{sum(full_depths) / n:>10.2f}{max(full_depths):>10}"
+          f"{full_nodes / (n * args.time):>10.0f}")
+    print(f"{'multi-probcut':<14}{sum(mpc_depths) / n:>10.2f}{max(mpc_depths):>10}"
+          f"{mpc_nodes / (n * args.time):>10.0f}")
+    print(f"ProbCut cuts: {cuts}")
+    print(f"Move agreement with full-width at equal time:  {agree_time / n * 100:.1f}%")
+    print(f"Move agreement with full-width at equal depth: {agree_depth / n * 100:.1f}%")
+
+
+def bench_stability(args):
+    """Per-call cost of stable-disc detection and its effect on the endgame solver."""
+    rng = random.Random(args.seed)
+    positions = [bitboard.from_board(*random_position(rng, 20, 56)) for _ in range(200)]
+    flipped = [(opp, me) for me, opp in positions]
+
+    stable_us = _per_call_us(bitboard.stable_discs, positions)
+    legal_us = _per_call_us(bitboard.legal_moves, positions)
+    eval_us = _per_call_us(ai._evaluate_bits, positions)
+    # The evaluation runs stable_discs once per side
+    eval_no_stab_us = eval_us - 2 * stable_us
+    avg_stable = sum(bitboard.popcount(bitboard.stable_discs(*p)) for p in positions + flipped) / (2 * len(positions))
+    print(f"stable_discs:            {stable_us:8.1f} us/call  (avg {avg_stable:.1f} stable discs)")
+    print(f"legal_moves:             {legal_us:8.1f} us/call")
+    print(f"_evaluate_bits:          {eval_us:8.1f} us/call  (~{eval_no_stab_us:.1f} us without stability)")
+
+    print(f"\nEndgame solver, {args.positions} positions with {args.empties} empties:")
+    solve_positions = []
+    while len(solve_positions) < args.positions:
+        board, color = random_position(rng, 60 - args.empties, 60 - args.empties)
+        if board.get_valid_moves(color):
+            solve_positions.append((board, color))
+    cutoff = ai.STABILITY_CUTOFF_MIN
+    for label, threshold in (('no stability cutoff', ai.INF), ('stability cutoff', cutoff)):
+        ai.STABILITY_CUTOFF_MIN = threshold
+        stats = {}
+        start = time.perf_counter()
+        for board, color in solve_positions:
+            ai.solve_endgame(board, color, stats)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<20} {stats['nodes']:>9} nodes  {stats.get('stability_cuts', 0):>6} cuts"
+              f"  {elapsed:7.2f}s")
+    ai.STABILITY_CUTOFF_MIN = cutoff
+
+
+def bench_batch(args):
+    """Throughput of evaluate_many against the scalar evaluator."""
+    import numpy as np
+
+    rng = random.Random(args.seed)
+    boards = [random_position(rng, 0, 60) for _ in range(2000)]
+    base = ai.pack_positions([b for b, _ in boards], [c for _, c in boards])
+
+    start = time.perf_counter()
+    scalar = [ai._evaluate_bits(int(me), int(opp)) for me, opp in base]
+    scalar_rate = len(base) / (time.perf_counter() - start)
+    assert (ai.evaluate_many(base) == np.array(scalar)).all(), "batch and scalar evaluations differ"
+    print(f"scalar _evaluate_bits: {scalar_rate:12,.0f} positions/s")
+
+    for n in (100_000, 1_000_000):
+        positions = np.resize(base, (n, 2))
+        start = time.perf_counter()
+        ai.evaluate_many(positions)
+        elapsed = time.perf_counter() - start
+        print(f"evaluate_many N={n:>9,}: {n / elapsed:12,.0f} positions/s  ({elapsed:.2f}s,"
+              f" {n / elapsed / scalar_rate:.0f}x scalar)")
+
+
+def _cache_run(cache_path, seed, count, depth):
+    """One 'session' in a fresh process: search `count` positions, return timings and cache counters."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, color = random_position(rng)
+        if board.get_valid_moves(color):
+            positions.append((board, color))
+    cache = ai.use_position_cache(cache_path) if cache_path else None
+    stats = {}
+    start = time.perf_counter()
+    for board, color in positions:
+        ai.search(board, color, depth, stats=stats)
+    elapsed = time.perf_counter() - start
+    if cache is None:
+        return elapsed, 0, 0, 0
+    return elapsed, cache.probes, cache.hits, stats.get('cache_cutoffs', 0)
+
+
+def bench_cache(args):
+    """Hit rate and time saved by the persistent position cache across repeated runs."""
+    path = os.path.join(tempfile.mkdtemp(), 'position_cache.bin')
+    ctx = multiprocessing.get_context('spawn')
+    depth = min(args.max_depth, 4)
+    print(f"🔁 {args.positions} positions, depth {depth}, each run in a new process")
+    print(f"{'run':<16}{'time':>9}{'probes':>9}{'hit rate':>10}{'cutoffs':>9}")
+    runs = [('no cache', None)] + [(f'cache run {i + 1}', path) for i in range(3)]
+    baseline = None
+    for label, cache_path in runs:
+        with ctx.Pool(1) as pool:
+            elapsed, probes, hits, cutoffs = pool.apply(_cache_run, (cache_path, args.seed, args.positions, depth))
+        baseline = baseline or elapsed
+        rate = hits / probes * 100 if probes else 0.0
+        print(f"{label:<16}{elapsed:>8.2f}s{probes:>9}{rate:>9.1f}%{cutoffs:>9}"
+              f"   ({(1 - elapsed / baseline) * 100:.0f}% time saved)")
+    os.remove(path)
+
+
+SECTIONS = {
+    'batch': bench_batch,
+    'cache': bench_cache,
+    'probcut': bench_probcut,
+    'stability': bench_stability,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classic AI benchmarks")
+    parser.add_argument('section', choices=sorted(SECTIONS))
+    parser.add_argument('--positions', type=int, default=20)
+    parser.add_argument('--time', type=float, default=1.0, help="seconds per searched position")
+    parser.add_argument('--max-depth', type=int, default=12)
+    parser.add_argument('--t', type=float, default=ai.SEARCH_SETTINGS['expert']['probcut_t'],
+                        help="ProbCut threshold in standard deviations")
+    parser.add_argument('--empties', type=int, default=10, help="empty squares for endgame benchmarks")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    SECTIONS[args.section](args)
+
+
+if __name__ == "__main__":
+    main()
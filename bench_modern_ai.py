@@ -0,0 +1,924 @@
+"""
+Benchmarks for the neural AI (modern_ai.py)
+
+Run a section by name, e.g.:
+    python bench_modern_ai.py encode
+    python bench_modern_ai.py load
+    python bench_modern_ai.py cpu --threads 1 2 4
+    python bench_modern_ai.py replay --sizes 10000 100000 1000000
+    python bench_modern_ai.py per --games 300 --seconds 30
+    python bench_modern_ai.py actors --workers 1 2 4 --seconds 60
+    python bench_modern_ai.py selfplay --games 512 --slots 1 16 64 256
+    python bench_modern_ai.py augment --games 100 --steps 500
+    python bench_modern_ai.py mcts --model othello_model_final.pth --playouts 50 200 800
+    python bench_modern_ai.py dataset --sizes 1000000 10000000
+    python bench_modern_ai.py qcache --games 40 --model othello_model_final.pth
+    python bench_modern_ai.py numpy --model othello_model_final.pth
+    python bench_modern_ai.py reload --model othello_model_final.pth
+    python bench_modern_ai.py serve --model othello_model_final.pth --clients 1 10 100 --seconds 10
+    python bench_modern_ai.py targets --baseline ../othello-before-masked-targets --seconds 900
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+import encoding
+from bitboard import from_board, random_position
+from training_metrics import rss_mb
+
+
+def _random_boards(count, seed=0):
+    rng = random.Random(seed)
+    return [random_position(rng, 0, 60) for _ in range(count)]
+
+
+def _rate(fn, items, repeat=3):
+    """Best-of-`repeat` items per second for fn() processing `items` items."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return items / best
+
+
+def _make_checkpoint(path):
+    """Save a checkpoint with populated optimizer state, like a real training run."""
+    import torch
+    from modern_ai import ModernOthelloAI
+
+    ai = ModernOthelloAI()
+    ai.optimizer.zero_grad()
+    ai.policy_net(torch.zeros(2, 3, 8, 8, device=ai.device)).sum().backward()
+    ai.optimizer.step()
+    ai.save_model(path)
+
+
+def _load_run(path, mode):
+    """Fresh process: time one model construction and measure the RSS it adds."""
+    import torch  # noqa: F401  (import cost is not part of the measurement)
+    from board import Board
+    from modern_ai import ModernOthelloAI
+
+    before = rss_mb()
+    start = time.perf_counter()
+    if mode == 'training constructor':
+        ai = ModernOthelloAI(model_path=path)
+    elif mode == 'inference-only':
+        ai = ModernOthelloAI.for_inference(path, mmap=False)
+    else:
+        ai = ModernOthelloAI.for_inference(path, mmap=True)
+    board = Board()
+    ai.choose_move(board, 'B', board.get_valid_moves('B'))
+    elapsed = time.perf_counter() - start
+    return elapsed, rss_mb() - before
+
+
+def bench_load(args):
+    """Load time and resident memory: training constructor vs inference-only."""
+    path = os.path.join(tempfile.mkdtemp(), 'othello_model.pth')
+    _make_checkpoint(path)
+    print(f"📦 Checkpoint size: {os.path.getsize(path) / 2**20:.1f} MB")
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'':<24}{'load+first move':>16}{'RSS added':>12}")
+    for mode in ('training constructor', 'inference-only', 'inference-only + mmap'):
+        with ctx.Pool(1) as pool:
+            elapsed, rss = pool.apply(_load_run, (path, mode))
+        print(f"{mode:<24}{elapsed * 1000:>14.0f}ms{rss:>10.1f}MB")
+    os.remove(path)
+
+
+def _loop_planes(board, player):
+    """The original per-square encoder (with the empty plane fixed)."""
+    state = np.zeros((3, 8, 8), dtype=np.float32)
+    for i in range(8):
+        for j in range(8):
+            cell = board.grid[i][j]
+            if cell == player:
+                state[0, i, j] = 1
+            elif cell is not None:
+                state[1, i, j] = 1
+            else:
+                state[2, i, j] = 1
+    return state
+
+
+def bench_encode(args):
+    """Encode throughput: per-square loop vs vectorized single and batch encoders."""
+    import torch
+
+    positions = _random_boards(args.positions, args.seed)
+    boards = [b for b, _ in positions]
+    players = [c for _, c in positions]
+    n = len(boards)
+    packed = np.array([from_board(b, c) for b, c in positions], dtype=np.uint64)
+    out = torch.empty((n, 3, 8, 8), dtype=torch.float32)
+
+    rows = [
+        ('loop + FloatTensor (old)', lambda: [torch.FloatTensor(_loop_planes(b, c)).unsqueeze(0)
+                                              for b, c in positions]),
+        ('board_planes per board', lambda: [torch.from_numpy(encoding.board_planes(b, c)).unsqueeze(0)
+                                            for b, c in positions]),
+        ('encode_boards batch', lambda: encoding.encode_boards(boards, players, out=out.numpy())),
+        ('encode_bitboards batch', lambda: encoding.encode_bitboards(packed[:, 0], packed[:, 1],
+                                                                     out=out.numpy())),
+    ]
+    print(f"🧮 Encoding {n} boards")
+    base = None
+    for label, fn in rows:
+        rate = _rate(fn, n)
+        base = base or rate
+        print(f"  {label:<26}{rate:>12,.0f} boards/s  ({rate / base:5.1f}x)")
+
+
+def _percentiles_us(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.percentile(times, 50) * 1e6, np.percentile(times, 99) * 1e6
+
+
+def bench_cpu(args):
+    """CPU inference variants: latency, batch-64 throughput and FP32 move agreement."""
+    import torch
+    from modern_ai import ModernOthelloAI, build_cpu_inference_net
+
+    ai = ModernOthelloAI.for_inference(args.model, mmap=True) if args.model else ModernOthelloAI(inference_only=True)
+    fp32 = ai.policy_net.cpu().eval()
+    positions = _random_boards(args.positions, args.seed)
+    states = torch.from_numpy(encoding.encode_boards([b for b, _ in positions], [c for _, c in positions]))
+    legal = torch.full((len(positions), 64), float('-inf'))
+    for i, (board, color) in enumerate(positions):
+        for r, c in board.get_valid_moves(color):
+            legal[i, r * 8 + c] = 0
+    has_moves = torch.isfinite(legal).any(dim=1)
+    single, batch = states[:1], states[:64]
+
+    variants = [
+        ('fp32 eager', lambda: fp32),
+        ('fp32 fused + traced', lambda: build_cpu_inference_net(fp32, quantize=False, trace=True)),
+        ('int8 eager', lambda: build_cpu_inference_net(fp32, quantize=True, trace=False)),
+        ('int8 fused + traced', lambda: build_cpu_inference_net(fp32, quantize=True, trace=True)),
+    ]
+    with torch.inference_mode():
+        reference = (fp32(states) + legal).argmax(dim=1)
+        print(f"🧠 {len(positions)} positions, {'checkpoint ' + args.model if args.model else 'untrained weights'}")
+        print(f"{'threads':<9}{'variant':<22}{'p50':>9}{'p99':>9}{'batch-64/s':>13}{'agree':>8}")
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            for label, build in variants:
+                net = build()
+                for _ in range(10):  # warm-up (TorchScript optimises on the first calls)
+                    net(single)
+                    net(batch)
+                p50, p99 = _percentiles_us(lambda: net(single), args.runs)
+                rate = _rate(lambda: net(batch), 64, repeat=args.runs // 10 or 1)
+                chosen = (net(states) + legal).argmax(dim=1)
+                agree = (chosen == reference)[has_moves].float().mean().item()
+                print(f"{threads:<9}{label:<22}{p50:>7.0f}us{p99:>7.0f}us{rate:>13,.0f}{agree:>8.1%}")
+
+
+def _fill_tensor_deque(size, rng):
+    """The original replay buffer: a deque of (state tensor, action, reward, next_state tensor, done)."""
+    import torch
+
+    memory = deque(maxlen=size)
+    for _ in range(size):
+        memory.append((torch.from_numpy(rng.random((1, 3, 8, 8), dtype=np.float32).round()),
+                       int(rng.integers(64)), float(rng.random()),
+                       torch.from_numpy(rng.random((1, 3, 8, 8), dtype=np.float32).round()), 0.0))
+    return memory
+
+
+def _sample_tensor_deque(memory, batch_size):
+    import torch
+
+    states, actions, rewards, next_states, dones = zip(*random.sample(memory, batch_size))
+    return (torch.cat(states), torch.cat(next_states), torch.LongTensor(actions),
+            torch.FloatTensor(rewards), torch.FloatTensor(dones))
+
+
+def _sample_ring(memory, batch_size):
+    import torch
+
+    states, actions, rewards, next_states, dones = memory.sample(batch_size)
+    both = np.concatenate([states, next_states])
+    planes = torch.from_numpy(encoding.encode_bitboards(both[:, 0], both[:, 1]))
+    return (planes[:batch_size], planes[batch_size:], torch.from_numpy(actions.astype(np.int64)),
+            torch.from_numpy(rewards), torch.from_numpy(dones.astype(np.float32)))
+
+
+def bench_replay(args):
+    """Replay buffer memory per transition and batch-64 sample+decode latency."""
+    from modern_ai import ReplayBuffer
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'buffer':<22}{'size':>10}{'bytes/transition':>18}{'sample p50':>12}{'p99':>10}")
+    for size in args.sizes:
+        kinds = [('packed ring', None)]
+        if size <= args.max_deque:
+            kinds.insert(0, ('deque of tensors (old)', None))
+        for label, _ in kinds:
+            tracemalloc.start()
+            if label == 'packed ring':
+                memory = ReplayBuffer(capacity=size, seed=args.seed)
+                bits = rng.integers(0, 2**63, size=(size, 4), dtype=np.uint64)
+                memory.push_many(bits[:, :2], rng.integers(0, 64, size), rng.random(size, dtype=np.float32),
+                                 bits[:, 2:], np.zeros(size))
+                del bits
+                sample = lambda: _sample_ring(memory, 64)  # noqa: E731
+            else:
+                memory = _fill_tensor_deque(size, rng)
+                sample = lambda: _sample_tensor_deque(memory, 64)  # noqa: E731
+            used = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            p50, p99 = _percentiles_us(sample, args.runs)
+            print(f"{label:<22}{size:>10,}{used / size:>18,.0f}{p50:>10.0f}us{p99:>8.0f}us")
+            del memory
+
+
+def _selfplay_transitions(games, seed):
+    """Random-play self-play transitions as (states, actions, rewards, next_states, dones) arrays."""
+    from board import Board
+    from game import Game
+    from modern_ai import ModernOthelloAI, SelfPlayTrainer
+
+    random.seed(seed)
+    np.random.seed(seed)
+    ai = ModernOthelloAI()
+    ai.epsilon = 1.0
+    ai.memory = type(ai.memory)(capacity=games * 64)
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    for _ in range(games):
+        trainer.play_game(training=True)
+    return ai.memory.get(np.arange(len(ai.memory)))
+
+
+def _heldout_mse(ai, heldout):
+    """MSE of Q(s, a) against the stored returns on held-out terminal transitions."""
+    import torch
+
+    states, actions, rewards, _, _ = heldout
+    ai.policy_net.eval()
+    with torch.inference_mode():
+        q = ai.policy_net(ai.bitboards_to_tensor(states[:, 0], states[:, 1])).cpu().numpy()
+    ai.policy_net.train()
+    return float(np.mean((q[np.arange(len(actions)), actions] - rewards) ** 2))
+
+
+def bench_per(args):
+    """Prioritized replay: sample/update cost at 1M capacity and held-out loss vs wall time."""
+    import torch
+    from modern_ai import ModernOthelloAI, PrioritizedReplayBuffer, ReplayBuffer
+
+    capacity = 1_000_000
+    rng = np.random.default_rng(args.seed)
+    bits = rng.integers(0, 2**63, size=(capacity, 2), dtype=np.uint64)
+    fill = (bits, rng.integers(0, 64, capacity), rng.random(capacity, dtype=np.float32), bits, np.zeros(capacity))
+    uniform = ReplayBuffer(capacity, seed=args.seed)
+    uniform.push_many(*fill)
+    per = PrioritizedReplayBuffer(capacity, seed=args.seed)
+    per.push_many(*fill)
+    per.update_priorities(np.arange(capacity), rng.exponential(size=capacity))
+    del bits, fill
+    print(f"⏱️  Batch-64 cost at {capacity:,} capacity")
+    rows = [
+        ('uniform sample', lambda: uniform.sample_indices(64)),
+        ('prioritized sample + IS', lambda: per.sample_prioritized(64)),
+        ('prioritized update', lambda: per.update_priorities(rng.integers(0, capacity, 64), rng.random(64))),
+    ]
+    for label, fn in rows:
+        p50, p99 = _percentiles_us(fn, args.runs)
+        print(f"  {label:<26}{p50:>8.0f}us p50{p99:>8.0f}us p99")
+
+    print(f"\n🎲 Generating {args.games} random self-play games...")
+    data = _selfplay_transitions(args.games, args.seed)
+    n = len(data[1])
+    split = int(n * 0.8)
+    train = tuple(a[:split] for a in data)
+    heldout = tuple(a[split:] for a in data)
+    print(f"📈 Held-out return MSE vs wall time ({split:,} train / {n - split:,} held-out transitions)")
+    checkpoints = [args.seconds * (i + 1) / 5 for i in range(5)]
+    print(f"{'replay':<14}" + ''.join(f"{t:>9.0f}s" for t in checkpoints) + f"{'steps':>9}")
+    for label, prioritized in (('uniform', False), ('prioritized', True)):
+        torch.manual_seed(args.seed)
+        ai = ModernOthelloAI(prioritized_replay=prioritized)
+        ai.memory = (PrioritizedReplayBuffer if prioritized else ReplayBuffer)(split, seed=args.seed)
+        ai.memory.push_many(*train)
+        ai.policy_net.train()
+        curve, steps = [], 0
+        start = time.perf_counter()
+        for checkpoint in checkpoints:
+            while time.perf_counter() - start < checkpoint:
+                ai.train_step()
+                steps += 1
+            curve.append(_heldout_mse(ai, heldout))
+        print(f"{label:<14}" + ''.join(f"{mse:>10.4f}" for mse in curve) + f"{steps:>9,}")
+
+
+def _sequential_run(seconds):
+    """SelfPlayTrainer.train's loop (one game, then 10 train steps) for `seconds`."""
+    from board import Board
+    from game import Game
+    from modern_ai import ModernOthelloAI, SelfPlayTrainer
+
+    ai = ModernOthelloAI()
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    games, steps, busy = 0, 0, 0.0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        trainer.play_game(training=True)
+        games += 1
+        if len(ai.memory) >= ai.batch_size:
+            t0 = time.perf_counter()
+            for _ in range(10):
+                ai.train_step()
+            busy += time.perf_counter() - t0
+            steps += 10
+    wall = time.perf_counter() - start
+    return games / wall, steps * ai.batch_size / wall, busy / wall
+
+
+def bench_actors(args):
+    """Self-play training throughput: sequential loop vs actor/learner by worker count."""
+    from actor_learner import ActorLearnerTrainer
+    from modern_ai import ModernOthelloAI
+
+    print(f"🖥️  {os.cpu_count()} CPUs, {args.seconds:.0f}s per run")
+    print(f"{'mode':<22}{'games/s':>10}{'samples/s':>12}{'learner busy':>14}")
+    games, samples, busy = _sequential_run(args.seconds)
+    print(f"{'sequential (old)':<22}{games:>10.2f}{samples:>12.0f}{busy:>14.0%}")
+    for workers in args.workers:
+        stats = ActorLearnerTrainer(ModernOthelloAI(), num_workers=workers, seed=args.seed).train(
+            seconds=args.seconds, report_interval=0)
+        print(f"{f'{workers} actor(s) + learner':<22}{stats['games_per_sec']:>10.2f}"
+              f"{stats['samples_per_sec']:>12.0f}{stats['utilisation']:>14.0%}")
+
+
+def bench_selfplay(args):
+    """Self-play positions/sec: one forward per move vs lockstep batched games."""
+    from batched_selfplay import BatchedSelfPlayTrainer
+    from board import Board
+    from game import Game
+    from modern_ai import ModernOthelloAI, ReplayBuffer, SelfPlayTrainer
+
+    ai = ModernOthelloAI()
+    ai.memory = ReplayBuffer(capacity=args.games * 64)
+    print(f"{'driver':<26}{'games':>7}{'positions/s':>14}{'games/s':>10}")
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    old_games = max(1, min(args.games, 50))
+    start = time.perf_counter()
+    for _ in range(old_games):
+        trainer.play_game(training=True)
+    wall = time.perf_counter() - start
+    base = len(ai.memory) / wall
+    print(f"{'play_game loop (old)':<26}{old_games:>7}{base:>14,.0f}{old_games / wall:>10.1f}")
+    for slots in args.slots:
+        ai.memory = ReplayBuffer(capacity=args.games * 64)
+        batched = BatchedSelfPlayTrainer(ai, num_slots=slots, seed=args.seed)
+        start = time.perf_counter()
+        batched.play_games(args.games)
+        wall = time.perf_counter() - start
+        rate = batched.positions / wall
+        print(f"{f'batched, {slots} slots':<26}{args.games:>7}{rate:>14,.0f}{args.games / wall:>10.1f}"
+              f"  ({rate / base:.1f}x)")
+
+
+def bench_augment(args):
+    """Symmetry augmentation: overhead per batch and held-out loss per training step."""
+    import torch
+    from modern_ai import ModernOthelloAI, ReplayBuffer, augment_batch
+
+    ai = ModernOthelloAI()
+    states = torch.rand(ai.batch_size, 3, 8, 8, device=ai.device).round()
+    actions = torch.randint(0, 64, (ai.batch_size,), device=ai.device)
+    aug_p50, aug_p99 = _percentiles_us(lambda: augment_batch(states, actions, states), args.runs)
+    print(f"⏱️  augment_batch({ai.batch_size}): {aug_p50:.0f}us p50, {aug_p99:.0f}us p99")
+
+    print(f"🎲 Generating {args.games} random self-play games...")
+    data = _selfplay_transitions(args.games, args.seed)
+    n = len(data[1])
+    split = int(n * 0.8)
+    train = tuple(a[:split] for a in data)
+    heldout = tuple(a[split:] for a in data)
+    print(f"📈 Held-out return MSE by training step ({split:,} train / {n - split:,} held-out transitions)")
+    checkpoints = [args.steps * (i + 1) // 5 for i in range(5)]
+    print(f"{'batches':<16}" + ''.join(f"{c:>10}" for c in checkpoints) + f"{'ms/step':>10}")
+    for label, augment in (('plain', False), ('augmented', True)):
+        torch.manual_seed(args.seed)
+        ai = ModernOthelloAI(augment_symmetries=augment)
+        ai.memory = ReplayBuffer(split, seed=args.seed)
+        ai.memory.push_many(*train)
+        ai.policy_net.train()
+        curve, steps, busy = [], 0, 0.0
+        for checkpoint in checkpoints:
+            start = time.perf_counter()
+            while steps < checkpoint:
+                ai.train_step()
+                steps += 1
+            busy += time.perf_counter() - start
+            curve.append(_heldout_mse(ai, heldout))
+        print(f"{label:<16}" + ''.join(f"{mse:>10.4f}" for mse in curve) + f"{busy / steps * 1000:>10.1f}")
+
+
+def _match(player, opponent, player_color):
+    """Play one game of `player` (choose_move(board, color, moves)) against a callable opponent."""
+    from board import Board
+    from game import Game
+
+    board = Board()
+    game = Game(board)
+    while not game.check_game_over():
+        moves = board.get_valid_moves(game.current_player)
+        if not moves:
+            game.switch_player()
+            continue
+        if game.current_player == player_color:
+            move = player(board, game.current_player, moves)
+        else:
+            move = opponent(board, game.current_player, moves)
+        board.place_disc(*move, game.current_player)
+        game.switch_player()
+    return game.winner()[0]
+
+
+def bench_mcts(args):
+    """PUCT search: network evals/sec and results against the classic 'hard' AI."""
+    from ai import choose_move as classic_move
+    from mcts import MCTSPlayer
+    from modern_ai import ModernOthelloAI
+
+    ai = ModernOthelloAI.for_inference(args.model, mmap=True) if args.model else ModernOthelloAI(inference_only=True)
+    hard = lambda board, color, moves: classic_move(board, color, 'hard')  # noqa: E731
+    print(f"🌲 PUCT vs classic 'hard', {args.matches} games per row "
+          f"({'checkpoint ' + args.model if args.model else 'untrained weights'})")
+    print(f"{'player':<18}{'W-D-L':>10}{'evals/s':>10}{'batch':>8}{'ms/move':>10}")
+    raw = {'W': 0, 'D': 0, 'L': 0}
+    for i in range(args.matches):
+        color = 'B' if i % 2 == 0 else 'W'
+        winner = _match(lambda board, c, moves: ai.choose_move(board, c, moves), hard, color)
+        raw['D' if winner is None else 'W' if winner == color else 'L'] += 1
+    print(f"{'raw Q argmax':<18}{raw['W']:>4}-{raw['D']}-{raw['L']:<3}")
+    for playouts in args.playouts:
+        player = MCTSPlayer.from_model(ai, playouts=playouts)
+        result = {'W': 0, 'D': 0, 'L': 0}
+        moves_played, search_time = 0, 0.0
+
+        def timed(board, color, moves):
+            nonlocal moves_played, search_time
+            start = time.perf_counter()
+            move = player.choose_move(board, color, moves)
+            search_time += time.perf_counter() - start
+            moves_played += 1
+            return move
+
+        for i in range(args.matches):
+            color = 'B' if i % 2 == 0 else 'W'
+            player.root = None
+            winner = _match(timed, hard, color)
+            result['D' if winner is None else 'W' if winner == color else 'L'] += 1
+        batch = player.evals / max(player.eval_batches, 1)
+        print(f"{f'PUCT {playouts} playouts':<18}{result['W']:>4}-{result['D']}-{result['L']:<3}"
+              f"{player.evals_per_second():>10,.0f}{batch:>8.1f}{search_time / moves_played * 1000:>10.0f}")
+
+
+def _anon_mb():
+    """Anonymous (heap) resident memory in MB; mapped file pages are reclaimable and not counted."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    return rss_mb()
+
+
+def bench_dataset(args):
+    """Sharded self-play dataset: write and shuffled read throughput, and reader memory."""
+    import shutil
+    import torch  # noqa: F401  (imported up front so it isn't counted in the first read)
+    from selfplay_dataset import RECORD_DTYPE, ShardDataset, ShardWriter
+
+    rng = np.random.default_rng(args.seed)
+    # Synthetic 60-ply games: record layout and I/O don't depend on the positions
+    me = rng.integers(0, 2**63, 60 * 1024, dtype=np.uint64)
+    opp = rng.integers(0, 2**63, 60 * 1024, dtype=np.uint64) & ~me
+    moves = rng.integers(0, 64, 60 * 1024).astype(np.int8)
+    print(f"{'positions':>12}{'MB':>8}{'write/s':>12}{'MB/s':>8}{'read/s':>12}{'batches/s':>11}{'heap +MB':>10}")
+    for size in args.sizes:
+        directory = tempfile.mkdtemp(prefix='othello_shards_')
+        try:
+            games = size // 60
+            start = time.perf_counter()
+            with ShardWriter(directory) as writer:
+                for g in range(games):
+                    s = (g % 1024) * 60
+                    writer.add_game(me[s:s + 60], opp[s:s + 60], moves[s:s + 60], g % 65 - 32)
+            write = time.perf_counter() - start
+            dataset = ShardDataset(directory)
+            before, peak = _anon_mb(), 0.0
+            start = time.perf_counter()
+            batches = 0
+            for _ in dataset.batches(batch_size=256, seed=args.seed):
+                batches += 1
+                if batches % 1000 == 0:
+                    peak = max(peak, _anon_mb() - before)
+            read = time.perf_counter() - start
+            mb = len(dataset) * RECORD_DTYPE.itemsize / 2**20
+            print(f"{len(dataset):>12,}{mb:>8.0f}{len(dataset) / write:>12,.0f}{mb / write:>8.0f}"
+                  f"{len(dataset) / read:>12,.0f}{batches / read:>11,.0f}{peak:>10.1f}")
+        finally:
+            shutil.rmtree(directory)
+
+
+def bench_qcache(args):
+    """Q-value cache: choose_move time and hit rate over repeated games against the classic AI."""
+    from ai import choose_move as classic_move
+    from modern_ai import ModernOthelloAI
+
+    # Both players are deterministic, so repeated games revisit the same positions,
+    # as in tournaments, analysis or a restarted game
+    hard = lambda board, color, moves: classic_move(board, color, 'hard')  # noqa: E731
+    print(f"♻️  {args.games} games vs classic 'hard' ({'checkpoint ' + args.model if args.model else 'untrained weights'})")
+    print(f"{'cache':<10}{'moves':>8}{'us/move':>10}{'hit rate':>10}{'entries':>10}")
+    for size in (0, 1024, 65536):
+        ai = ModernOthelloAI.for_inference(args.model, mmap=True, q_cache_size=size)
+        busy, moves_played = 0.0, 0
+
+        def timed(board, color, moves):
+            nonlocal busy, moves_played
+            start = time.perf_counter()
+            move = ai.choose_move(board, color, moves)
+            busy += time.perf_counter() - start
+            moves_played += 1
+            return move
+
+        for i in range(args.games):
+            _match(timed, hard, 'B' if i % 2 == 0 else 'W')
+        stats = ai.q_cache.stats() if ai.q_cache else {'hit_rate': 0.0, 'size': 0}
+        print(f"{size or 'off':<10}{moves_played:>8}{busy / moves_played * 1e6:>10.0f}"
+              f"{stats['hit_rate']:>10.1%}{stats['size']:>10}")
+
+
+_STARTUP_SCRIPTS = {
+    'torch': ("from modern_ai import ModernOthelloAI\n"
+              "ai = ModernOthelloAI.for_inference({path!r}, mmap=True)\n"),
+    'numpy': ("from numpy_inference import NumpyOthelloAI\n"
+              "ai = NumpyOthelloAI({path!r})\n"),
+}
+
+
+def bench_numpy(args):
+    """NumPy backend vs torch: batch-1 latency, and startup (fresh interpreter to first move)."""
+    import subprocess
+    import sys
+
+    import torch
+    from modern_ai import ModernOthelloAI, build_cpu_inference_net
+    from numpy_inference import NumpyQNetwork, export_npz
+
+    path = args.model
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'othello_model.pth')
+        _make_checkpoint(path)
+    npz = export_npz(path, os.path.join(tempfile.mkdtemp(), 'model.npz'))
+    ai = ModernOthelloAI.for_inference(path, mmap=False)
+    print(f"📦 {os.path.getsize(path) / 2**20:.1f} MB checkpoint -> {os.path.getsize(npz) / 2**20:.1f} MB .npz "
+          f"({ai.model_format} network)")
+    planes = encoding.encode_boards([b for b, _ in _random_boards(args.positions, args.seed)], 'B')
+    numpy_net = NumpyQNetwork(npz)
+    with torch.inference_mode():
+        expected = ai.policy_net(torch.from_numpy(planes)).numpy()
+    got = numpy_net(planes)
+    print(f"🎯 max |Q numpy - Q torch| = {np.abs(got - expected).max():.2e}, "
+          f"argmax agreement {(got.argmax(1) == expected.argmax(1)).mean():.1%}")
+
+    state = planes[:1]
+    tensor = torch.from_numpy(state)
+    optimised = build_cpu_inference_net(ai.policy_net)
+    print(f"{'backend':<22}{'p50 us':>10}{'p99 us':>10}")
+    with torch.inference_mode():
+        for label, fn in (('torch fp32', lambda: ai.policy_net(tensor)),
+                          ('torch cpu-optimised', lambda: optimised(tensor)),
+                          ('numpy', lambda: numpy_net(state))):
+            p50, p99 = _percentiles_us(fn, args.runs)
+            print(f"{label:<22}{p50:>10.0f}{p99:>10.0f}")
+
+    print(f"{'startup':<22}{'seconds':>10}{'RSS MB':>10}  (new interpreter: import, load, first move)")
+    root = os.path.dirname(os.path.abspath(__file__))
+    for backend, model in (('torch', path), ('numpy', npz)):
+        script = ("import time; start = time.perf_counter()\n" + _STARTUP_SCRIPTS[backend].format(path=model) +
+                  "from board import Board; board = Board()\n"
+                  "ai.choose_move(board, 'B', board.get_valid_moves('B'))\n"
+                  "from training_metrics import rss_mb\n"
+                  "print(time.perf_counter() - start, rss_mb())\n")
+        best = None
+        for _ in range(3):
+            out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=root)
+            seconds, rss = map(float, out.stdout.split()[-2:])
+            best = (seconds, rss) if best is None or seconds < best[0] else best
+        print(f"{backend:<22}{best[0]:>10.2f}{best[1]:>10.0f}")
+
+
+def bench_reload(args):
+    """Hot reload under load: swap latency, move latency around swaps and the memory of two models."""
+    import threading
+
+    import torch
+    from model_watcher import ModelWatcher, write_manifest
+    from modern_ai import ModernOthelloAI
+
+    directory = tempfile.mkdtemp()
+    paths = [args.model or os.path.join(directory, 'model_0.pth'), os.path.join(directory, 'model_1.pth')]
+    for i, path in enumerate(paths):
+        if not os.path.exists(path):
+            torch.manual_seed(args.seed + i)
+            ModernOthelloAI().save_model(path)
+    manifest = os.path.join(directory, 'current.json')
+    write_manifest(paths[0], manifest)
+    ai = ModernOthelloAI.for_inference(paths[0], mmap=False)
+    if ai.device.type == 'cpu':
+        ai.optimize_for_cpu()
+    watcher = ModelWatcher(ai, manifest)
+    moves = [(board, color, board.get_valid_moves(color)) for board, color in _random_boards(256, args.seed)]
+    moves = [m for m in moves if m[2]]
+    latencies, stop = [], threading.Event()
+
+    def play():
+        i = 0
+        while not stop.is_set():
+            board, color, valid = moves[i % len(moves)]
+            start = time.perf_counter()
+            ai.choose_move(board, color, valid)
+            latencies.append((start, time.perf_counter() - start))
+            i += 1
+
+    # One thread plays moves back to back while this one reloads, alternating the two checkpoints
+    player = threading.Thread(target=play)
+    player.start()
+    time.sleep(1.0)
+    rss = [rss_mb()]
+    reloads = 10
+    for i in range(reloads):
+        write_manifest(paths[(i + 1) % 2], manifest)
+        while len(watcher.swaps) <= i:
+            watcher.check()
+        time.sleep(0.3)
+        rss.append(rss_mb())
+    stop.set()
+    player.join()
+
+    swaps = watcher.swaps
+    windows = [(info['swapped_at'] - info['load_s'] - info['validate_s'], info['swapped_at']) for info in swaps]
+    during = [t for start, t in latencies if any(a <= start <= b for a, b in windows)]
+    steady = [t for start, t in latencies if not any(a - 0.05 <= start <= b + 0.05 for a, b in windows)]
+    print(f"🔄 {reloads} reloads of a {swaps[0]['old_mb']:.1f} MB {ai.model_format} network "
+          f"while another thread plays moves")
+    print(f"{'':<26}{'p50':>10}{'p99':>10}{'max':>10}")
+    for label, values, scale in (('swap (us)', [i['swap_us'] for i in swaps], 1),
+                                 ('load checkpoint (ms)', [i['load_s'] for i in swaps], 1e3),
+                                 ('canary batch (ms)', [i['validate_s'] for i in swaps], 1e3),
+                                 ('move, steady (us)', steady, 1e6),
+                                 ('move, during reload (us)', during, 1e6)):
+        values = np.array(values) * scale
+        print(f"{label:<26}{np.percentile(values, 50):>10.1f}{np.percentile(values, 99):>10.1f}{values.max():>10.1f}")
+    print(f"💾 Weights alive during a swap: {swaps[0]['old_mb'] + swaps[0]['peak_extra_mb']:.1f} MB (old + new); "
+          f"RSS +{rss[1] - rss[0]:.0f} MB at the first reload, then {(rss[-1] - rss[1]) / (reloads - 1):+.1f} MB per reload")
+
+
+def _serve_clients(socket_path, clients, seconds, seed):
+    """Client process: `clients` threads asking for moves back to back; returns their latencies (s)."""
+    import threading
+    from inference_server import InferenceClient
+
+    positions = [from_board(board, color) for board, color in _random_boards(256, seed)]
+    latencies = [[] for _ in range(clients)]
+    connections = [InferenceClient(socket_path) for _ in range(clients)]
+    deadline = time.perf_counter() + seconds
+
+    def run(i):
+        j = i
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            connections[i].best_move(*positions[j % len(positions)])
+            latencies[i].append(time.perf_counter() - start)
+            j += 1
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for connection in connections:
+        connection.close()
+    return np.concatenate([np.array(l) for l in latencies])
+
+
+def bench_serve(args):
+    """Inference server: throughput and latency for 1, 10 and 100 concurrent clients vs a model per game."""
+    import subprocess
+    import sys
+
+    import torch
+    from inference_server import InferenceClient, print_stats
+    from modern_ai import ModernOthelloAI
+
+    path = args.model
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'othello_model.pth')
+        _make_checkpoint(path)
+
+    # Baseline: every game holds its own model and runs batch-1 forwards
+    before = _anon_mb()
+    ai = ModernOthelloAI.for_inference(path, mmap=False)
+    if ai.device.type == 'cpu':
+        ai.optimize_for_cpu()
+    model_mb = _anon_mb() - before
+    positions = [from_board(board, color) for board, color in _random_boards(256, args.seed)]
+    with torch.inference_mode():
+        tensors = [ai.bitboards_to_tensor(np.array([me], dtype=np.uint64), np.array([opp], dtype=np.uint64))
+                   for me, opp in positions]
+        start, count = time.perf_counter(), 0
+        while time.perf_counter() - start < min(args.seconds, 5):
+            ai.play_net(tensors[count % len(tensors)])
+            count += 1
+    in_process = count / (time.perf_counter() - start)
+    print(f"🧠 {ai.model_format} model: {model_mb:.0f} MB heap per process; "
+          f"model per game, batch 1: {in_process:,.0f} moves/s on one core")
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'clients':>8}{'moves/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'mean batch':>12}{'server p99':>12}")
+    for clients in args.clients:
+        socket_path = os.path.join(tempfile.mkdtemp(), 'ai.sock')
+        server = subprocess.Popen([sys.executable, 'inference_server.py', '--model', path, '--socket', socket_path,
+                                   '--max-batch', str(args.max_batch), '--max-wait-ms', str(args.max_wait_ms)],
+                                  cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.05)
+            processes = min(clients, 4)
+            per_process = [clients // processes + (i < clients % processes) for i in range(processes)]
+            with ctx.Pool(processes) as pool:
+                results = pool.starmap(_serve_clients, [(socket_path, n, args.seconds, args.seed + i)
+                                                        for i, n in enumerate(per_process)])
+            latencies = np.concatenate(results) * 1000
+            with InferenceClient(socket_path) as client:
+                stats = client.stats()
+            print(f"{clients:>8}{len(latencies) / args.seconds:>10,.0f}{np.percentile(latencies, 50):>9.2f}"
+                  f"{np.percentile(latencies, 99):>9.2f}{stats['mean_batch']:>12.1f}"
+                  f"{stats['latency_ms']['p99']:>12.2f}")
+            if clients == args.clients[-1]:
+                print_stats(stats)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+# Trains with SelfPlayTrainer's loop (one game, 10 train steps, epsilon decay) and
+# plays an arena evaluation every eval_every games; only the training time is
+# counted.  Uses APIs that are the same in older trees, so --baseline can point
+# at a checkout of an earlier trainer.
+_TRAIN_TO_SCORE = """
+import json, random, sys, time
+import numpy as np, torch
+import ai as classic
+from arena import play_game, random_opening
+from board import Board
+from game import Game
+from modern_ai import ModernOthelloAI, SelfPlayTrainer
+
+seed, options, opponent, target, eval_every, eval_games, max_seconds = json.loads(sys.argv[1])
+random.seed(seed)
+np.random.seed(seed)
+torch.manual_seed(seed)
+torch.set_num_threads(1)
+ai = ModernOthelloAI(**options)
+ai.memory.rng = np.random.default_rng(seed)
+trainer = SelfPlayTrainer(ai, Board, Game)
+rng = random.Random(seed + 1)
+openings = [random_opening(rng, 4) for _ in range(eval_games // 2)]
+model = lambda board, color, moves: ai.choose_move(board, color, moves, training=False)
+other = lambda board, color, moves: classic.choose_move(board, color, opponent)
+train_seconds, episodes = 0.0, 0
+while train_seconds < max_seconds:
+    start = time.perf_counter()
+    for _ in range(eval_every):
+        trainer.play_game(training=True)
+        if len(ai.memory) >= ai.batch_size:
+            for _ in range(10):
+                ai.train_step()
+        ai.epsilon = max(0.01, ai.epsilon * 0.995)
+    train_seconds += time.perf_counter() - start
+    episodes += eval_every
+    ai.policy_net.eval()
+    points = 0.0
+    for opening in openings:
+        for black, white, color in ((model, other, 'B'), (other, model, 'W')):
+            winner, _ = play_game(black, white, opening)
+            points += 1.0 if winner == color else 0.5 if winner is None else 0.0
+    ai.policy_net.train()
+    score = points / (2 * len(openings))
+    print(json.dumps([episodes, train_seconds, score]), flush=True)
+    if score >= target:
+        break
+"""
+
+
+def bench_targets(args):
+    """DQN targets: training wall time until the model reaches a fixed arena score."""
+    import json
+    import subprocess
+    import sys
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    variants = [('masked', root, {}), ('masked + double', root, {'double_dqn': True})]
+    if args.baseline:
+        variants.insert(0, ('baseline', os.path.abspath(args.baseline), {}))
+    print(f"🎯 Training until a score of {args.target_score} against classic '{args.opponent}' "
+          f"({args.eval_games} games every {args.eval_every} self-play games, at most {args.seconds:.0f}s)")
+    print(f"{'trainer':<18}{'seed':>6}{'games':>8}{'train s':>10}{'score':>8}  curve (games: score)")
+    for label, tree, options in variants:
+        for seed in range(args.seed, args.seed + args.repeats):
+            config = [seed, options, args.opponent, args.target_score, args.eval_every, args.eval_games, args.seconds]
+            out = subprocess.run([sys.executable, '-c', _TRAIN_TO_SCORE, json.dumps(config)], cwd=tree,
+                                 capture_output=True, text=True)
+            curve = [json.loads(line) for line in out.stdout.splitlines() if line.startswith('[')]
+            if not curve:
+                print(f"{label:<18}{seed:>6}  failed: {out.stderr.strip().splitlines()[-1:]}")
+                continue
+            games, seconds, score = curve[-1]
+            reached = score >= args.target_score
+            print(f"{label:<18}{seed:>6}{games:>8}{seconds:>10.0f}{score:>8.2f}{'' if reached else ' (not reached)'}  "
+                  + ' '.join(f"{g}:{s:.2f}" for g, _, s in curve))
+
+
+SECTIONS = {
+    'actors': bench_actors,
+    'augment': bench_augment,
+    'cpu': bench_cpu,
+    'dataset': bench_dataset,
+    'encode': bench_encode,
+    'load': bench_load,
+    'mcts': bench_mcts,
+    'numpy': bench_numpy,
+    'per': bench_per,
+    'qcache': bench_qcache,
+    'reload': bench_reload,
+    'replay': bench_replay,
+    'selfplay': bench_selfplay,
+    'serve': bench_serve,
+    'targets': bench_targets,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neural AI benchmarks")
+    parser.add_argument('section', choices=sorted(SECTIONS))
+    parser.add_argument('--positions', type=int, default=4096)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', help="checkpoint for the cpu, mcts, qcache, numpy, reload and serve sections (default: untrained weights)")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="replay buffer sizes for the replay section / positions for the dataset section")
+    parser.add_argument('--games', type=int, default=300,
+                        help="self-play games for the per, selfplay and augment sections / games in the qcache section")
+    parser.add_argument('--steps', type=int, default=500, help="training steps per run in the augment section")
+    parser.add_argument('--seconds', type=float, default=30.0,
+                        help="training time per run in the per section / time per row in the serve section / "
+                             "training time limit in the targets section")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help="actor counts for the actors section")
+    parser.add_argument('--slots', type=int, nargs='+', default=[1, 16, 64, 256],
+                        help="parallel games for the selfplay section")
+    parser.add_argument('--matches', type=int, default=10, help="games per row in the mcts section")
+    parser.add_argument('--playouts', type=int, nargs='+', default=[50, 200, 800],
+                        help="playouts per move for the mcts section")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 100],
+                        help="concurrent clients for the serve section")
+    parser.add_argument('--max-batch', type=int, default=64, help="server batch limit in the serve section")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help="server batching wait in the serve section")
+    parser.add_argument('--baseline', metavar='DIR',
+                        help="checkout of an earlier trainer to compare against in the targets section")
+    parser.add_argument('--opponent', default='easy', help="classic AI difficulty for the targets section")
+    parser.add_argument('--target-score', type=float, default=0.8, help="arena score to reach in the targets section")
+    parser.add_argument('--eval-every', type=int, default=50, help="self-play games between evaluations (targets)")
+    parser.add_argument('--eval-games', type=int, default=100, help="games per evaluation in the targets section")
+    parser.add_argument('--repeats', type=int, default=1, help="seeds per trainer in the targets section")
+    parser.add_argument('--max-deque', type=int, default=100000,
+                        help="largest size at which to also build the old deque buffer")
+    args = parser.parse_args()
+    SECTIONS[args.section](args)
+
+
+if __name__ == "__main__":
+    main()
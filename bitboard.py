@@ -0,0 +1,248 @@
+"""
+Bitboard helpers for Othello
+
+A position is a pair of 64-bit masks (player, opponent) with square
+(row, col) stored at bit row * 8 + col.  Every function works both on plain
+Python ints and on NumPy uint64 arrays, so the same code backs the scalar
+search and the vectorized batch tools.
+"""
+
+FULL = 0xFFFFFFFFFFFFFFFF
+COL_A = 0x0101010101010101   # col 0
+COL_H = 0x8080808080808080   # col 7
+ROW_1 = 0x00000000000000FF   # row 0
+ROW_8 = 0xFF00000000000000   # row 7
+NOT_A = FULL ^ COL_A
+NOT_H = FULL ^ COL_H
+CORNERS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+
+# (shift, mask) for the 8 directions, in the order of constants.DIRECTIONS:
+# N, NE, E, SE, S, SW, W, NW.  Positive shifts move bits left (towards row 7).
+_DIRECTIONS = (
+    (-8, FULL), (-7, NOT_A), (1, NOT_A), (9, NOT_A),
+    (8, FULL), (7, NOT_H), (-1, NOT_H), (-9, NOT_H),
+)
+
+# Squares whose neighbour in each direction is off the board
+_EDGES = (
+    ROW_1, ROW_1 | COL_H, COL_H, ROW_8 | COL_H,
+    ROW_8, ROW_8 | COL_A, COL_A, ROW_1 | COL_A,
+)
+
+
+def _shift(x, direction):
+    """Move every bit one square in `direction` (index into _DIRECTIONS)."""
+    n, mask = _DIRECTIONS[direction]
+    if n > 0:
+        return (x << n) & mask
+    return (x >> -n) & mask
+
+
+def _opposite(direction):
+    return (direction + 4) % 8
+
+
+def _select(cond, x):
+    """x where cond is non-zero, else 0 (elementwise for arrays)."""
+    if isinstance(cond, int):
+        return x if cond else 0
+    import numpy as np
+    return np.where(cond != 0, x, np.uint64(0)).astype(np.uint64)
+
+
+def _same(a, b):
+    if isinstance(a, int):
+        return a == b
+    return bool((a == b).all())
+
+
+def popcount(x):
+    """Number of set bits (elementwise for arrays)."""
+    if isinstance(x, int):
+        return x.bit_count()
+    import numpy as np
+    x = x - ((x >> 1) & 0x5555555555555555)
+    x = (x & 0x3333333333333333) + ((x >> 2) & 0x3333333333333333)
+    x = (x + (x >> 4)) & 0x0F0F0F0F0F0F0F0F
+    return ((x * np.uint64(0x0101010101010101)) >> 56).astype(np.int64)
+
+
+def square_bit(row, col):
+    return 1 << (row * 8 + col)
+
+
+def from_board(board, color):
+    """Return (player, opponent) masks for `color` on a board.Board."""
+    me = opp = 0
+    bit = 1
+    for row in board.grid:
+        for cell in row:
+            if cell is not None:
+                if cell == color:
+                    me |= bit
+                else:
+                    opp |= bit
+            bit <<= 1
+    return me, opp
+
+
+def random_position(rng, min_plies=8, max_plies=44):
+    """Play random legal moves from the start position; return (board.Board, color to move)."""
+    from board import Board
+    board = Board()
+    color = 'B'
+    for _ in range(rng.randint(min_plies, max_plies)):
+        moves = board.get_valid_moves(color)
+        if not moves:
+            color = 'W' if color == 'B' else 'B'
+            moves = board.get_valid_moves(color)
+            if not moves:
+                break
+        r, c = rng.choice(moves)
+        board.place_disc(r, c, color)
+        color = 'W' if color == 'B' else 'B'
+    return board, color
+
+
+def iter_squares(x):
+    """Yield the square index of every set bit of a Python int, low to high."""
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+
+def legal_moves(me, opp):
+    """Mask of empty squares where `me` flips at least one disc."""
+    empty = ~(me | opp) & FULL
+    moves = 0
+    for d in range(8):
+        t = _shift(me, d) & opp
+        for _ in range(5):
+            t |= _shift(t, d) & opp
+        moves |= _shift(t, d) & empty
+    return moves
+
+
+def flips(me, opp, move_bit):
+    """Mask of opponent discs flipped when `me` plays the square `move_bit`."""
+    flipped = 0
+    for d in range(8):
+        t = _shift(move_bit, d) & opp
+        for _ in range(5):
+            t |= _shift(t, d) & opp
+        flipped |= _select(_shift(t, d) & me, t)
+    return flipped
+
+
+def play(me, opp, move_bit):
+    """Play `move_bit` for `me`; return the new (opponent, player) pair, i.e. side to move swapped."""
+    f = flips(me, opp, move_bit)
+    return opp ^ f, me | f | move_bit
+
+
+def _line_masks():
+    """Masks of every line on the 4 axes (N-S, NE-SW, E-W, SE-NW)."""
+    axes = ([], [], [], [])
+    for i in range(8):
+        axes[0].append(sum(1 << (r * 8 + i) for r in range(8)))
+        axes[2].append(sum(1 << (i * 8 + c) for c in range(8)))
+    for k in range(15):
+        axes[1].append(sum(1 << (r * 8 + k - r) for r in range(8) if 0 <= k - r < 8))
+        axes[3].append(sum(1 << (r * 8 + r - k + 7) for r in range(8) if 0 <= r - k + 7 < 8))
+    return axes
+
+
+_AXIS_LINES = _line_masks()
+
+
+def _full_lines(occupied):
+    """Masks of squares whose whole line is filled, for the 4 axes (N-S, NE-SW, E-W, SE-NW)."""
+    full = []
+    for lines in _AXIS_LINES:
+        f = 0
+        for line in lines:
+            f |= _select((occupied & line) == line, line)
+        full.append(f)
+    return full
+
+
+def stable_discs(me, opp):
+    """Mask of `me` discs that can never be flipped.
+
+    A disc is stable when, along each of the 4 axes, its line is completely
+    filled or one of its neighbours on that axis is the board edge or an
+    already stable disc of the same colour.  Seeds come from corners and full
+    lines and are propagated to a fixed point.
+    """
+    full = _full_lines(me | opp)
+    # Corners are always stable; edges and full lines then anchor the rest
+    stable = me & CORNERS
+    while True:
+        new = me
+        for d in range(4):
+            back = _opposite(d)
+            new = new & (full[d] | _EDGES[d] | _EDGES[back]
+                         | _shift(stable, d) | _shift(stable, back))
+        new = new | stable
+        if _same(new, stable):
+            return stable
+        stable = new
+
+
+def flip_vertical(x):
+    """Mirror rows (row r -> 7 - r)."""
+    x = ((x >> 8) & 0x00FF00FF00FF00FF) | ((x & 0x00FF00FF00FF00FF) << 8)
+    x = ((x >> 16) & 0x0000FFFF0000FFFF) | ((x & 0x0000FFFF0000FFFF) << 16)
+    return ((x >> 32) | (x << 32)) & FULL
+
+
+def mirror_horizontal(x):
+    """Mirror columns (col c -> 7 - c)."""
+    x = ((x >> 1) & 0x5555555555555555) | ((x & 0x5555555555555555) << 1)
+    x = ((x >> 2) & 0x3333333333333333) | ((x & 0x3333333333333333) << 2)
+    return ((x >> 4) & 0x0F0F0F0F0F0F0F0F) | ((x & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def transpose(x):
+    """Mirror along the main diagonal ((r, c) -> (c, r))."""
+    t = 0x0F0F0F0F00000000 & (x ^ (x << 28))
+    x = x ^ t ^ (t >> 28)
+    t = 0x3333000033330000 & (x ^ (x << 14))
+    x = x ^ t ^ (t >> 14)
+    t = 0x5500550055005500 & (x ^ (x << 7))
+    return (x ^ t ^ (t >> 7)) & FULL
+
+
+def transform(x, t):
+    """Apply symmetry t (0..7) of the board: bit 2 transposes, bit 1 flips rows, bit 0 flips columns."""
+    if t & 4:
+        x = transpose(x)
+    if t & 2:
+        x = flip_vertical(x)
+    if t & 1:
+        x = mirror_horizontal(x)
+    return x
+
+
+def _inverse_transforms():
+    probe = 0x0000000000000107   # asymmetric pattern
+    return tuple(next(u for u in range(8) if transform(transform(probe, t), u) == probe) for t in range(8))
+
+
+INVERSE_TRANSFORM = _inverse_transforms()
+
+
+def transform_square(sq, t):
+    """Square index of `sq` after applying symmetry t."""
+    return transform(1 << sq, t).bit_length() - 1
+
+
+def canonical(me, opp):
+    """Smallest (player, opponent) pair over the 8 symmetries, and the symmetry used."""
+    best = (me, opp, 0)
+    for t in range(1, 8):
+        m, o = transform(me, t), transform(opp, t)
+        if (m, o) < best[:2]:
+            best = (m, o, t)
+    return best
@@ -60,7 +60,12 @@ def build_executable():
     if not os.path.exists("game_settings.json"):
         cmd = [c for c in cmd if not c.startswith("--add-data")]
         print("ℹ️  Building without settings file")
-    
+
+    # An exported .npz model (numpy_inference.py) plays without PyTorch, so leave it out
+    if os.path.exists("othello_model_final.npz"):
+        cmd[-1:-1] = ["--add-data=othello_model_final.npz;.", "--exclude-module=torch"]
+        print("ℹ️  Bundling othello_model_final.npz for the NumPy AI backend (PyTorch excluded)")
+
     try:
         subprocess.check_call(cmd)
         print("✓ Executable built successfully!")
@@ -72,6 +77,21 @@ def build_executable():
         print("✗ PyInstaller command not found. Try reinstalling PyInstaller.")
         return False
 
+def check_numpy_backend():
+    """Run the built executable's AI self-check: the bundled .npz must load on the NumPy backend"""
+    exe = os.path.join("dist", "Othello.exe" if os.name == "nt" else "Othello")
+    print("\n🔍 Checking that the executable loads the bundled model...")
+    try:
+        result = subprocess.run([exe, "--check-ai", "numpy"], timeout=300)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"✗ Could not run {exe}: {e}")
+        return False
+    if result.returncode != 0:
+        print("✗ The executable did not load othello_model_final.npz with the NumPy backend")
+        return False
+    print("✓ The executable plays with the bundled NumPy model")
+    return True
+
 def cleanup_build_files():
     """Clean up temporary build files"""
     print("\n🧹 Cleaning up build files...")
@@ -166,6 +186,9 @@ def main():
     if not build_executable():
         print("\n❌ Build process failed. Please check the errors above.")
         return
+    if os.path.exists("othello_model_final.npz") and not check_numpy_backend():
+        print("\n❌ The executable would fall back to the classic AI. Please check the errors above.")
+        return
     
     # Step 4: Create distribution files
     print("\n📄 Creating distribution files...")
@@ -0,0 +1,206 @@
+"""
+Distil the neural AI into a small network for low-latency CPU play
+
+A SmallOthelloNetwork student (modern_ai.MODEL_FORMATS['small']) is trained
+to reproduce the teacher's Q-values on self-play positions: mean squared
+error on the legal squares plus a KL term between the softmax over legal
+moves of both networks, which is what decides the move played.  Positions
+come from a selfplay_dataset directory, or are generated by teacher
+self-play.  The result is an ordinary checkpoint that ModernOthelloAI (and
+main.py) loads like any other.
+
+    python distill.py --teacher othello_model_final.pth --games 2000 --out othello_model_small.pth
+    python distill.py --teacher othello_model_final.pth --dataset data/selfplay --epochs 2
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from batched_selfplay import BatchedSelfPlayTrainer
+from bitboard import legal_moves
+from encoding import decode_planes, encode_bitboards, unpack_bits
+from modern_ai import ModernOthelloAI, ReplayBuffer, build_cpu_inference_net
+from selfplay_dataset import ShardDataset, ShardWriter
+
+
+def legal_mask(planes):
+    """(N, 64) bool tensor of legal moves for the side to move in encoded (N, 3, 8, 8) planes."""
+    me, opp = decode_planes(planes.cpu().numpy())
+    mask = unpack_bits(legal_moves(me, opp)).astype(bool)
+    return torch.from_numpy(mask).to(planes.device)
+
+
+def selfplay_positions(teacher, games, seed=0, epsilon=0.25, directory=None):
+    """Play `games` teacher self-play games (epsilon-greedy for variety).
+
+    Positions go to the sharded dataset in `directory` if given; returns the
+    (me, opp) uint64 arrays of every position played.
+    """
+    epsilon, teacher.epsilon = teacher.epsilon, epsilon
+    memory, teacher.memory = teacher.memory, ReplayBuffer(capacity=games * 60)
+    try:
+        selfplay = BatchedSelfPlayTrainer(teacher, num_slots=min(256, games), seed=seed)
+        if directory is not None:
+            with ShardWriter(directory) as writer:
+                selfplay.dataset = writer
+                selfplay.play_games(games)
+        else:
+            selfplay.play_games(games)
+        states = teacher.memory.states[:len(teacher.memory)]
+        return states[:, 0].copy(), states[:, 1].copy()
+    finally:
+        teacher.epsilon, teacher.memory = epsilon, memory
+
+
+def distill_loss(student_q, teacher_q, mask, temperature=0.03):
+    """Masked Q-value MSE plus KL(teacher || student) of the move softmax over legal squares."""
+    mse = ((student_q - teacher_q) ** 2 * mask).sum() / mask.sum()
+    student_logp = F.log_softmax((student_q / temperature).masked_fill(~mask, -1e9), dim=1)
+    teacher_p = F.softmax((teacher_q / temperature).masked_fill(~mask, -1e9), dim=1)
+    kl = (teacher_p * (torch.log(teacher_p + 1e-12) - student_logp) * mask).sum(1).mean()
+    return mse + kl
+
+
+def distill(teacher, student, dataset, epochs=2, batch_size=256, temperature=0.03, seed=0, report_every=200):
+    """Train `student` on every position of a ShardDataset for `epochs` passes; returns the mean loss per epoch."""
+    teacher.policy_net.eval()
+    student.policy_net.train()
+    device = student.device
+    history = []
+    for epoch in range(epochs):
+        losses = []
+        start = time.perf_counter()
+        for batch in dataset.batches(batch_size=batch_size, seed=seed + epoch, device=device):
+            planes = batch.planes
+            with torch.no_grad():
+                target = teacher.policy_net(planes.to(teacher.device)).to(device)
+            loss = distill_loss(student.policy_net(planes), target, legal_mask(planes), temperature)
+            student.optimizer.zero_grad()
+            loss.backward()
+            student.optimizer.step()
+            losses.append(loss.item())
+            if report_every and len(losses) % report_every == 0:
+                print(f"   epoch {epoch + 1} | batch {len(losses)} | loss {np.mean(losses[-report_every:]):.5f} | "
+                      f"{len(losses) * batch_size / (time.perf_counter() - start):,.0f} positions/s")
+        history.append(float(np.mean(losses)) if losses else 0.0)
+        print(f"📉 Epoch {epoch + 1}/{epochs}: loss {history[-1]:.5f}")
+    student.policy_net.eval()
+    student.target_net.load_state_dict(student.policy_net.state_dict())
+    return history
+
+
+def _latency_us(net, runs):
+    state = torch.zeros(1, 3, 8, 8)
+    times = []
+    with torch.inference_mode():
+        for _ in range(10):
+            net(state)
+        for _ in range(runs):
+            start = time.perf_counter()
+            net(state)
+            times.append(time.perf_counter() - start)
+    return np.percentile(times, 50) * 1e6, np.percentile(times, 99) * 1e6
+
+
+def _state_dict_bytes(net):
+    buffer = io.BytesIO()
+    torch.save(net.state_dict(), buffer)
+    return buffer.tell()
+
+
+def compare_models(teacher, student, me, opp, runs=300):
+    """Size, batch-1 CPU latency and move agreement of two ModernOthelloAI models.
+
+    Agreement is measured on the positions (me, opp) with at least two legal
+    moves: the share where both networks pick the same legal move.
+    Returns {'teacher': {...}, 'student': {...}, 'agreement': float, 'positions': int}.
+    """
+    legal = unpack_bits(legal_moves(me, opp)).astype(bool)
+    keep = legal.sum(1) >= 2
+    planes = torch.from_numpy(encode_bitboards(me[keep], opp[keep]))
+    legal = torch.from_numpy(legal[keep])
+    report = {'positions': int(keep.sum())}
+    picks = []
+    for name, model in (('teacher', teacher), ('student', student)):
+        net = model.policy_net.cpu().eval()
+        with torch.inference_mode():
+            q = torch.cat([net(chunk) for chunk in planes.split(1024)])
+        picks.append(q.masked_fill(~legal, -np.inf).argmax(1))
+        fp32 = _latency_us(net, runs)
+        optimised = _latency_us(build_cpu_inference_net(net), runs)
+        report[name] = {
+            'format': model.model_format,
+            'parameters': sum(p.numel() for p in net.parameters()),
+            'bytes': _state_dict_bytes(net),
+            'fp32_p50_us': fp32[0], 'fp32_p99_us': fp32[1],
+            'cpu_p50_us': optimised[0], 'cpu_p99_us': optimised[1],
+        }
+        net.to(model.device)
+    report['agreement'] = float((picks[0] == picks[1]).float().mean())
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 Teacher vs student ({report['positions']:,} held-out positions with a choice of moves)")
+    print(f"{'model':<10}{'format':>8}{'params':>12}{'size KB':>10}"
+          f"{'fp32 p50':>10}{'p99':>8}{'cpu p50':>10}{'p99':>8}  (us, batch 1)")
+    for name in ('teacher', 'student'):
+        r = report[name]
+        print(f"{name:<10}{r['format']:>8}{r['parameters']:>12,}{r['bytes'] / 1024:>10.0f}"
+              f"{r['fp32_p50_us']:>10.0f}{r['fp32_p99_us']:>8.0f}{r['cpu_p50_us']:>10.0f}{r['cpu_p99_us']:>8.0f}")
+    t, s = report['teacher'], report['student']
+    print(f"🎯 Move agreement: {report['agreement']:.1%} | {t['parameters'] / s['parameters']:.0f}x fewer parameters | "
+          f"{t['cpu_p50_us'] / s['cpu_p50_us']:.1f}x faster (cpu p50)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil a trained model into a small, fast network")
+    parser.add_argument('--teacher', default='othello_model_final.pth')
+    parser.add_argument('--out', default='othello_model_small.pth')
+    parser.add_argument('--dataset', metavar='DIR', help="selfplay_dataset directory to train on")
+    parser.add_argument('--games', type=int, default=2000,
+                        help="teacher self-play games to generate when no --dataset is given")
+    parser.add_argument('--heldout-games', type=int, default=200, help="fresh games for the agreement report")
+    parser.add_argument('--channels', type=int, default=32, help="student convolution width")
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--lr', type=float, default=0.003)
+    parser.add_argument('--temperature', type=float, default=0.03, help="softmax temperature of the move-choice term")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report-only', action='store_true', help="compare --teacher with an existing --out")
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    teacher = ModernOthelloAI.for_inference(args.teacher, mmap=False)
+    if args.report_only:
+        student = ModernOthelloAI.for_inference(args.out, mmap=False)
+    else:
+        student = ModernOthelloAI(model_format='small', model_options={'channels': args.channels},
+                                  learning_rate=args.lr)
+        student.epsilon = teacher.epsilon
+        if args.dataset:
+            dataset = ShardDataset(args.dataset)
+        else:
+            directory = tempfile.mkdtemp(prefix='othello_distill_')
+            print(f"🎲 Generating {args.games} teacher self-play games...")
+            selfplay_positions(teacher, args.games, seed=args.seed, directory=directory)
+            dataset = ShardDataset(directory)
+        print(f"🧪 Distilling into a {args.channels}-channel student on {len(dataset):,} positions")
+        distill(teacher, student, dataset, epochs=args.epochs, batch_size=args.batch_size,
+                temperature=args.temperature, seed=args.seed)
+        student.save_model(args.out)
+        print(f"💾 {os.path.getsize(args.out) / 1024:.0f} KB checkpoint (teacher: "
+              f"{os.path.getsize(args.teacher) / 1024:.0f} KB)")
+    me, opp = selfplay_positions(teacher, args.heldout_games, seed=args.seed + 1)
+    print_report(compare_models(teacher, student, me, opp))
+
+
+if __name__ == "__main__":
+    main()
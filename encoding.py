@@ -0,0 +1,73 @@
+"""
+Board encoders for the neural AI
+
+Positions are turned into 3 float32 planes of 8x8:
+    0: current player's discs
+    1: opponent's discs
+    2: empty squares
+Everything here is plain NumPy so the encoders can be shared by the PyTorch
+model, batch tools and torch-free inference.
+"""
+
+import numpy as np
+
+_EMPTY = ord('.')
+
+
+def _cells(boards):
+    """(N, 64) uint8 array of disc characters ('B', 'W', '.') for a list of boards."""
+    text = ''.join([cell or '.' for board in boards for row in board.grid for cell in row])
+    return np.frombuffer(text.encode('ascii'), dtype=np.uint8).reshape(len(boards), 64)
+
+
+def encode_boards(boards, players, out=None):
+    """Encode N boards into an (N, 3, 8, 8) float32 array.
+
+    `players` gives the side to move for each board (a single colour is
+    broadcast).  Pass a preallocated `out` array to avoid allocation.
+    """
+    cells = _cells(boards)
+    if isinstance(players, str):
+        codes = np.full((len(boards), 1), ord(players), dtype=np.uint8)
+    else:
+        codes = np.frombuffer(''.join(players).encode('ascii'), dtype=np.uint8).reshape(-1, 1)
+    if out is None:
+        out = np.empty((len(boards), 3, 8, 8), dtype=np.float32)
+    planes = out.reshape(len(boards), 3, 64)
+    mine = cells == codes
+    empty = cells == _EMPTY
+    planes[:, 0] = mine
+    planes[:, 1] = ~(mine | empty)
+    planes[:, 2] = empty
+    return out
+
+
+def board_planes(board, player):
+    """Encode one board as a (3, 8, 8) float32 array."""
+    return encode_boards([board], player)[0]
+
+
+def unpack_bits(masks):
+    """(N, 64) uint8 0/1 array of square occupancy from uint64 masks (square = row * 8 + col)."""
+    masks = np.ascontiguousarray(masks, dtype='<u8').reshape(-1)
+    return np.unpackbits(masks.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+
+
+def encode_bitboards(me, opp, out=None):
+    """Encode (player, opponent) uint64 mask arrays into an (N, 3, 8, 8) float32 array."""
+    mine = unpack_bits(me)
+    theirs = unpack_bits(opp)
+    if out is None:
+        out = np.empty((len(mine), 3, 8, 8), dtype=np.float32)
+    planes = out.reshape(len(mine), 3, 64)
+    planes[:, 0] = mine
+    planes[:, 1] = theirs
+    planes[:, 2] = 1 - (mine | theirs)
+    return out
+
+
+def decode_planes(planes):
+    """(player, opponent) uint64 mask arrays of encoded (N, 3, 8, 8) planes (inverse of encode_bitboards)."""
+    bits = (np.asarray(planes)[:, :2].reshape(-1, 2, 64) > 0).astype(np.uint8)
+    masks = np.packbits(bits, axis=2, bitorder='little').view('<u8')[..., 0]
+    return masks[:, 0].copy(), masks[:, 1].copy()
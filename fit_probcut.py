@@ -0,0 +1,123 @@
+"""
+Fit Multi-ProbCut parameters for the classic alpha-beta search.
+
+For random midgame positions a shallow and a deep search are run with the
+full window; the (shallow score, deep score) pairs are appended to a CSV log
+and a linear model  deep = a * shallow + b  (residual std = sigma) is fitted
+for every (deep, shallow) depth pair used by ai.DEFAULT_PROBCUT_PARAMS.
+The result is written to probcut_params.json, which ai.py loads at import.
+
+Usage:
+    python fit_probcut.py --positions 200
+    python fit_probcut.py --fit-only          # refit from the existing log
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+
+import numpy as np
+
+import ai
+from bitboard import random_position
+
+DEFAULT_LOG = 'probcut_pairs.csv'
+
+
+def collect_pairs(num_positions, depth_pairs, log_path=DEFAULT_LOG, seed=None):
+    """Search random positions at every (deep, shallow) pair and append the scores to `log_path`."""
+    rng = random.Random(seed)
+    shallow_depths = sorted({s for _, s in depth_pairs})
+    deep_depths = sorted({d for d, _ in depth_pairs})
+    new_file = not os.path.exists(log_path)
+    with open(log_path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(['discs', 'depth', 'score'])
+        collected = 0
+        while collected < num_positions:
+            board, color = random_position(rng)
+            if not board.get_valid_moves(color):
+                continue
+            discs = sum(cell is not None for row in board.grid for cell in row)
+            for depth in sorted(set(shallow_depths) | set(deep_depths)):
+                score, _ = ai._negamax(board, color, depth, -ai.INF, ai.INF)
+                writer.writerow([discs, depth, score])
+            collected += 1
+            if collected % 10 == 0:
+                print(f"   {collected}/{num_positions} positions searched")
+    return collected
+
+
+def load_pairs(log_path=DEFAULT_LOG):
+    """Read the score log back as {position_index: {depth: score}}."""
+    positions = []
+    current = {}
+    with open(log_path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            depth = int(row['depth'])
+            # Each position logs its depths in increasing order; a repeated
+            # depth marks the start of the next position.
+            if depth in current:
+                positions.append(current)
+                current = {}
+            current[depth] = float(row['score'])
+    if current:
+        positions.append(current)
+    return positions
+
+
+def fit(positions, depth_pairs):
+    """Least-squares fit of deep = a*shallow + b for each depth pair.
+
+    Returns {deep: [(shallow, a, b, sigma), ...]} ready for ai.PROBCUT_PARAMS.
+    """
+    params = {}
+    for deep, shallow in depth_pairs:
+        xs = np.array([p[shallow] for p in positions if shallow in p and deep in p])
+        ys = np.array([p[deep] for p in positions if shallow in p and deep in p])
+        if len(xs) < 10:
+            print(f"⚠️  Only {len(xs)} samples for depth {deep}/{shallow}, keeping defaults")
+            continue
+        a, b = np.polyfit(xs, ys, 1)
+        sigma = float(np.std(ys - (a * xs + b)))
+        params.setdefault(deep, []).append((shallow, float(a), float(b), sigma))
+        corr = float(np.corrcoef(xs, ys)[0, 1])
+        print(f"   depth {deep} <- {shallow}: a={a:.3f} b={b:.2f} sigma={sigma:.2f} r={corr:.3f} (n={len(xs)})")
+    for deep in params:
+        params[deep].sort()
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit Multi-ProbCut parameters for ai.py")
+    parser.add_argument('--positions', type=int, default=100, help="number of random positions to search")
+    parser.add_argument('--max-depth', type=int, default=6, help="deepest search depth to fit")
+    parser.add_argument('--log', default=DEFAULT_LOG, help="CSV log of searched scores")
+    parser.add_argument('--output', default=ai.PROBCUT_PARAMS_FILE, help="parameter file written for ai.py")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--fit-only', action='store_true', help="skip searching, refit from the log")
+    args = parser.parse_args()
+
+    depth_pairs = [(deep, shallow)
+                   for deep, checks in ai.DEFAULT_PROBCUT_PARAMS.items() if deep <= args.max_depth
+                   for shallow, _, _, _ in checks]
+
+    if not args.fit_only:
+        print(f"🔍 Searching {args.positions} positions at depths up to {args.max_depth}...")
+        collect_pairs(args.positions, depth_pairs, args.log, args.seed)
+
+    print(f"📈 Fitting ProbCut regressions from {args.log}...")
+    params = fit(load_pairs(args.log), depth_pairs)
+    # Depths that could not be fitted keep their defaults
+    merged = dict(ai.DEFAULT_PROBCUT_PARAMS)
+    merged.update(params)
+    with open(args.output, 'w') as f:
+        json.dump({'params': {str(d): checks for d, checks in sorted(merged.items())}}, f, indent=2)
+    print(f"💾 ProbCut parameters saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Shared, dynamically batched inference for many concurrent AI games
+
+One InferenceServer process holds the model; game processes connect with
+InferenceClient over a Unix socket and send positions as (player, opponent)
+bitboards.  The server gathers requests from all connections into one batch
+until it holds `max_batch` positions, every playing client is waiting or
+the oldest request has waited `max_wait_ms`, runs a single forward pass and
+answers each request with its 64 Q-values or its best legal move.
+
+    python inference_server.py --model othello_model_final.pth --socket /tmp/othello_ai.sock
+    python inference_server.py --stats --socket /tmp/othello_ai.sock
+
+Wire format (little endian): a request is REQUEST (me u64, opp u64, kind u8).
+KIND_Q is answered with 64 float32, KIND_MOVE with one int8 square (-1 when
+there is no legal move) and KIND_STATS with a u32 length and stats() as JSON.
+Any other kind closes the connection that sent it.
+"""
+
+import argparse
+import json
+import os
+import selectors
+import socket
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from bitboard import from_board, legal_moves
+from encoding import encode_bitboards, unpack_bits
+
+REQUEST = struct.Struct('<QQB')
+KIND_Q, KIND_MOVE, KIND_STATS = 0, 1, 2
+KINDS = (KIND_Q, KIND_MOVE, KIND_STATS)
+Q_BYTES = 64 * 4
+DEFAULT_SOCKET = '/tmp/othello_ai.sock'
+
+
+class InferenceServer:
+    """Serve one ModernOthelloAI model to every client connected to `socket_path`
+
+    A client counts as playing while it has sent a Q or move request within
+    the last `idle_ms`; only playing clients hold a batch back from flushing
+    early, so idle and stats-only connections never delay anyone.
+    """
+
+    def __init__(self, model_path, socket_path=DEFAULT_SOCKET, max_batch=64, max_wait_ms=2.0,
+                 optimize_cpu=True, watch_interval=None, latency_window=100000, idle_ms=50.0):
+        import torch
+        from modern_ai import ModernOthelloAI
+
+        self.torch = torch
+        # Private weights: with --watch (and --no-cpu-optimize) the file may be rewritten under us
+        self.ai = ModernOthelloAI.for_inference(model_path, mmap=False)
+        if optimize_cpu and self.ai.device.type == 'cpu':
+            self.ai.optimize_for_cpu()
+        self.watcher = None
+        if watch_interval:
+            from model_watcher import ModelWatcher
+            self.watcher = ModelWatcher(self.ai, model_path, interval=watch_interval)
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.idle = max(idle_ms / 1000, self.max_wait)
+        self._planes = np.empty((max_batch, 3, 8, 8), dtype=np.float32)
+        self.latencies = deque(maxlen=latency_window)   # seconds, request parsed -> reply sent
+        self.batch_counts = np.zeros(max_batch + 1, dtype=np.int64)
+        self.forward_seconds = 0.0
+        self.clients = 0
+        self._last_request = {}   # conn -> arrival of its latest Q/move request
+        self._running = False
+        self._listener = None
+
+    def serve_forever(self):
+        """Accept clients and answer requests until stop() (or Ctrl+C)."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        self._listener.listen(256)
+        selector = selectors.DefaultSelector()
+        selector.register(self._listener, selectors.EVENT_READ)
+        if self.watcher is not None:
+            self.watcher.start()
+        pending = deque()   # (conn, me, opp, kind, arrival)
+        buffers = {}
+        self._running = True
+        print(f"🧠 Serving {self.ai.model_format} model on {self.socket_path} "
+              f"(batch <= {self.max_batch}, wait <= {self.max_wait * 1000:g}ms)")
+        try:
+            while self._running:
+                timeout = 0.5 if not pending else max(0.0, pending[0][4] + self.max_wait - time.perf_counter())
+                for key, _ in selector.select(timeout):
+                    if key.fileobj is self._listener:
+                        conn, _ = self._listener.accept()
+                        selector.register(conn, selectors.EVENT_READ)
+                        buffers[conn] = b''
+                        self.clients += 1
+                    else:
+                        self._read(key.fileobj, buffers, pending, selector)
+                # Flush early once every playing client is waiting: nobody else can add to the batch
+                while pending and (len(pending) >= min(self.max_batch, self._playing()) or
+                                   time.perf_counter() - pending[0][4] >= self.max_wait):
+                    self._run_batch([pending.popleft() for _ in range(min(len(pending), self.max_batch))])
+        finally:
+            for conn in list(buffers):
+                selector.unregister(conn)
+                conn.close()
+            selector.close()
+            self._listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            if self.watcher is not None:
+                self.watcher.stop()
+
+    def _playing(self):
+        """Clients with a Q/move request in the last `idle` seconds."""
+        since = time.perf_counter() - self.idle
+        return sum(t >= since for t in self._last_request.values())
+
+    def _read(self, conn, buffers, pending, selector):
+        try:
+            data = conn.recv(65536)
+        except OSError:
+            data = b''
+        if not data:
+            self._close(conn, buffers, pending, selector)
+            return
+        data = buffers[conn] + data
+        now = time.perf_counter()
+        usable = len(data) - len(data) % REQUEST.size
+        for me, opp, kind in REQUEST.iter_unpack(data[:usable]):
+            if kind not in KINDS:
+                print(f"⚠️ Closing a client that sent an unknown request kind {kind}")
+                self._close(conn, buffers, pending, selector)
+                return
+            if kind == KIND_STATS:
+                self._send(conn, self._stats_reply())
+            else:
+                pending.append((conn, me, opp, kind, now))
+                self._last_request[conn] = now
+        buffers[conn] = data[usable:]
+
+    def _close(self, conn, buffers, pending, selector):
+        """Drop one connection and its unanswered requests."""
+        selector.unregister(conn)
+        del buffers[conn]
+        self._last_request.pop(conn, None)
+        if any(r[0] is conn for r in pending):
+            kept = [r for r in pending if r[0] is not conn]
+            pending.clear()
+            pending.extend(kept)
+        conn.close()
+        self.clients -= 1
+
+    def _run_batch(self, batch):
+        n = len(batch)
+        me = np.fromiter((r[1] for r in batch), dtype=np.uint64, count=n)
+        opp = np.fromiter((r[2] for r in batch), dtype=np.uint64, count=n)
+        planes = encode_bitboards(me, opp, out=self._planes[:n])
+        start = time.perf_counter()
+        with self.torch.inference_mode():
+            q_values = self.ai.play_net(self.torch.from_numpy(planes).to(self.ai.device)).cpu().numpy()
+        self.forward_seconds += time.perf_counter() - start
+        moves = None
+        if any(r[3] == KIND_MOVE for r in batch):
+            legal = unpack_bits(legal_moves(me, opp)).astype(bool)
+            moves = np.where(legal.any(1), np.where(legal, q_values, -np.inf).argmax(1), -1)
+        for i, (conn, _, _, kind, arrival) in enumerate(batch):
+            reply = q_values[i].astype('<f4').tobytes() if kind == KIND_Q else struct.pack('<b', moves[i])
+            if self._send(conn, reply):
+                self.latencies.append(time.perf_counter() - arrival)
+        self.batch_counts[n] += 1
+
+    @staticmethod
+    def _send(conn, reply):
+        try:
+            conn.sendall(reply)
+            return True
+        except OSError:
+            # Client went away; its connection is closed on the next read
+            return False
+
+    def _stats_reply(self):
+        payload = json.dumps(self.stats()).encode()
+        return struct.pack('<I', len(payload)) + payload
+
+    def stats(self):
+        """Request count, batch-size histogram and latency percentiles (ms) of recent requests."""
+        batches = int(self.batch_counts.sum())
+        requests = int((self.batch_counts * np.arange(len(self.batch_counts))).sum())
+        latencies = np.array(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 90, 99]) if len(latencies) else [0.0] * 3
+        return {
+            'requests': requests,
+            'batches': batches,
+            'mean_batch': requests / batches if batches else 0.0,
+            'batch_histogram': {int(size): int(count) for size, count in enumerate(self.batch_counts) if count},
+            'latency_ms': {'p50': float(percentiles[0]), 'p90': float(percentiles[1]),
+                           'p99': float(percentiles[2]), 'max': float(latencies.max()) if len(latencies) else 0.0},
+            'forward_ms_per_batch': self.forward_seconds * 1000 / batches if batches else 0.0,
+            'clients': self.clients,
+            'playing': self._playing(),
+            'reloads': len(self.watcher.swaps) if self.watcher is not None else 0,
+        }
+
+    def stop(self):
+        self._running = False
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("inference server closed the connection")
+        data += chunk
+    return data
+
+
+class InferenceClient:
+    """Client of an InferenceServer; plays like ModernOthelloAI.choose_move without loading a model"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=30.0):
+        self.socket_path = socket_path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+
+    def q_values(self, me, opp):
+        """64 float32 Q-values for the side to move with discs `me` against `opp`."""
+        self.sock.sendall(REQUEST.pack(me, opp, KIND_Q))
+        return np.frombuffer(_recv_exact(self.sock, Q_BYTES), dtype='<f4')
+
+    def best_move(self, me, opp):
+        """Legal square (row * 8 + col) with the highest Q-value, or -1 if there is none."""
+        self.sock.sendall(REQUEST.pack(me, opp, KIND_MOVE))
+        return struct.unpack('<b', _recv_exact(self.sock, 1))[0]
+
+    def choose_move(self, board, current_player, valid_moves, training=False):
+        if not valid_moves:
+            return None
+        square = self.best_move(*from_board(board, current_player))
+        return divmod(square, 8) if square >= 0 else None
+
+    def stats(self):
+        self.sock.sendall(REQUEST.pack(0, 0, KIND_STATS))
+        size = struct.unpack('<I', _recv_exact(self.sock, 4))[0]
+        return json.loads(_recv_exact(self.sock, size))
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def print_stats(stats):
+    latency = stats['latency_ms']
+    print(f"📊 {stats['requests']:,} requests in {stats['batches']:,} batches "
+          f"(mean batch {stats['mean_batch']:.1f}, forward {stats['forward_ms_per_batch']:.2f}ms/batch), "
+          f"{stats['clients']} clients connected ({stats['playing']} playing)")
+    print(f"   latency p50 {latency['p50']:.2f}ms | p90 {latency['p90']:.2f}ms | "
+          f"p99 {latency['p99']:.2f}ms | max {latency['max']:.2f}ms")
+    # Batch-size histogram in power-of-two buckets
+    buckets = {}
+    for size, count in stats['batch_histogram'].items():
+        low = 1 << (int(size).bit_length() - 1)
+        buckets[low] = buckets.get(low, 0) + count
+    total = max(sum(buckets.values()), 1)
+    for low, count in sorted(buckets.items()):
+        label = f"{low}-{2 * low - 1}" if low > 1 else "1"
+        print(f"   batch {label:>7}: {count:>8,} {'█' * max(1, round(40 * count / total))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the neural AI to many games over a Unix socket")
+    parser.add_argument('--model', default='othello_model_final.pth')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--max-batch', type=int, default=64, help="largest batch per forward pass")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help="longest a request waits for the batch to fill")
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help="hot-reload the model when the checkpoint changes (model_watcher.py)")
+    parser.add_argument('--no-cpu-optimize', action='store_true', help="run the FP32 network")
+    parser.add_argument('--stats', action='store_true', help="print a running server's statistics and exit")
+    args = parser.parse_args()
+
+    if args.stats:
+        with InferenceClient(args.socket) as client:
+            print_stats(client.stats())
+        return
+    server = InferenceServer(args.model, args.socket, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                             optimize_cpu=not args.no_cpu_optimize, watch_interval=args.watch)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print_stats(server.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,36 @@
+import time
+STARTUP_T0 = time.perf_counter()  # for time-to-first-frame
+
 import pygame
 import math
 import numpy as np
 import json
 import os
-import time
 import random
+import sys
 from datetime import datetime
 from constants import BOARD_SIZE, TILE_SIZE, WINDOW_SIZE, BLACK, WHITE, GREEN
 from board import Board
 from game import Game
-from ai import choose_move
+from ai import choose_move, use_position_cache
 
-# Try to import modern AI (PyTorch-based)
-USE_MODERN_AI = False
-modern_ai_instance = None
+# Share classic AI search results with earlier sessions through the on-disk cache
 try:
-    from modern_ai import ModernOthelloAI
-    import os
-    # Check if trained model exists
-    if os.path.exists('othello_model_final.pth') or os.path.exists('othello_model.pth'):
-        model_path = 'othello_model_final.pth' if os.path.exists('othello_model_final.pth') else 'othello_model.pth'
-        modern_ai_instance = ModernOthelloAI(model_path=model_path)
-        USE_MODERN_AI = True
-        print(f"🧠 Modern AI loaded successfully from {model_path}")
-    else:
-        print("⚠️  PyTorch available but no trained model found. Using classic AI.")
-        print("   To train: run 'python train_modern_ai.py'")
-except ImportError:
-    print("ℹ️  PyTorch not installed. Using classic Minimax AI.")
-    print("   To use Modern AI: pip install torch")
+    use_position_cache()
+except (OSError, ValueError) as e:
+    print(f"⚠️  Position cache unavailable ({e}). Classic AI will search from scratch.")
+
+# The neural AI (PyTorch) loads in the background once the first frame is up;
+# until it is ready, games use the classic AI.  A retrained checkpoint is
+# picked up between moves without restarting the game.
+from model_loader import BackgroundModelLoader
+USE_MODERN_AI = False
+neural_ai_loader = BackgroundModelLoader(watch_interval=5.0)
+
+if len(sys.argv) > 2 and sys.argv[1] == '--check-ai':
+    # build_standalone.py: exit 0 only if the bundled AI loads with the expected backend
+    neural_ai_loader.start()
+    sys.exit(0 if neural_ai_loader.wait(120) and neural_ai_loader.backend == sys.argv[2] else 1)
 
 from server_user_manager import ServerUserManager as UserManager
 
@@ -1209,8 +1211,12 @@ def draw_play_mode_menu(surface, width, height, mouse_pos):
     
     return ai_rect, friend_rect, back_rect
 
-def draw_difficulty_menu(surface, width, height, mouse_pos):
-    """Draw the difficulty selection screen"""
+def draw_difficulty_menu(surface, width, height, mouse_pos, neural_status=None):
+    """Draw the difficulty selection screen
+    
+    neural_status is the background model loader's status, shown below the
+    buttons while the neural AI is loading or once it is ready.
+    """
     # Gradient background
     bg_rect = pygame.Rect(0, 0, width, height)
     draw_gradient_rect(surface, bg_rect, (40, 20, 20), (80, 20, 60), vertical=True)
@@ -1243,6 +1249,14 @@ def draw_difficulty_menu(surface, width, height, mouse_pos):
     draw_button(surface, hard_rect, "HARD", button_font, (180, 60, 60), (220, 80, 80), hard_hover)
     draw_button(surface, back_rect, "Back", button_font, (100, 100, 100), (130, 130, 130), back_hover)
     
+    # Neural AI availability
+    status_text = {'loading': ("Neural AI: loading...", (220, 200, 120)),
+                   'ready': ("Neural AI: ready", (120, 220, 120))}.get(neural_status)
+    if status_text:
+        status_font = pygame.font.SysFont("Arial", 22)
+        text = status_font.render(status_text[0], True, status_text[1])
+        surface.blit(text, text.get_rect(center=(width // 2, height // 2 + 250)))
+    
     return easy_rect, medium_rect, hard_rect, back_rect
 
 def draw_online_connect_menu(surface, width, height, mouse_pos, server_input, error_msg=""):
@@ -1689,7 +1703,8 @@ while running:
     
     # Difficulty selection state
     elif current_state == STATE_DIFFICULTY:
-        easy_rect, medium_rect, hard_rect, back_rect = draw_difficulty_menu(screen, width, height, mouse_pos)
+        easy_rect, medium_rect, hard_rect, back_rect = draw_difficulty_menu(screen, width, height, mouse_pos,
+                                                                            neural_ai_loader.status)
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -1703,6 +1718,7 @@ while running:
                     difficulty_name = 'Easy'
                     board = Board()
                     game = Game(board)
+                    USE_MODERN_AI = neural_ai_loader.ready  # classic AI unless loaded before the game starts
                     last_move = None  # Reset last move
                     current_state = STATE_PLAYING
                     game_over_sound_played = False
@@ -1716,6 +1732,7 @@ while running:
                     difficulty_name = 'Medium'
                     board = Board()
                     game = Game(board)
+                    USE_MODERN_AI = neural_ai_loader.ready  # classic AI unless loaded before the game starts
                     last_move = None  # Reset last move
                     current_state = STATE_PLAYING
                     game_over_sound_played = False
@@ -1729,6 +1746,7 @@ while running:
                     difficulty_name = 'Hard'
                     board = Board()
                     game = Game(board)
+                    USE_MODERN_AI = neural_ai_loader.ready  # classic AI unless loaded before the game starts
                     last_move = None  # Reset last move
                     current_state = STATE_PLAYING
                     game_over_sound_played = False
@@ -2220,6 +2238,7 @@ while running:
                         pick_random_avatars()  # Pick new avatars on restart
                         board = Board()
                         game = Game(board)
+                        USE_MODERN_AI = neural_ai_loader.ready  # classic AI unless loaded before the game starts
                         last_move = None  # Reset last move
                         game_over_sound_played = False
                         game_saved_to_history = False
@@ -2247,6 +2266,7 @@ while running:
                         pick_random_avatars()  # Pick new avatars on restart
                         board = Board()
                         game = Game(board)
+                        USE_MODERN_AI = neural_ai_loader.ready  # classic AI unless loaded before the game starts
                         last_move = None  # Reset last move
                         game_over_sound_played = False
                         game_saved_to_history = False
@@ -2274,6 +2294,7 @@ while running:
                         AI_COLOR = 'W'
                         board = Board()
                         game = Game(board)
+                        USE_MODERN_AI = neural_ai_loader.ready  # classic AI unless loaded before the game starts
                         last_move = None  # Reset last move
                         game_over_sound_played = False
                         game_saved_to_history = False
@@ -2284,6 +2305,7 @@ while running:
                         AI_COLOR = 'B'
                         board = Board()
                         game = Game(board)
+                        USE_MODERN_AI = neural_ai_loader.ready  # classic AI unless loaded before the game starts
                         last_move = None  # Reset last move
                         game_over_sound_played = False
                         game_saved_to_history = False
@@ -2397,10 +2419,10 @@ while running:
                 pygame.time.wait(300)
                 
                 # AI makes its move
-                if USE_MODERN_AI and modern_ai_instance:
+                if USE_MODERN_AI and neural_ai_loader.model:
                     # Use Modern Deep Learning AI
                     valid_moves = board.get_valid_moves(AI_COLOR)
-                    ai_move = modern_ai_instance.choose_move(board, AI_COLOR, valid_moves, training=False)
+                    ai_move = neural_ai_loader.model.choose_move(board, AI_COLOR, valid_moves, training=False)
                 else:
                     # Use Classic Minimax AI
                     ai_move = choose_move(board, AI_COLOR, difficulty=AI_DIFFICULTY)
@@ -2427,6 +2449,9 @@ while running:
             achievement_notification_time = None
     
     pygame.display.flip()
+    if not neural_ai_loader.started:
+        print(f"⏱️  First frame after {time.perf_counter() - STARTUP_T0:.2f}s")
+        neural_ai_loader.start()
     clock.tick(60)
 
 # Cleanup
@@ -0,0 +1,213 @@
+"""
+Neural-guided PUCT search (AlphaZero-style MCTS) for the Modern AI
+
+The network's 64 Q-values give both the priors (softmax over the legal
+squares) and the value of a position (the best legal Q, clipped to
+[-1, 1]).  Playouts descend with the PUCT rule and add a virtual loss to
+the path they take, so one round collects up to `batch_size` different
+leaves that are scored with a single forward pass.  The subtree of the
+position reached after both sides have moved is kept for the next search.
+
+Positions are (player, opponent) bitboards from bitboard.py; values are
+always from the point of view of the side to move.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from bitboard import from_board, legal_moves, play, popcount
+from encoding import encode_bitboards, unpack_bits
+
+PASS = 64
+
+
+class Node:
+    """A position in the search tree; edge statistics are stored on the parent"""
+
+    __slots__ = ('me', 'opp', 'moves', 'priors', 'visits', 'value_sum', 'children', 'terminal')
+
+    def __init__(self, me, opp):
+        self.me = me
+        self.opp = opp
+        self.moves = None       # None until expanded
+        self.priors = None
+        self.visits = None
+        self.value_sum = None
+        self.children = None
+        self.terminal = None    # exact value for finished games
+
+    def expand(self, moves, priors):
+        self.moves = moves
+        self.priors = priors
+        self.visits = [0] * len(moves)
+        self.value_sum = [0.0] * len(moves)
+        self.children = [None] * len(moves)
+
+    def child(self, i):
+        if self.children[i] is None:
+            move = self.moves[i]
+            if move == PASS:
+                self.children[i] = Node(self.opp, self.me)
+            else:
+                self.children[i] = Node(*play(self.me, self.opp, 1 << move))
+        return self.children[i]
+
+
+def network_evaluator(ai):
+    """Batch evaluator for a ModernOthelloAI: (me, opp) uint64 arrays -> (N, 64) Q-values."""
+    import torch
+
+    def evaluate(me, opp):
+        states = torch.from_numpy(encode_bitboards(me, opp)).to(ai.device)
+        with torch.inference_mode():
+            return ai.play_net(states).cpu().numpy()
+
+    return evaluate
+
+
+class MCTSPlayer:
+    """PUCT search player; `playouts` or `time_limit` (seconds) sets its strength"""
+
+    def __init__(self, evaluate, playouts=400, time_limit=None, c_puct=1.5, batch_size=16,
+                 virtual_loss=1, temperature=1.0, reuse_tree=True):
+        self.evaluate = evaluate
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.c_puct = c_puct
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        self.temperature = temperature
+        self.reuse_tree = reuse_tree
+        self.root = None
+        self.evals = 0
+        self.eval_batches = 0
+        self.eval_seconds = 0.0
+
+    @classmethod
+    def from_model(cls, ai, **kwargs):
+        return cls(network_evaluator(ai), **kwargs)
+
+    def _select(self, node):
+        """Index of the child maximising Q + U from `node`'s point of view."""
+        sqrt_total = math.sqrt(sum(node.visits) + 1)
+        best, best_score = 0, -float('inf')
+        for i, prior in enumerate(node.priors):
+            n = node.visits[i]
+            q = node.value_sum[i] / n if n else 0.0
+            score = q + self.c_puct * prior * sqrt_total / (1 + n)
+            if score > best_score:
+                best, best_score = i, score
+        return best
+
+    def _descend(self, root):
+        """Walk to a leaf adding virtual loss; return (path, leaf) or (path, None) if the leaf was resolved."""
+        node, path = root, []
+        while True:
+            if node.terminal is not None:
+                self._backup(path, node.terminal)
+                return path, None
+            if node.moves is None:
+                moves = legal_moves(node.me, node.opp)
+                if moves:
+                    return path, node
+                if legal_moves(node.opp, node.me):
+                    node.expand([PASS], [1.0])
+                else:
+                    diff = popcount(node.me) - popcount(node.opp)
+                    node.terminal = (diff > 0) - (diff < 0)
+                    continue
+            i = self._select(node)
+            node.visits[i] += self.virtual_loss
+            node.value_sum[i] -= self.virtual_loss
+            path.append((node, i))
+            node = node.child(i)
+
+    def _backup(self, path, value):
+        """Propagate a leaf value (leaf's side to move) up the path, removing virtual loss."""
+        for node, i in reversed(path):
+            value = -value
+            node.visits[i] += 1 - self.virtual_loss
+            node.value_sum[i] += value + self.virtual_loss
+
+    def _undo(self, path):
+        for node, i in path:
+            node.visits[i] -= self.virtual_loss
+            node.value_sum[i] += self.virtual_loss
+
+    def _evaluate_leaves(self, leaves):
+        start = time.perf_counter()
+        me = np.array([leaf.me for _, leaf in leaves], dtype=np.uint64)
+        opp = np.array([leaf.opp for _, leaf in leaves], dtype=np.uint64)
+        q = self.evaluate(me, opp)
+        self.eval_seconds += time.perf_counter() - start
+        self.evals += len(leaves)
+        self.eval_batches += 1
+        legal = unpack_bits(legal_moves(me, opp)).astype(bool)
+        for (path, leaf), row, mask in zip(leaves, q, legal):
+            moves = np.flatnonzero(mask)
+            logits = row[moves] / self.temperature
+            priors = np.exp(logits - logits.max())
+            priors /= priors.sum()
+            leaf.expand(moves.tolist(), priors.tolist())
+            self._backup(path, float(np.clip(row[moves].max(), -1.0, 1.0)))
+
+    def _find_root(self, me, opp):
+        """Reuse the previous tree if the position is the root or within two plies of it."""
+        if self.reuse_tree and self.root is not None:
+            frontier = [self.root]
+            for _ in range(3):
+                nxt = []
+                for node in frontier:
+                    if node.me == me and node.opp == opp:
+                        return node
+                    if node.children:
+                        nxt.extend(c for c in node.children if c is not None)
+                frontier = nxt
+        return Node(me, opp)
+
+    def search(self, me, opp):
+        """Run playouts from (me, opp); returns the root node."""
+        root = self._find_root(me, opp)
+        deadline = time.perf_counter() + self.time_limit if self.time_limit else None
+        done = 0
+        while True:
+            if deadline is None and done >= self.playouts:
+                break
+            # However small the time limit, the root is expanded first
+            expanded = root.moves is not None or root.terminal is not None
+            if deadline is not None and expanded and time.perf_counter() >= deadline:
+                break
+            leaves, pending = [], set()
+            want = self.batch_size if deadline else min(self.batch_size, self.playouts - done)
+            for _ in range(want):
+                path, leaf = self._descend(root)
+                done += 1
+                if leaf is None:
+                    continue
+                if id(leaf) in pending:
+                    # Collision with a leaf already in this batch: evaluate what we have
+                    self._undo(path)
+                    done -= 1
+                    break
+                pending.add(id(leaf))
+                leaves.append((path, leaf))
+            if leaves:
+                self._evaluate_leaves(leaves)
+        self.root = root
+        return root
+
+    def choose_move(self, board, current_player, valid_moves):
+        """Most-visited move after searching from a board.Board position"""
+        if not valid_moves:
+            return None
+        if len(valid_moves) == 1:
+            return valid_moves[0]
+        root = self.search(*from_board(board, current_player))
+        # Priors break ties, e.g. when the time ran out before any playout reached a child
+        best = max(range(len(root.moves)), key=lambda i: (root.visits[i], root.priors[i]))
+        return divmod(root.moves[best], 8)
+
+    def evals_per_second(self):
+        return self.evals / self.eval_seconds if self.eval_seconds else 0.0
@@ -0,0 +1,147 @@
+"""
+Background loading of the neural AI for the game client
+
+Importing PyTorch and building the network takes seconds, so main.py starts
+this loader once the first frame is on screen and keeps using the classic
+AI until `ready` turns true.  Without PyTorch (or without a .pth model) an
+exported .npz model is played with the NumPy backend (numpy_inference.py).
+"""
+
+import os
+import sys
+import threading
+import time
+
+DEFAULT_MODEL_PATHS = ('othello_model_final.pth', 'othello_model.pth')
+NUMPY_MODEL_PATHS = ('othello_model_final.npz', 'othello_model.npz')
+
+
+def find_model(paths):
+    """First of `paths` that exists, or None.
+
+    A PyInstaller build also looks in the directory its bundled files were
+    extracted to (sys._MEIPASS), after the current directory.
+    """
+    roots = ['']
+    if getattr(sys, 'frozen', False):
+        roots.append(getattr(sys, '_MEIPASS', os.path.dirname(sys.executable)))
+    for root in roots:
+        for path in paths:
+            candidate = os.path.join(root, path)
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+class BackgroundModelLoader:
+    """Load ModernOthelloAI (and torch), or the NumPy backend, on a daemon thread.
+
+    status is one of 'idle', 'loading', 'ready', 'unavailable' (no torch or
+    no checkpoint) or 'failed'.  The model keeps the Q-values of up to
+    q_cache_size positions (modern_ai.QValueCache; 0 disables it).  With
+    watch_interval set, a torch model is then hot-reloaded whenever its
+    checkpoint changes (model_watcher.ModelWatcher).
+    """
+
+    def __init__(self, model_paths=DEFAULT_MODEL_PATHS, optimize_cpu=True, num_threads=None, q_cache_size=16384,
+                 numpy_paths=NUMPY_MODEL_PATHS, watch_interval=None):
+        self.model_paths = model_paths
+        self.numpy_paths = numpy_paths
+        self.optimize_cpu = optimize_cpu
+        self.num_threads = num_threads
+        self.q_cache_size = q_cache_size
+        self.watch_interval = watch_interval
+        self.watcher = None
+        self.model = None
+        self.model_path = None
+        self.numpy_path = None
+        self.backend = None   # 'torch' or 'numpy' once loaded
+        self.status = 'idle'
+        self.error = None
+        self.load_seconds = None
+        self._thread = None
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    def start(self):
+        """Begin loading in the background; later calls do nothing."""
+        if self._thread is not None:
+            return
+        self.model_path = find_model(self.model_paths)
+        self.numpy_path = find_model(self.numpy_paths)
+        if self.model_path is None and self.numpy_path is None:
+            # No checkpoint: never pay for the torch import
+            self.status = 'unavailable'
+            print("⚠️  No trained model found. Using classic AI.")
+            print("   To train: run 'python train_modern_ai.py'")
+        else:
+            self.status = 'loading'
+        self._thread = threading.Thread(target=self._load, name='model-loader', daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        if self.model_path is None and self.numpy_path is None:
+            return
+        start = time.perf_counter()
+        if self.model_path is None:
+            self._load_numpy(start)
+            return
+        try:
+            from modern_ai import ModernOthelloAI
+        except ImportError:
+            if self.numpy_path is not None:
+                self._load_numpy(start)
+                return
+            self.status = 'unavailable'
+            print("ℹ️  PyTorch not installed. Using classic Minimax AI.")
+            print("   To use Modern AI: pip install torch, or export a .npz model (numpy_inference.py)")
+            return
+        try:
+            # Private weights: a training run may rewrite (or watch_interval reload) this file
+            model = ModernOthelloAI.for_inference(self.model_path, mmap=False, q_cache_size=self.q_cache_size)
+        except Exception as e:
+            self.error = e
+            self.status = 'failed'
+            print(f"❌ Could not load {self.model_path}: {e}")
+            return
+        if self.optimize_cpu and model.device.type == 'cpu':
+            try:
+                model.optimize_for_cpu(num_threads=self.num_threads)
+            except Exception as e:
+                # Quantization backends are not available on every build
+                print(f"⚠️  CPU optimisation unavailable ({e}); using the FP32 network")
+        self._ready(model, 'torch', self.model_path, start)
+        if self.watch_interval:
+            from model_watcher import ModelWatcher
+            self.watcher = ModelWatcher(model, self.model_path, interval=self.watch_interval).start()
+    
+    def _load_numpy(self, start):
+        from numpy_inference import NumpyOthelloAI
+        try:
+            model = NumpyOthelloAI(self.numpy_path)
+        except Exception as e:
+            self.error = e
+            self.status = 'failed'
+            print(f"❌ Could not load {self.numpy_path}: {e}")
+            return
+        self._ready(model, 'numpy', self.numpy_path, start)
+    
+    def _ready(self, model, backend, path, start):
+        self.model = model
+        self.backend = backend
+        self.model_path = path
+        self.load_seconds = time.perf_counter() - start
+        self.status = 'ready'
+        print(f"🧠 Modern AI loaded from {path} in {self.load_seconds:.2f}s ({backend})")
+
+    def wait(self, timeout=None):
+        """Block until loading has finished (used by tools and tests)."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
@@ -0,0 +1,201 @@
+"""
+Hot reloading of the neural AI's weights for long-running processes
+
+ModelWatcher polls a checkpoint file, or a JSON manifest naming one, on a
+daemon thread.  When it changes, the new checkpoint is loaded into a fresh
+network next to the one in use, checked on a canary batch of positions and
+then installed with ModernOthelloAI.swap_networks(): a reference swap, so a
+move being computed finishes on the old network and the next one uses the
+new network -- never a half-loaded one.
+
+Manifest format (written by write_manifest):
+    {"model": "othello_model_final.pth", "sha256": "...", "written": "..."}
+The model is only loaded once its content hash matches the manifest, so a
+file still being copied is never picked up.  Without a manifest the file's
+(mtime, size) must stay the same for two polls before it is loaded.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import torch
+
+from bitboard import legal_moves, random_position
+from encoding import decode_planes, encode_boards, unpack_bits
+from modern_ai import build_network
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(model_path, manifest_path):
+    """Atomically point `manifest_path` at `model_path` (with its content hash)."""
+    manifest = {'model': os.path.relpath(model_path, os.path.dirname(os.path.abspath(manifest_path))),
+                'sha256': file_sha256(model_path),
+                'written': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    tmp = f"{manifest_path}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+    return manifest
+
+
+def canary_positions(count=32, seed=0):
+    """(count, 3, 8, 8) planes of random-play positions for validating a model."""
+    rng = random.Random(seed)
+    boards, colors = zip(*(random_position(rng, 0, 50) for _ in range(count)))
+    return encode_boards(list(boards), list(colors))
+
+
+def _model_bytes(net):
+    return sum(t.numel() * t.element_size() for t in list(net.parameters()) + list(net.buffers()))
+
+
+class ModelWatcher:
+    """Reload `ai`'s weights whenever `path` (a checkpoint or a .json manifest) changes
+
+    min_agreement, if set, also requires the new model's argmax move on the
+    canary batch to agree with the current model's on at least that share
+    of positions.  on_swap(info) is called after each successful swap.
+    """
+
+    def __init__(self, ai, path, interval=2.0, canary=None, min_agreement=None, on_swap=None):
+        if not ai.inference_only:
+            raise ValueError("ModelWatcher hot-swaps play-only models (ModernOthelloAI.for_inference)")
+        self.ai = ai
+        self.path = path
+        self.manifest = path.endswith('.json')
+        self.interval = interval
+        self.canary = canary_positions() if canary is None else canary
+        self._canary_legal = unpack_bits(legal_moves(*decode_planes(self.canary))).astype(bool)
+        self.min_agreement = min_agreement
+        self.on_swap = on_swap
+        self.swaps = []      # info dict per swap
+        self.rejected = []   # (signature, reason)
+        self.error = None
+        self._seen = self._signature()
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _signature(self):
+        """What identifies the current version: the manifest's hash, or (mtime, size)."""
+        try:
+            if self.manifest:
+                with open(self.path) as f:
+                    return json.load(f)['sha256']
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _model_path(self):
+        if not self.manifest:
+            return self.path
+        with open(self.path) as f:
+            name = json.load(f)['model']
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), name)
+
+    def check(self):
+        """One poll: load, validate and swap if a new version is ready; returns the swap info or None."""
+        signature = self._signature()
+        if signature is None or signature == self._seen:
+            self._pending = None
+            return None
+        if not self.manifest and signature != self._pending:
+            # Wait for the file to stop changing before reading it
+            self._pending = signature
+            return None
+        self._seen = signature
+        self._pending = None
+        try:
+            return self._reload(signature)
+        except Exception as e:
+            self.error = e
+            self.rejected.append((signature, str(e)))
+            print(f"❌ Model reload from {self.path} failed: {e}")
+            return None
+
+    def _reload(self, signature):
+        path = self._model_path()
+        if self.manifest and file_sha256(path) != signature:
+            raise ValueError(f"{path} does not match the manifest's sha256")
+        start = time.perf_counter()
+        checkpoint = torch.load(path, map_location=self.ai.device)
+        model_format = checkpoint.get('model_format', 'dqn')
+        model_options = checkpoint.get('model_options', {})
+        policy_net = build_network(model_format, **model_options).to(self.ai.device)
+        policy_net.load_state_dict(checkpoint['policy_net_state_dict'])
+        policy_net.eval()
+        play_net = self.ai.build_play_net(policy_net)
+        loaded = time.perf_counter()
+
+        agreement = self._validate(play_net)
+        validated = time.perf_counter()
+
+        old_bytes = _model_bytes(self.ai.policy_net)
+        new_bytes = _model_bytes(policy_net)
+        swap_start = time.perf_counter()
+        self.ai.swap_networks(policy_net, play_net, model_format, model_options)
+        swap_seconds = time.perf_counter() - swap_start
+        info = {
+            'path': path,
+            'signature': signature,
+            'model_format': model_format,
+            'load_s': loaded - start,
+            'validate_s': validated - loaded,
+            'swap_us': swap_seconds * 1e6,
+            'swapped_at': swap_start,
+            'agreement': agreement,
+            # Both networks' weights are alive from load until the old one is released
+            'old_mb': old_bytes / 2**20,
+            'peak_extra_mb': new_bytes / 2**20,
+        }
+        self.swaps.append(info)
+        print(f"🔄 Model reloaded from {path}: load {info['load_s'] * 1000:.0f}ms, "
+              f"canary {info['validate_s'] * 1000:.0f}ms, swap {info['swap_us']:.1f}us")
+        if self.on_swap:
+            self.on_swap(info)
+        return info
+
+    def _validate(self, play_net):
+        """Canary batch: finite (N, 64) Q-values (and enough agreement); returns the agreement."""
+        planes = torch.from_numpy(self.canary).to(self.ai.device)
+        with torch.inference_mode():
+            new_q = play_net(planes).cpu().numpy()
+            old_q = self.ai.play_net(planes).cpu().numpy()
+        if new_q.shape != (len(planes), 64) or not np.isfinite(new_q).all():
+            raise ValueError("canary batch produced invalid Q-values")
+        legal = self._canary_legal
+        agreement = float((np.where(legal, new_q, -np.inf).argmax(1) ==
+                           np.where(legal, old_q, -np.inf).argmax(1)).mean())
+        if self.min_agreement is not None and agreement < self.min_agreement:
+            raise ValueError(f"canary agreement {agreement:.1%} below {self.min_agreement:.1%}")
+        return agreement
+
+    def start(self):
+        """Poll every `interval` seconds on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -8,12 +8,21 @@ import torch.nn as nn
 import torch.optim as optim
 import numpy as np
 import random
-from collections import deque
+import copy
 import os
+import threading
+from collections import OrderedDict
+from bitboard import INVERSE_TRANSFORM, canonical, from_board, legal_moves, transform_square
+from encoding import board_planes, encode_bitboards, encode_boards, unpack_bits
+from training_checkpoint import atomic_save
+from training_metrics import NULL_TIMER
 
 class OthelloNeuralNetwork(nn.Module):
     """Deep Neural Network for Othello move prediction"""
     
+    # (conv, batchnorm) pairs folded together by build_cpu_inference_net
+    FUSE_PAIRS = [['conv1', 'bn1'], ['conv2', 'bn2'], ['conv3', 'bn3']]
+    
     def __init__(self):
         super(OthelloNeuralNetwork, self).__init__()
         
@@ -51,70 +60,534 @@ class OthelloNeuralNetwork(nn.Module):
         return x
 
 
+class SmallOthelloNetwork(nn.Module):
+    """Compact Q-network for low-latency CPU play (see distill.py)
+    
+    Four 3x3 convolutions (a 9x9 receptive field: each square sees four
+    squares in every direction, not the far side of the board) and a 1x1
+    convolution head giving one Q-value per square: about 30k
+    parameters against the ~4M of OthelloNeuralNetwork, with no large fully
+    connected layer.
+    """
+    
+    FUSE_PAIRS = [['conv1', 'bn1'], ['conv2', 'bn2'], ['conv3', 'bn3'], ['conv4', 'bn4']]
+    
+    def __init__(self, channels=32):
+        super().__init__()
+        self.conv1 = nn.Conv2d(3, channels, kernel_size=3, padding=1)
+        self.bn1 = nn.BatchNorm2d(channels)
+        self.conv2 = nn.Conv2d(channels, channels, kernel_size=3, padding=1)
+        self.bn2 = nn.BatchNorm2d(channels)
+        self.conv3 = nn.Conv2d(channels, channels, kernel_size=3, padding=1)
+        self.bn3 = nn.BatchNorm2d(channels)
+        self.conv4 = nn.Conv2d(channels, channels, kernel_size=3, padding=1)
+        self.bn4 = nn.BatchNorm2d(channels)
+        self.head = nn.Conv2d(channels, 1, kernel_size=1)
+        self.relu = nn.ReLU()
+    
+    def forward(self, board_state):
+        x = self.relu(self.bn1(self.conv1(board_state)))
+        x = self.relu(self.bn2(self.conv2(x)))
+        x = self.relu(self.bn3(self.conv3(x)))
+        x = self.relu(self.bn4(self.conv4(x)))
+        return self.head(x).flatten(1)
+
+
+# Checkpoints record their network as 'model_format' (+ 'model_options');
+# files without one are the original OthelloNeuralNetwork
+MODEL_FORMATS = {
+    'dqn': OthelloNeuralNetwork,
+    'small': SmallOthelloNetwork,
+}
+
+
+def build_network(model_format='dqn', **options):
+    """New network of a MODEL_FORMATS architecture"""
+    if model_format not in MODEL_FORMATS:
+        raise ValueError(f"Unknown model format {model_format!r} (expected one of {', '.join(MODEL_FORMATS)})")
+    return MODEL_FORMATS[model_format](**options)
+
+
+def build_cpu_inference_net(net, quantize=True, trace=True):
+    """Return an optimised CPU copy of `net` for inference
+    
+    BatchNorm layers are folded into the preceding convolutions, linear layers
+    are optionally quantized to int8 (dynamic quantization) and the forward
+    pass is optionally traced with TorchScript.  (torch.jit.freeze is not
+    used: it was no faster here, and frozen graphs keep their weights alive
+    after the module is dropped, which leaks on every hot reload.)
+    """
+    net = copy.deepcopy(net).cpu().eval()
+    net = torch.ao.quantization.fuse_modules(net, net.FUSE_PAIRS)
+    if quantize:
+        net = torch.ao.quantization.quantize_dynamic(net, {nn.Linear}, dtype=torch.qint8)
+    if trace:
+        with torch.inference_mode():
+            net = torch.jit.trace(net, torch.zeros(1, 3, 8, 8))
+    return net
+
+
+# SYMMETRY_SQUARES[t, sq]: where square sq lands under board symmetry t
+# (bitboard.transform); SYMMETRY_SOURCES[t, sq]: which square lands on sq
+SYMMETRY_SQUARES = torch.tensor([[transform_square(sq, t) for sq in range(64)] for t in range(8)])
+SYMMETRY_SOURCES = torch.tensor([[transform_square(sq, INVERSE_TRANSFORM[t]) for sq in range(64)]
+                                 for t in range(8)])
+_SYMMETRY_SQUARES_NP = SYMMETRY_SQUARES.numpy()
+
+
+def augment_batch(states, actions, next_states, generator=None):
+    """Apply an independent random board symmetry to each transition of a batch
+    
+    states and next_states are (N, C, 8, 8) tensors (C may differ) and
+    actions (N,) square indices; all three are remapped with gathers on the
+    index tables, with no per-sample Python work.
+    """
+    n = len(actions)
+    t = torch.randint(0, 8, (n,), generator=generator).to(states.device)
+    sources = SYMMETRY_SOURCES.to(states.device)[t].unsqueeze(1)
+    states = states.reshape(n, -1, 64).gather(2, sources.expand(n, states.shape[1], 64)).reshape(states.shape)
+    next_states = next_states.reshape(n, -1, 64).gather(
+        2, sources.expand(n, next_states.shape[1], 64)).reshape(next_states.shape)
+    actions = SYMMETRY_SQUARES.to(actions.device)[t.to(actions.device), actions]
+    return states, actions, next_states
+
+
+def dqn_targets(next_q_values, legal, rewards, dones, signs, gamma, online_next_q_values=None):
+    """Q-learning targets over legal next moves only
+    
+    next_q_values are the target network's (N, 64) Q-values of the next
+    states, legal their (N, 64) bool legal-move masks and signs +1 where the
+    side to move there is the player who just moved, -1 where it is the
+    opponent.  With online_next_q_values (the policy network's) the move is
+    picked by those and valued by the target network (Double DQN).  Next
+    states without a legal move are worth 0.
+    """
+    if online_next_q_values is None:
+        next_values = next_q_values.masked_fill(~legal, -torch.inf).max(1)[0]
+    else:
+        best = online_next_q_values.masked_fill(~legal, -torch.inf).argmax(1, keepdim=True)
+        next_values = next_q_values.gather(1, best).squeeze(1)
+    next_values = torch.where(legal.any(1), next_values, torch.zeros_like(next_values))
+    return rewards + (1 - dones) * gamma * signs * next_values
+
+
+class QValueCache:
+    """Bounded LRU cache of Q-value vectors keyed by canonical position
+    
+    Keys are the (player, opponent) masks of bitboard.canonical(); values
+    are the 64 Q-values of that canonical position, so all 8 symmetric
+    variants of a position share one entry and are mapped back with the
+    symmetry's square table on lookup.
+    
+    `invalidations` doubles as a generation number: put() drops values
+    computed before the latest clear(), so a forward pass that raced a
+    weight swap never caches stale Q-values.
+    """
+    
+    def __init__(self, capacity=16384):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get(self, key):
+        with self._lock:
+            q_values = self.entries.get(key)
+            if q_values is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return q_values
+    
+    def put(self, key, q_values, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.invalidations:
+                return
+            self.entries[key] = q_values
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every entry (the network's weights changed)"""
+        with self._lock:
+            self.entries.clear()
+            self.invalidations += 1
+    
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def stats(self):
+        return {'size': len(self.entries), 'capacity': self.capacity, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': self.hit_rate, 'invalidations': self.invalidations}
+
+
 class ReplayBuffer:
-    """Experience Replay Buffer for training"""
+    """Experience Replay Buffer for training
+    
+    A preallocated ring of transitions.  States are stored as packed
+    (player, opponent) uint64 bitboard pairs from bitboard.from_board, with
+    actions, rewards and done flags in parallel NumPy arrays, so a transition
+    takes 46 bytes however large the buffer grows.
     
-    def __init__(self, capacity=10000):
-        self.buffer = deque(maxlen=capacity)
+    A next state is seen from the side to move in it: the opponent, or the
+    same player again when the opponent has to pass.  next_legal holds that
+    side's legal moves as a uint64 mask (computed on push if not given), for
+    the masked max in ModernOthelloAI.train_step.
+    """
     
-    def push(self, state, action, reward, next_state, done):
-        """Add experience to buffer"""
-        self.buffer.append((state, action, reward, next_state, done))
+    def __init__(self, capacity=10000, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, 2), dtype=np.uint64)
+        self.next_states = np.zeros((capacity, 2), dtype=np.uint64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.uint8)
+        self.next_legal = np.zeros(capacity, dtype=np.uint64)
+        self.pos = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+    
+    def push(self, state, action, reward, next_state, done, next_legal=None):
+        """Add experience to buffer, overwriting the oldest once full; returns its slot"""
+        i = self.pos
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.next_legal[i] = legal_moves(int(next_state[0]), int(next_state[1])) if next_legal is None else next_legal
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+    
+    def push_many(self, states, actions, rewards, next_states, dones, next_legal=None):
+        """Add N experiences at once (states as (N, 2) uint64 arrays); returns their slots"""
+        n = min(len(actions), self.capacity)
+        idx = (self.pos + np.arange(n)) % self.capacity
+        next_states = np.asarray(next_states, dtype=np.uint64)[-n:]
+        if next_legal is None:
+            next_legal = legal_moves(next_states[:, 0], next_states[:, 1])
+        self.states[idx] = np.asarray(states, dtype=np.uint64)[-n:]
+        self.actions[idx] = np.asarray(actions)[-n:]
+        self.rewards[idx] = np.asarray(rewards)[-n:]
+        self.next_states[idx] = next_states
+        self.dones[idx] = np.asarray(dones)[-n:]
+        self.next_legal[idx] = np.asarray(next_legal, dtype=np.uint64)[-n:]
+        self.pos = (self.pos + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+        return idx
+    
+    def sample_indices(self, batch_size):
+        """Uniformly drawn slot indices (with replacement)"""
+        return self.rng.integers(0, self.size, size=batch_size)
+    
+    def get(self, idx):
+        """(states, actions, rewards, next_states, dones) arrays for slot indices"""
+        return self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], self.dones[idx]
     
     def sample(self, batch_size):
         """Sample random batch from buffer"""
-        return random.sample(self.buffer, min(batch_size, len(self.buffer)))
+        return self.get(self.sample_indices(batch_size))
+    
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.states, self.next_states, self.actions, self.rewards, self.dones,
+                                      self.next_legal))
+    
+    def _chronological(self):
+        """Slot indices from oldest to newest"""
+        if self.size < self.capacity:
+            return np.arange(self.size)
+        return (self.pos + np.arange(self.capacity)) % self.capacity
+    
+    def state_dict(self):
+        """Contents (oldest first) and sampling RNG state as tensors and plain types, for torch.save"""
+        states, actions, rewards, next_states, dones = self.get(self._chronological())
+        return {
+            'states': torch.from_numpy(states.view(np.int64)),
+            'actions': torch.from_numpy(actions),
+            'rewards': torch.from_numpy(rewards),
+            'next_states': torch.from_numpy(next_states.view(np.int64)),
+            'dones': torch.from_numpy(dones),
+            'next_legal': torch.from_numpy(self.next_legal[self._chronological()].view(np.int64)),
+            'rng': self.rng.bit_generator.state,
+        }
+    
+    def load_state_dict(self, state):
+        """Refill from state_dict(); keeps the newest transitions if the capacity is smaller"""
+        self.pos = self.size = 0
+        next_states = state['next_states'].numpy().view(np.uint64)
+        next_legal = state.get('next_legal')
+        if next_legal is None:
+            # Saved when next states were seen from the player who had just moved
+            next_states = next_states[:, ::-1]
+        else:
+            next_legal = next_legal.numpy().view(np.uint64)
+        self.push_many(state['states'].numpy().view(np.uint64), state['actions'].numpy(),
+                       state['rewards'].numpy(), next_states, state['dones'].numpy(), next_legal)
+        self.rng.bit_generator.state = state['rng']
     
     def __len__(self):
-        return len(self.buffer)
+        return self.size
+
+
+class SumTree:
+    """Array-backed binary sum-tree over `capacity` leaf priorities
+    
+    Node i has children 2i and 2i + 1; leaves start at `self.leaves` and the
+    root (node 1) holds the total.  Sampling and updates walk one level at a
+    time for a whole batch of indices, so both are O(log n) NumPy operations.
+    """
+    
+    def __init__(self, capacity):
+        self.leaves = 1
+        while self.leaves < capacity:
+            self.leaves *= 2
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+    
+    @property
+    def total(self):
+        return self.tree[1]
+    
+    def __getitem__(self, idx):
+        return self.tree[self.leaves + np.asarray(idx)]
+    
+    def update(self, idx, priorities):
+        """Set leaf priorities and recompute the sums above them"""
+        nodes = self.leaves + np.asarray(idx)
+        self.tree[nodes] = priorities
+        # Repeated parents just get the same sum written twice
+        for _ in range(self.depth):
+            nodes = nodes // 2
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+    
+    def find(self, targets):
+        """Leaf indices whose prefix-sum interval contains each target in [0, total)"""
+        targets = np.array(targets, dtype=np.float64)
+        nodes = np.ones(len(targets), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            right = targets >= left_sum
+            targets -= np.where(right, left_sum, 0.0)
+            nodes = left + right
+        return nodes - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Replay buffer sampling transitions in proportion to their TD error
+    
+    Priorities are (|td error| + eps) ** alpha, new transitions get the
+    largest priority seen so far, and importance-sampling weights
+    (N * P(i)) ** -beta are normalised by the batch maximum, with beta
+    annealed from `beta` to 1 over `beta_steps` samples.
+    """
+    
+    def __init__(self, capacity=10000, alpha=0.6, beta=0.4, beta_steps=100000, eps=1e-3, seed=None):
+        super().__init__(capacity, seed=seed)
+        self.tree = SumTree(capacity)
+        self.alpha = alpha
+        self.beta_start = beta
+        self.beta_steps = beta_steps
+        self.eps = eps
+        self.max_priority = 1.0
+        self.samples = 0
+    
+    @property
+    def beta(self):
+        return min(1.0, self.beta_start + (1.0 - self.beta_start) * self.samples / self.beta_steps)
+    
+    def push(self, state, action, reward, next_state, done, next_legal=None):
+        i = super().push(state, action, reward, next_state, done, next_legal)
+        self.tree.update([i], self.max_priority ** self.alpha)
+        return i
+    
+    def push_many(self, states, actions, rewards, next_states, dones, next_legal=None):
+        idx = super().push_many(states, actions, rewards, next_states, dones, next_legal)
+        self.tree.update(idx, self.max_priority ** self.alpha)
+        return idx
+    
+    def sample_indices(self, batch_size):
+        """Stratified proportional sample: one draw from each of batch_size equal slices"""
+        segment = self.tree.total / batch_size
+        targets = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        return np.minimum(self.tree.find(targets), self.size - 1)
+    
+    def sample_prioritized(self, batch_size):
+        """Return (slot indices, importance-sampling weights as float32)"""
+        idx = self.sample_indices(batch_size)
+        probs = self.tree[idx] / self.tree.total
+        weights = (self.size * probs) ** -self.beta
+        self.samples += 1
+        return idx, (weights / weights.max()).astype(np.float32)
+    
+    def state_dict(self):
+        state = super().state_dict()
+        state['priorities'] = torch.from_numpy(self.tree[self._chronological()])
+        state['max_priority'] = self.max_priority
+        state['samples'] = self.samples
+        return state
+    
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        if 'priorities' in state:
+            priorities = state['priorities'].numpy()
+            self.tree.update(self._chronological(), priorities[len(priorities) - self.size:])
+            self.max_priority = state['max_priority']
+            self.samples = state['samples']
+    
+    def update_priorities(self, idx, td_errors):
+        """Re-prioritise sampled slots from their absolute TD errors"""
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(idx, priorities ** self.alpha)
 
 
 class ModernOthelloAI:
     """Modern ML-based AI opponent using Deep Q-Learning"""
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, inference_only=False, mmap=False, prioritized_replay=False,
+                 augment_symmetries=True, learning_rate=0.001, buffer_capacity=10000, batch_size=64,
+                 model_format='dqn', model_options=None, q_cache_size=0, double_dqn=False):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         print(f"🔧 Using device: {self.device}")
-        
-        # Main network
-        self.policy_net = OthelloNeuralNetwork().to(self.device)
-        # Target network for stable training
-        self.target_net = OthelloNeuralNetwork().to(self.device)
-        self.target_net.load_state_dict(self.policy_net.state_dict())
-        self.target_net.eval()
-        
-        self.optimizer = optim.Adam(self.policy_net.parameters(), lr=0.001)
-        self.memory = ReplayBuffer(capacity=10000)
+        self.inference_only = inference_only
+        self.learning_rate = learning_rate
+        self.cpu_options = None
+        # Phase timing for training metrics (training_metrics.PhaseTimer to enable)
+        self.timer = NULL_TIMER
+        # choose_move's Q-values by canonical position (QValueCache), None = disabled
+        self.q_cache = QValueCache(q_cache_size) if q_cache_size else None
+        # Policy network, plus target network and optimizer when training
+        # (rebuilt by load_model if a checkpoint has another model format)
+        self._build_networks(model_format, model_options or {})
+        if inference_only:
+            # Playing only needs the policy network: no target network,
+            # optimizer or replay buffer
+            self.memory = None
+        else:
+            if prioritized_replay:
+                self.memory = PrioritizedReplayBuffer(capacity=buffer_capacity)
+            else:
+                self.memory = ReplayBuffer(capacity=buffer_capacity)
         
         # Hyperparameters
         self.epsilon = 0.1  # Exploration rate (lower for trained model)
         self.gamma = 0.95   # Discount factor
-        self.batch_size = 64
+        self.batch_size = batch_size
         self.target_update_freq = 10
         self.training_step = 0
+        # Train on a random rotation/reflection of each sampled transition
+        self.augment_symmetries = augment_symmetries
+        # Double DQN: the policy network picks the next move, the target network values it
+        self.double_dqn = double_dqn
         
         # Load pre-trained model if available
         if model_path and os.path.exists(model_path):
-            self.load_model(model_path)
+            self.load_model(model_path, mmap=mmap)
             print(f"✅ Loaded pre-trained model from {model_path}")
         else:
             print("⚠️  No pre-trained model found. AI will play with untrained network.")
     
+    def _build_networks(self, model_format, model_options):
+        self.model_format = model_format
+        self.model_options = dict(model_options)
+        self.policy_net = build_network(model_format, **model_options).to(self.device)
+        # Network used by choose_move (an optimised copy after optimize_for_cpu)
+        self.play_net = self.policy_net
+        if self.inference_only:
+            self.policy_net.eval()
+            self.target_net = None
+            self.optimizer = None
+        else:
+            # Target network for stable training
+            self.target_net = build_network(model_format, **model_options).to(self.device)
+            self.target_net.load_state_dict(self.policy_net.state_dict())
+            self.target_net.eval()
+            self.optimizer = optim.Adam(self.policy_net.parameters(), lr=self.learning_rate)
+    
+    @classmethod
+    def for_inference(cls, model_path=None, mmap=False, q_cache_size=0):
+        """Build a play-only AI: policy network in eval mode
+        
+        With mmap=True the weights stay memory-mapped from the checkpoint file
+        (pages shared by every process loading it).  Only load-once callers
+        such as arena matches and benchmarks should use it: if the file is
+        rewritten the model's weights change, and truncating it crashes the
+        process.
+        """
+        return cls(model_path=model_path, inference_only=True, mmap=mmap, q_cache_size=q_cache_size)
+    
+    def optimize_for_cpu(self, quantize=True, trace=True, num_threads=None):
+        """Play with a CPU-optimised copy of the policy network (see build_cpu_inference_net)
+        
+        num_threads sets torch's intra-op thread count.  The FP32 policy
+        network is kept for training and saving; the copy is rebuilt whenever
+        a model is loaded.  Returns self.
+        """
+        if self.device.type != 'cpu':
+            raise RuntimeError("optimize_for_cpu() needs a model running on the CPU")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.cpu_options = {'quantize': quantize, 'trace': trace}
+        self.play_net = build_cpu_inference_net(self.policy_net, quantize, trace)
+        self.invalidate_q_cache()
+        return self
+    
+    def build_play_net(self, policy_net):
+        """The network choose_move should run for policy_net (optimised copy after optimize_for_cpu)"""
+        if self.cpu_options is None:
+            return policy_net
+        return build_cpu_inference_net(policy_net, **self.cpu_options)
+    
+    def swap_networks(self, policy_net, play_net, model_format='dqn', model_options=None):
+        """Install a fully loaded play-only network in one step (hot reload, see model_watcher.py)
+        
+        choose_move reads play_net once per call, so a move already in
+        progress finishes on the network it started with; the Q-value cache
+        is invalidated after the swap.
+        """
+        if not self.inference_only:
+            raise RuntimeError("swap_networks() is for play-only models; training models use load_model()")
+        self.play_net = play_net
+        self.policy_net = policy_net
+        self.model_format, self.model_options = model_format, dict(model_options or {})
+        self.invalidate_q_cache()
+    
+    def invalidate_q_cache(self):
+        """Forget cached Q-values; call after changing the weights outside train_step/load_model"""
+        if self.q_cache is not None:
+            self.q_cache.clear()
+    
     def board_to_tensor(self, board, current_player):
-        """Convert board state to 3-channel tensor"""
-        state = np.zeros((3, 8, 8), dtype=np.float32)
-        
-        for i in range(8):
-            for j in range(8):
-                cell = board.grid[i][j]
-                if cell == current_player:
-                    state[0, i, j] = 1  # Current player's pieces
-                elif cell != ' ':
-                    state[1, i, j] = 1  # Opponent's pieces
-                else:
-                    state[2, i, j] = 1  # Empty squares
+        """Convert board state to 3-channel tensor (player, opponent, empty)"""
+        state = board_planes(board, current_player)
+        return torch.from_numpy(state).unsqueeze(0).to(self.device)
+    
+    def boards_to_tensor(self, boards, players, out=None):
+        """Encode N boards into one (N, 3, 8, 8) tensor.
         
-        return torch.FloatTensor(state).unsqueeze(0).to(self.device)
+        `out` may be a preallocated CPU float32 tensor of that shape; it is
+        filled in place through its NumPy view.
+        """
+        if out is None:
+            out = torch.empty((len(boards), 3, 8, 8), dtype=torch.float32)
+        encode_boards(boards, players, out=out.numpy())
+        return out.to(self.device)
+    
+    def bitboards_to_tensor(self, me, opp):
+        """Encode (player, opponent) uint64 mask arrays into one (N, 3, 8, 8) tensor"""
+        return torch.from_numpy(encode_bitboards(me, opp)).to(self.device)
     
     def choose_move(self, board, current_player, valid_moves, training=False):
         """Select best move using neural network"""
@@ -127,13 +600,17 @@ class ModernOthelloAI:
             return random.choice(valid_moves)
         
         # Exploitation: Use neural network to choose best move
-        state_tensor = self.board_to_tensor(board, current_player)
-        
-        with torch.no_grad():
-            q_values = self.policy_net(state_tensor)
-        
-        # Convert Q-values to 8x8 grid
-        q_values = q_values.cpu().numpy().reshape(8, 8)
+        if self.q_cache is not None:
+            q_values = self.cached_q_values(board, current_player).reshape(8, 8)
+        else:
+            with self.timer.phase('encode'):
+                state_tensor = self.board_to_tensor(board, current_player)
+            
+            with self.timer.phase('forward'), torch.inference_mode():
+                q_values = self.play_net(state_tensor)
+            
+            # Convert Q-values to 8x8 grid
+            q_values = q_values.cpu().numpy().reshape(8, 8)
         
         # Find best valid move
         best_move = None
@@ -147,45 +624,102 @@ class ModernOthelloAI:
         
         return best_move if best_move else valid_moves[0]
     
-    def store_experience(self, state, action, reward, next_state, done):
-        """Store experience in replay buffer"""
-        self.memory.push(state, action, reward, next_state, done)
+    def cached_q_values(self, board, current_player):
+        """64 Q-values for current_player through the Q-value cache
+        
+        The network is evaluated on the canonical orientation of the
+        position, so every symmetric variant gets the same (mapped) values.
+        """
+        with self.timer.phase('encode'):
+            me, opp, t = canonical(*from_board(board, current_player))
+        generation = self.q_cache.invalidations
+        q_values = self.q_cache.get((me, opp))
+        if q_values is None:
+            with self.timer.phase('encode'):
+                state_tensor = self.bitboards_to_tensor(np.array([me], dtype=np.uint64),
+                                                        np.array([opp], dtype=np.uint64))
+            with self.timer.phase('forward'), torch.inference_mode():
+                q_values = self.play_net(state_tensor)[0].cpu().numpy()
+            self.q_cache.put((me, opp), q_values, generation)
+        return q_values[_SYMMETRY_SQUARES_NP[t]]
+    
+    def store_experience(self, state, action, reward, next_state, done, next_legal=None):
+        """Store experience in replay buffer (states as bitboard.from_board pairs, see ReplayBuffer)"""
+        self.memory.push(state, action, reward, next_state, done, next_legal)
     
     def train_step(self):
         """Perform one training step using experience replay"""
         
+        if self.inference_only:
+            raise RuntimeError("train_step() needs a training model, not one built for inference")
+        
         if len(self.memory) < self.batch_size:
             return 0.0
         
         # Sample batch from memory
-        batch = self.memory.sample(self.batch_size)
-        states, actions, rewards, next_states, dones = zip(*batch)
-        
-        # Convert to tensors
-        states = torch.cat(states)
-        next_states = torch.cat(next_states)
-        actions = torch.LongTensor(actions).to(self.device)
-        rewards = torch.FloatTensor(rewards).to(self.device)
-        dones = torch.FloatTensor(dones).to(self.device)
-        
-        # Current Q-values
-        current_q_values = self.policy_net(states)
-        current_q_values = current_q_values.gather(1, actions.unsqueeze(1)).squeeze(1)
-        
-        # Target Q-values
-        with torch.no_grad():
-            next_q_values = self.target_net(next_states)
-            max_next_q_values = next_q_values.max(1)[0]
-            target_q_values = rewards + (1 - dones) * self.gamma * max_next_q_values
+        with self.timer.phase('sample'):
+            if isinstance(self.memory, PrioritizedReplayBuffer):
+                idx, weights = self.memory.sample_prioritized(self.batch_size)
+            else:
+                idx, weights = self.memory.sample_indices(self.batch_size), None
+            states, actions, rewards, next_states, dones = self.memory.get(idx)
+            next_legal = self.memory.next_legal[idx]
+        
+        # Convert to tensors: states and next states are decoded in one pass
+        with self.timer.phase('encode'):
+            # A next state is seen from the side to move in it.  That is the
+            # player who just moved only when the opponent had to pass, and
+            # then all of that player's discs are still "mine" in it.
+            same_player = (next_states[:, 0] & states[:, 0]) == states[:, 0]
+            signs = torch.from_numpy(np.where(same_player, 1.0, -1.0).astype(np.float32)).to(self.device)
+            n = len(actions)
+            both = np.concatenate([states, next_states])
+            planes = self.bitboards_to_tensor(both[:, 0], both[:, 1])
+            # The legal-move mask rides along as a 4th plane so augmentation transforms it too
+            legal = torch.from_numpy(unpack_bits(next_legal).reshape(n, 1, 8, 8)).to(self.device)
+            states, next_states = planes[:n], torch.cat([planes[n:], legal.float()], dim=1)
+            actions = torch.from_numpy(actions.astype(np.int64)).to(self.device)
+            if self.augment_symmetries:
+                states, actions, next_states = augment_batch(states, actions, next_states)
+            next_states, legal = next_states[:, :3].contiguous(), next_states[:, 3].reshape(n, 64) > 0
+            rewards = torch.from_numpy(rewards).to(self.device)
+            dones = torch.from_numpy(dones.astype(np.float32)).to(self.device)
+        
+        with self.timer.phase('train_forward'):
+            # Current Q-values
+            current_q_values = self.policy_net(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+            
+            # Target Q-values
+            with torch.no_grad():
+                online_next_q_values = None
+                if self.double_dqn:
+                    # The policy picks the next move in eval mode: its BatchNorm
+                    # statistics never see the next states
+                    training = self.policy_net.training
+                    self.policy_net.eval()
+                    online_next_q_values = self.policy_net(next_states)
+                    self.policy_net.train(training)
+                target_q_values = dqn_targets(self.target_net(next_states), legal, rewards, dones, signs,
+                                              self.gamma, online_next_q_values)
+            
+            # Compute loss (importance-weighted under prioritized replay)
+            if weights is None:
+                loss = nn.MSELoss()(current_q_values, target_q_values)
+            else:
+                td_errors = target_q_values - current_q_values
+                loss = (torch.from_numpy(weights).to(self.device) * td_errors.pow(2)).mean()
         
-        # Compute loss
-        loss = nn.MSELoss()(current_q_values, target_q_values)
+        if weights is not None:
+            with self.timer.phase('sample'):
+                self.memory.update_priorities(idx, td_errors.detach().cpu().numpy())
         
         # Optimize
-        self.optimizer.zero_grad()
-        loss.backward()
-        torch.nn.utils.clip_grad_norm_(self.policy_net.parameters(), 1.0)
-        self.optimizer.step()
+        with self.timer.phase('backward'):
+            self.optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(self.policy_net.parameters(), 1.0)
+            self.optimizer.step()
+        self.invalidate_q_cache()
         
         # Update target network periodically
         self.training_step += 1
@@ -194,27 +728,65 @@ class ModernOthelloAI:
         
         return loss.item()
     
-    def save_model(self, path='othello_model.pth'):
-        """Save model to disk"""
-        torch.save({
+    def checkpoint(self):
+        """Model checkpoint dict as written by save_model (tensors are live references)"""
+        checkpoint = {
+            'model_format': self.model_format,
+            'model_options': dict(self.model_options),
             'policy_net_state_dict': self.policy_net.state_dict(),
-            'target_net_state_dict': self.target_net.state_dict(),
-            'optimizer_state_dict': self.optimizer.state_dict(),
             'training_step': self.training_step,
             'epsilon': self.epsilon
-        }, path)
+        }
+        if not self.inference_only:
+            checkpoint['target_net_state_dict'] = self.target_net.state_dict()
+            checkpoint['optimizer_state_dict'] = self.optimizer.state_dict()
+        return checkpoint
+    
+    def save_model(self, path='othello_model.pth'):
+        """Save model to disk
+        
+        The file is written under a temporary name and renamed into place, so
+        a process loading or watching `path` never reads a half-written model.
+        """
+        with self.timer.phase('checkpoint'):
+            atomic_save(self.checkpoint(), path)
         print(f"💾 Model saved to {path}")
     
-    def load_model(self, path='othello_model.pth'):
-        """Load model from disk"""
-        checkpoint = torch.load(path, map_location=self.device)
-        self.policy_net.load_state_dict(checkpoint['policy_net_state_dict'])
-        self.target_net.load_state_dict(checkpoint['target_net_state_dict'])
-        self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
-        self.training_step = checkpoint.get('training_step', 0)
-        self.epsilon = checkpoint.get('epsilon', 0.1)
+    def load_model(self, path='othello_model.pth', mmap=False):
+        """Load model from disk
+        
+        In inference-only mode just the policy weights are restored; with
+        mmap=True the checkpoint tensors are memory-mapped instead of read
+        into memory up front, and a play-only CPU model keeps using the
+        mapped file as its weights (see for_inference).
+        """
+        checkpoint = torch.load(path, map_location=self.device, mmap=mmap)
+        # A play-only CPU model can use the mapped tensors directly
+        assign = self.inference_only and mmap and self.device.type == 'cpu'
+        self.load_checkpoint(checkpoint, assign=assign)
         self.policy_net.eval()
+        self.play_net = self.build_play_net(self.policy_net)
         print(f"📂 Model loaded from {path}")
+    
+    def load_checkpoint(self, checkpoint, assign=False):
+        """Restore networks, optimizer and counters from a checkpoint() dict
+        
+        The networks are rebuilt first if the checkpoint holds another model
+        format (e.g. a distilled 'small' network).
+        """
+        model_format = checkpoint.get('model_format', 'dqn')
+        model_options = checkpoint.get('model_options', {})
+        if (model_format, model_options) != (self.model_format, self.model_options):
+            self._build_networks(model_format, model_options)
+        self.policy_net.load_state_dict(checkpoint['policy_net_state_dict'], assign=assign)
+        if not self.inference_only:
+            self.target_net.load_state_dict(checkpoint.get('target_net_state_dict',
+                                                           checkpoint['policy_net_state_dict']))
+            if 'optimizer_state_dict' in checkpoint:
+                self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        self.training_step = checkpoint.get('training_step', 0)
+        self.epsilon = checkpoint.get('epsilon', 0.1)
+        self.invalidate_q_cache()
 
 
 class SelfPlayTrainer:
@@ -228,6 +800,7 @@ class SelfPlayTrainer:
         self.total_wins_black = 0
         self.total_wins_white = 0
         self.total_draws = 0
+        self.dataset = None   # optional selfplay_dataset.ShardWriter recording every game
     
     def play_game(self, training=True):
         """Play one complete self-play game"""
@@ -237,16 +810,22 @@ class SelfPlayTrainer:
         board = Board()
         game = Game(board)
         game_history = []
-        
-        while not game.check_game_over():
-            valid_moves = board.get_valid_moves(game.current_player)
+        timer = self.ai.timer
+        
+        while True:
+            with timer.phase('movegen'):
+                game_over = game.check_game_over()
+                valid_moves = [] if game_over else board.get_valid_moves(game.current_player)
+            if game_over:
+                break
             
             if not valid_moves:
                 game.switch_player()
                 continue
             
             # Get current state
-            state = self.ai.board_to_tensor(board, game.current_player)
+            with timer.phase('encode'):
+                state = from_board(board, game.current_player)
             
             # AI chooses move
             move = self.ai.choose_move(board, game.current_player, valid_moves, training=training)
@@ -256,16 +835,23 @@ class SelfPlayTrainer:
                 action_idx = row * 8 + col
                 
                 # Make move
-                board.place_disc(row, col, game.current_player)
+                with timer.phase('movegen'):
+                    board.place_disc(row, col, game.current_player)
                 
-                # Get next state
-                next_state = self.ai.board_to_tensor(board, game.current_player)
+                # Next state, seen from the side to move: the opponent, or this
+                # player again if the opponent has to pass
+                with timer.phase('encode'):
+                    mine, theirs = from_board(board, game.current_player)
+                    next_state, next_legal = (theirs, mine), legal_moves(theirs, mine)
+                    if not next_legal:
+                        next_state, next_legal = (mine, theirs), legal_moves(mine, theirs)
                 
                 # Store experience (reward will be calculated at game end)
                 game_history.append({
                     'state': state,
                     'action': action_idx,
                     'next_state': next_state,
+                    'next_legal': next_legal,
                     'player': game.current_player
                 })
                 
@@ -299,9 +885,18 @@ class SelfPlayTrainer:
                 experience['action'],
                 reward,
                 experience['next_state'],
-                1.0 if winner_color is not None else 0.0
+                1.0 if winner_color is not None else 0.0,
+                experience['next_legal']
             )
         
+        if self.dataset is not None and game_history:
+            states = np.array([experience['state'] for experience in game_history], dtype=np.uint64)
+            margin = counts['B'] - counts['W']
+            self.dataset.add_game(states[:, 0], states[:, 1],
+                                  [experience['action'] for experience in game_history],
+                                  [margin if experience['player'] == 'B' else -margin
+                                   for experience in game_history])
+        
         # Update statistics
         self.num_episodes += 1
         if winner_color == 'B':
@@ -313,14 +908,26 @@ class SelfPlayTrainer:
         
         return winner_color, counts
     
-    def train(self, num_episodes=1000, save_interval=100):
-        """Train through self-play"""
+    def train(self, num_episodes=1000, save_interval=100, start_episode=0, checkpoint_dir='.', on_save=None,
+              metrics=None, metrics_interval=10, profiler=None, writer=None):
+        """Train through self-play
+        
+        Runs episodes start_episode..num_episodes-1 (start_episode > 0 resumes a
+        run).  Every save_interval episodes the model is saved to
+        checkpoint_dir (on the thread of `writer`, a
+        training_checkpoint.CheckpointWriter, if given) and
+        on_save(episodes_done) is called, e.g. to write a full-state
+        checkpoint.  A training_metrics.MetricsLogger gets a record every
+        metrics_interval episodes; a ProfilerCapture is stepped after every
+        training step.
+        """
         print(f"🚀 Starting Self-Play Training for {num_episodes} episodes...")
         print(f"Device: {self.ai.device}")
         
         losses = []
+        logged_losses = 0
         
-        for episode in range(num_episodes):
+        for episode in range(start_episode, num_episodes):
             # Play one game
             winner, counts = self.play_game(training=True)
             
@@ -329,6 +936,8 @@ class SelfPlayTrainer:
                 for _ in range(10):  # Multiple training steps per game
                     loss = self.ai.train_step()
                     losses.append(loss)
+                    if profiler:
+                        profiler.step()
             
             # Decay exploration rate
             self.ai.epsilon = max(0.01, self.ai.epsilon * 0.995)
@@ -347,12 +956,23 @@ class SelfPlayTrainer:
                       f"White: {win_rate_white:.1f}% | "
                       f"Draw: {draw_rate:.1f}%")
             
+            if metrics and (episode + 1) % metrics_interval == 0:
+                metrics.log(self, self.ai.training_step, losses[logged_losses:])
+                logged_losses = len(losses)
+            
             # Save model periodically
             if (episode + 1) % save_interval == 0:
-                self.ai.save_model(f'othello_model_ep{episode + 1}.pth')
+                path = os.path.join(checkpoint_dir, f'othello_model_ep{episode + 1}.pth')
+                if writer:
+                    with self.ai.timer.phase('checkpoint'):
+                        writer.save_model(self.ai, path)
+                else:
+                    self.ai.save_model(path)
+                if on_save:
+                    on_save(episode + 1)
         
         # Save final model
-        self.ai.save_model('othello_model_final.pth')
+        self.ai.save_model(os.path.join(checkpoint_dir, 'othello_model_final.pth'))
         print("✅ Training Complete!")
         print(f"📊 Final Stats - Black Wins: {self.total_wins_black} | "
               f"White Wins: {self.total_wins_white} | Draws: {self.total_draws}")
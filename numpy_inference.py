@@ -0,0 +1,147 @@
+"""
+Torch-free inference for the neural AI
+
+export_npz() converts a ModernOthelloAI checkpoint (either model format)
+into a small .npz file: BatchNorm is folded into the convolutions and the
+weights are laid out for the NumPy forward pass.  NumpyOthelloAI plays from
+that file with nothing but NumPy: convolutions are im2col + one matmul each,
+activations stay channels-last so no transposes are needed between layers.
+
+    python numpy_inference.py othello_model_final.pth            # -> othello_model_final.npz
+
+main.py (through model_loader) uses it when PyTorch is not installed.
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from encoding import encode_boards
+
+NPZ_VERSION = 1
+
+
+def _fold_conv(state, conv, bn, eps=1e-5):
+    """Conv weights as an (in*9, out) im2col matrix with BatchNorm folded in, plus the bias."""
+    weight = state[f'{conv}.weight'].double().numpy()
+    bias = state[f'{conv}.bias'].double().numpy()
+    scale = state[f'{bn}.weight'].double().numpy() / np.sqrt(state[f'{bn}.running_var'].double().numpy() + eps)
+    weight = weight * scale[:, None, None, None]
+    bias = (bias - state[f'{bn}.running_mean'].double().numpy()) * scale + state[f'{bn}.bias'].double().numpy()
+    out_channels, in_channels, kh, kw = weight.shape
+    # Patch layout (ky, kx, in) to match _im2col on channels-last activations
+    matrix = weight.transpose(2, 3, 1, 0).reshape(kh * kw * in_channels, out_channels)
+    return matrix.astype(np.float32), bias.astype(np.float32)
+
+
+def export_npz(model_path, out_path=None):
+    """Write the policy network of a checkpoint as a torch-free .npz; returns its path."""
+    import torch
+
+    checkpoint = torch.load(model_path, map_location='cpu')
+    state = checkpoint['policy_net_state_dict']
+    model_format = checkpoint.get('model_format', 'dqn')
+    arrays = {'version': np.array(NPZ_VERSION), 'model_format': np.array(model_format),
+              'epsilon': np.array(checkpoint.get('epsilon', 0.1))}
+    convs = [f'conv{i}' for i in range(1, 5) if f'conv{i}.weight' in state]
+    for i, conv in enumerate(convs):
+        arrays[f'conv{i}_w'], arrays[f'conv{i}_b'] = _fold_conv(state, conv, conv.replace('conv', 'bn'))
+    if model_format == 'small':
+        arrays['head_w'] = state['head.weight'].numpy().reshape(1, -1).T.astype(np.float32)
+        arrays['head_b'] = state['head.bias'].numpy().astype(np.float32)
+    elif model_format == 'dqn':
+        # fc1 reads the NCHW flatten; reorder its inputs for channels-last (h, w, c)
+        fc1 = state['fc1.weight'].numpy().reshape(-1, 128, 8, 8).transpose(0, 2, 3, 1).reshape(-1, 8 * 8 * 128)
+        arrays['fc0_w'], arrays['fc0_b'] = fc1.T.copy(), state['fc1.bias'].numpy()
+        arrays['fc1_w'], arrays['fc1_b'] = state['fc2.weight'].numpy().T.copy(), state['fc2.bias'].numpy()
+        arrays['fc2_w'], arrays['fc2_b'] = state['fc3.weight'].numpy().T.copy(), state['fc3.bias'].numpy()
+    else:
+        raise ValueError(f"Cannot export model format {model_format!r}")
+    if out_path is None:
+        out_path = os.path.splitext(model_path)[0] + '.npz'
+    np.savez(out_path, **arrays)
+    return out_path
+
+
+def _im2col(x):
+    """(N, 8, 8, C) channels-last activations -> (N * 64, 9 * C) 3x3 patches (zero padded)."""
+    n, h, w, c = x.shape
+    padded = np.zeros((n, h + 2, w + 2, c), dtype=x.dtype)
+    padded[:, 1:-1, 1:-1] = x
+    cols = np.empty((n, h, w, 3, 3, c), dtype=x.dtype)
+    for ky in range(3):
+        for kx in range(3):
+            cols[:, :, :, ky, kx] = padded[:, ky:ky + h, kx:kx + w]
+    return cols.reshape(n * h * w, 9 * c)
+
+
+class NumpyQNetwork:
+    """Forward pass of an exported policy network: (N, 3, 8, 8) planes -> (N, 64) Q-values"""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        if int(arrays['version']) != NPZ_VERSION:
+            raise ValueError(f"{path}: unsupported .npz model version {int(arrays['version'])}")
+        self.model_format = str(arrays['model_format'])
+        self.epsilon = float(arrays['epsilon'])
+        self.convs = [(arrays[f'conv{i}_w'], arrays[f'conv{i}_b'])
+                      for i in range(4) if f'conv{i}_w' in arrays]
+        self.head = (arrays['head_w'], arrays['head_b']) if 'head_w' in arrays else None
+        self.fcs = [(arrays[f'fc{i}_w'], arrays[f'fc{i}_b']) for i in range(3) if f'fc{i}_w' in arrays]
+
+    def __call__(self, planes):
+        n = len(planes)
+        x = np.ascontiguousarray(planes.transpose(0, 2, 3, 1))
+        for weight, bias in self.convs:
+            x = _im2col(x) @ weight
+            x += bias
+            np.maximum(x, 0, out=x)
+            x = x.reshape(n, 8, 8, -1)
+        if self.head is not None:
+            weight, bias = self.head
+            return (x.reshape(n * 64, -1) @ weight + bias).reshape(n, 64)
+        x = x.reshape(n, -1)
+        for i, (weight, bias) in enumerate(self.fcs):
+            x = x @ weight
+            x += bias
+            if i < len(self.fcs) - 1:
+                np.maximum(x, 0, out=x)
+        return x
+
+
+class NumpyOthelloAI:
+    """Play-only stand-in for ModernOthelloAI that needs only NumPy"""
+
+    def __init__(self, model_path):
+        self.net = NumpyQNetwork(model_path)
+        self.model_format = self.net.model_format
+        self.epsilon = self.net.epsilon
+        self._planes = np.empty((1, 3, 8, 8), dtype=np.float32)
+        print(f"📂 NumPy model loaded from {model_path}")
+
+    def q_values(self, board, current_player):
+        """64 Q-values for current_player (square = row * 8 + col)."""
+        return self.net(encode_boards([board], current_player, out=self._planes))[0]
+
+    def choose_move(self, board, current_player, valid_moves, training=False):
+        """Legal move with the highest Q-value (training/exploration is not supported)."""
+        if not valid_moves:
+            return None
+        q_values = self.q_values(board, current_player)
+        return max(valid_moves, key=lambda move: q_values[move[0] * 8 + move[1]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a model for torch-free play")
+    parser.add_argument('model', help="ModernOthelloAI checkpoint (.pth)")
+    parser.add_argument('--out', help="output path (default: the model path with .npz)")
+    args = parser.parse_args()
+    path = export_npz(args.model, args.out)
+    print(f"💾 Exported {args.model} ({os.path.getsize(args.model) / 2**20:.1f} MB) "
+          f"to {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Persistent position cache for the classic AI search
+
+A fixed-size, memory-mapped open-addressing hash table stored in a file, so
+every game session, server bot and analysis job shares the search results
+of earlier runs.
+
+Layout: a 16-byte header (magic, slot count) followed by 24-byte slots
+    word 0: key ^ score_bits ^ meta   (lockless-hashing check word)
+    word 1: score (float64)
+    word 2: meta = depth | flag << 8 | move << 16
+Positions are keyed by a 64-bit hash of their canonical form over the 8
+board symmetries, so mirrored positions share an entry; the stored best
+move is kept in the canonical frame and mapped back on lookup.
+
+Reads take no lock: a slot is accepted only if its check word matches, so a
+half-written slot from another process reads as a miss.  Writers lock just
+the slot's byte range (fcntl, where available) while writing it.
+"""
+
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes stay unlocked, the check word still rejects torn slots
+    fcntl = None
+
+from bitboard import FULL, INVERSE_TRANSFORM, canonical, transform_square
+
+MAGIC = b'OTHPC001'
+HEADER = struct.Struct('<8sQ')
+SLOT = struct.Struct('<QdQ')
+PROBES = 4          # slots examined per lookup (linear probing)
+NO_MOVE = 255
+
+# Bound types stored with each score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def position_key(me, opp, salt=0):
+    """64-bit hash of the canonical position; returns (key, symmetry)."""
+    m, o, t = canonical(me, opp)
+    h = ((m * 0x9E3779B97F4A7C15) ^ (o * 0xC2B2AE3D27D4EB4F) ^ salt) & FULL
+    h ^= h >> 31
+    h = (h * 0xBF58476D1CE4E5B9) & FULL
+    h ^= h >> 29
+    return h or 1, t
+
+
+def _score_bits(score):
+    return struct.unpack('<Q', struct.pack('<d', score))[0]
+
+
+class PositionCache:
+    """Memory-mapped search cache shared between processes."""
+
+    def __init__(self, path, num_slots=1 << 18):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock(0, HEADER.size)
+        try:
+            if os.fstat(self.fd).st_size < HEADER.size:
+                os.ftruncate(self.fd, HEADER.size + num_slots * SLOT.size)
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                os.write(self.fd, HEADER.pack(MAGIC, num_slots))
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            magic, slots = HEADER.unpack(os.read(self.fd, HEADER.size))
+        finally:
+            self._unlock(0, HEADER.size)
+        if magic != MAGIC:
+            os.close(self.fd)
+            raise ValueError(f"{path} is not a position cache file")
+        self.num_slots = slots
+        self.map = mmap.mmap(self.fd, HEADER.size + slots * SLOT.size)
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def _lock(self, start, length):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start)
+
+    def _unlock(self, start, length):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+    def _offset(self, key, i):
+        return HEADER.size + ((key + i) % self.num_slots) * SLOT.size
+
+    def _read(self, offset):
+        """Return (key, score, meta) of a slot, or None if empty or torn."""
+        check, score, meta = SLOT.unpack_from(self.map, offset)
+        if not check and not meta:
+            return None
+        return check ^ _score_bits(score) ^ meta, score, meta
+
+    def lookup(self, key, t):
+        """Return (depth, flag, score, move) for a position_key() result, or None.
+
+        move is a (row, col) tuple in the caller's orientation, or None.
+        """
+        self.probes += 1
+        for i in range(PROBES):
+            slot = self._read(self._offset(key, i))
+            if slot is not None and slot[0] == key:
+                _, score, meta = slot
+                move = (meta >> 16) & 0xFF
+                if move != NO_MOVE:
+                    move = divmod(transform_square(move, INVERSE_TRANSFORM[t]), 8)
+                else:
+                    move = None
+                self.hits += 1
+                return meta & 0xFF, (meta >> 8) & 0xFF, score, move
+        return None
+
+    def store(self, key, t, depth, flag, score, move):
+        """Record a search result for a position_key() result.
+
+        Replaces the same position (unless it was searched deeper) or the
+        shallowest of the probed slots.
+        """
+        victim, victim_depth = None, None
+        for i in range(PROBES):
+            offset = self._offset(key, i)
+            slot = self._read(offset)
+            if slot is None or slot[0] == key:
+                if slot is not None and (slot[2] & 0xFF) > depth:
+                    return
+                victim = offset
+                break
+            if victim is None or (slot[2] & 0xFF) < victim_depth:
+                victim, victim_depth = offset, slot[2] & 0xFF
+        sq = NO_MOVE if move is None else transform_square(move[0] * 8 + move[1], t)
+        meta = min(depth, 255) | (flag << 8) | (sq << 16)
+        score = float(score)
+        self._lock(victim, SLOT.size)
+        try:
+            SLOT.pack_into(self.map, victim, key ^ _score_bits(score) ^ meta, score, meta)
+        finally:
+            self._unlock(victim, SLOT.size)
+        self.stores += 1
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
@@ -0,0 +1,236 @@
+"""
+Sharded on-disk self-play dataset for the neural AI
+
+Every position played in self-play becomes one fixed 24-byte record:
+    me, opp   uint64 bitboards of the side to move (see bitboard.py)
+    game      uint32 game id, unique within the dataset
+    move      square played (row * 8 + col)
+    ply       index of the move within the game
+    outcome   +1 / 0 / -1 for the side to move
+    margin    final disc difference for the side to move
+Records are appended to numbered shard files (a 16-byte header followed by
+raw records) that are never rewritten, so a dataset can grow across
+training runs.
+
+ShardDataset memory-maps the shards and yields shuffled batches built on a
+background thread.  Only one shard permutation and a few batches are ever
+held in memory, so datasets far larger than RAM can be read; the mapped
+pages are left to the OS page cache.
+"""
+
+import glob
+import os
+import queue
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from encoding import encode_bitboards
+
+MAGIC = b'OTHSP001'
+HEADER_BYTES = 16
+SHARD_PATTERN = 'shard_{:05d}.bin'
+RECORD_DTYPE = np.dtype([
+    ('me', '<u8'), ('opp', '<u8'), ('game', '<u4'),
+    ('move', 'i1'), ('ply', 'u1'), ('outcome', 'i1'), ('margin', 'i1'),
+])
+
+Batch = namedtuple('Batch', 'planes moves outcomes margins')
+
+
+def _shard_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, SHARD_PATTERN.replace('{:05d}', '*'))))
+
+
+def _header():
+    return MAGIC + np.array([RECORD_DTYPE.itemsize, 0], dtype='<u4').tobytes()
+
+
+def open_shard(path):
+    """Read-only (N,) RECORD_DTYPE memmap of one shard file."""
+    with open(path, 'rb') as f:
+        head = f.read(HEADER_BYTES)
+    if head[:8] != MAGIC or np.frombuffer(head, '<u4', 1, 8)[0] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a self-play shard")
+    count = (os.path.getsize(path) - HEADER_BYTES) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_BYTES, shape=(count,))
+
+
+class ShardWriter:
+    """Append self-play games to `directory` as shards of up to `shard_records` positions"""
+
+    def __init__(self, directory, shard_records=1 << 20, buffer_records=8192):
+        self.directory = directory
+        self.shard_records = shard_records
+        os.makedirs(directory, exist_ok=True)
+        existing = _shard_paths(directory)
+        # Never append to an existing shard; continue the game ids where the last run stopped
+        self._next_shard = len(existing)
+        self.next_game = 0
+        if existing:
+            last = open_shard(existing[-1])
+            self.next_game = int(last['game'][-1]) + 1 if len(last) else 0
+        self.records = 0
+        self._buffer = np.zeros(buffer_records, dtype=RECORD_DTYPE)
+        self._buffered = 0
+        self._file = None
+        self._in_shard = 0
+
+    def add_game(self, me, opp, moves, margins):
+        """Record one game: per-ply bitboards of the side to move, squares played and
+        the final disc margin from each mover's point of view; returns the game id."""
+        n = len(moves)
+        margins = np.broadcast_to(np.asarray(margins, dtype=np.int8), (n,))
+        records = np.empty(n, dtype=RECORD_DTYPE)
+        records['me'] = me
+        records['opp'] = opp
+        records['game'] = self.next_game
+        records['move'] = moves
+        records['ply'] = np.arange(n)
+        records['outcome'] = np.sign(margins)
+        records['margin'] = margins
+        self._append(records)
+        self.next_game += 1
+        return self.next_game - 1
+
+    def _append(self, records):
+        while len(records):
+            free = len(self._buffer) - self._buffered
+            take = records[:free]
+            self._buffer[self._buffered:self._buffered + len(take)] = take
+            self._buffered += len(take)
+            records = records[free:]
+            if self._buffered == len(self._buffer):
+                self.flush()
+
+    def flush(self):
+        """Write buffered records, starting new shards as they fill."""
+        data = self._buffer[:self._buffered]
+        while len(data):
+            if self._file is None or self._in_shard >= self.shard_records:
+                self._open_next()
+            chunk = data[:self.shard_records - self._in_shard]
+            self._file.write(chunk.tobytes())
+            self._in_shard += len(chunk)
+            self.records += len(chunk)
+            data = data[len(chunk):]
+        self._buffered = 0
+        if self._file is not None:
+            self._file.flush()
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, SHARD_PATTERN.format(self._next_shard))
+        self._file = open(path, 'xb')
+        self._file.write(_header())
+        self._next_shard += 1
+        self._in_shard = 0
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShardDataset:
+    """Memory-mapped view of every shard in `directory`"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.shards = [open_shard(path) for path in _shard_paths(directory)]
+        self.shards = [shard for shard in self.shards if len(shard)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    @property
+    def nbytes(self):
+        return len(self) * RECORD_DTYPE.itemsize
+
+    def _batches(self, batch_size, rng, shuffle, drop_last):
+        order = rng.permutation(len(self.shards)) if shuffle else range(len(self.shards))
+        pending, count = [], 0   # a short batch carried over into the next shard
+        for s in order:
+            shard = self.shards[s]
+            index = rng.permutation(len(shard)) if shuffle else np.arange(len(shard))
+            first = 0
+            if count:
+                first = batch_size - count
+                pending.append(shard[np.sort(index[:first])])
+                count += len(pending[-1])
+                if count < batch_size:
+                    continue
+                yield np.concatenate(pending)
+                pending, count = [], 0
+            for start in range(first, len(index), batch_size):
+                # Sorted reads touch each mapped page once; order within a batch doesn't matter
+                records = shard[np.sort(index[start:start + batch_size])]
+                if len(records) < batch_size:
+                    pending, count = [records], len(records)
+                else:
+                    yield records
+        if count and not drop_last:
+            yield np.concatenate(pending)
+
+    def batches(self, batch_size=256, shuffle=True, seed=None, prefetch=4, drop_last=False, device=None):
+        """Yield Batch(planes, moves, outcomes, margins) tensors for one pass over the data.
+
+        Shards are visited in random order and each shard is read in a random
+        permutation.  Batches are decoded by a background thread that stays
+        up to `prefetch` batches ahead.
+        """
+        import torch
+
+        rng = np.random.default_rng(seed)
+        ready = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for records in self._batches(batch_size, rng, shuffle, drop_last):
+                    batch = Batch(torch.from_numpy(encode_bitboards(records['me'], records['opp'])),
+                                  torch.from_numpy(records['move'].astype(np.int64)),
+                                  torch.from_numpy(records['outcome'].astype(np.float32)),
+                                  torch.from_numpy(records['margin'].astype(np.float32)))
+                    if not put(batch):
+                        return
+                put(done)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=produce, name='shard-prefetch', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                if device is not None:
+                    item = Batch(*(t.to(device, non_blocking=True) for t in item))
+                yield item
+        finally:
+            stop.set()
+            thread.join()
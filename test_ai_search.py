@@ -0,0 +1,265 @@
+"""
+Tests for the classic alpha-beta search in ai.py
+Run with: python -m pytest test_ai_search.py
+"""
+
+import random
+
+import ai
+import bitboard
+from board import Board
+
+
+def _minimax(board, color, depth, maximizing, orig_color):
+    """Reference full-width minimax (the original 'hard' search)."""
+    moves = board.get_valid_moves(color)
+    opponent = 'W' if color == 'B' else 'B'
+    if depth == 0 or not moves:
+        return ai._evaluate(board, orig_color), None
+    best_score = -ai.INF if maximizing else ai.INF
+    best_move = None
+    for m in moves:
+        b2 = board.clone()
+        b2.place_disc(m[0], m[1], color)
+        sc, _ = _minimax(b2, opponent, depth - 1, not maximizing, orig_color)
+        if (maximizing and sc > best_score) or (not maximizing and sc < best_score):
+            best_score, best_move = sc, m
+    return best_score, best_move
+
+
+def _random_positions(count, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, color = Board(), 'B'
+        for _ in range(rng.randint(0, 30)):
+            moves = board.get_valid_moves(color)
+            if not moves:
+                break
+            r, c = rng.choice(moves)
+            board.place_disc(r, c, color)
+            color = 'W' if color == 'B' else 'B'
+        if board.get_valid_moves(color):
+            positions.append((board, color))
+    return positions
+
+
+def test_alphabeta_matches_minimax():
+    for board, color in _random_positions(5):
+        expected = _minimax(board, color, 2, True, color)
+        assert ai._negamax(board, color, 2, -ai.INF, ai.INF) == expected
+
+
+def test_probcut_search_returns_legal_move():
+    for board, color in _random_positions(3, seed=1):
+        stats = {}
+        _, move, depth = ai.search(board, color, 4, probcut_t=1.0, stats=stats)
+        assert depth == 4
+        assert move in board.get_valid_moves(color)
+        assert stats['nodes'] > 0
+
+
+def test_time_limited_search_stops():
+    board = Board()
+    _, move, depth = ai.search(board, 'B', 30, time_limit=0.2)
+    assert 1 <= depth < 30
+    assert move in board.get_valid_moves('B')
+
+
+def _exact(board, color, passed=False):
+    """Reference endgame result: full minimax on Board objects."""
+    opponent = 'W' if color == 'B' else 'B'
+    moves = board.get_valid_moves(color)
+    if not moves:
+        if passed:
+            me, opp = bitboard.from_board(board, color)
+            return bitboard.popcount(me) - bitboard.popcount(opp)
+        return -_exact(board, opponent, True)
+    best = -ai.INF
+    for m in moves:
+        b2 = board.clone()
+        b2.place_disc(m[0], m[1], color)
+        best = max(best, -_exact(b2, opponent))
+    return best
+
+
+def test_stable_discs_never_flip():
+    rng = random.Random(2)
+    for _ in range(20):
+        board, color, snapshots = Board(), 'B', []
+        while True:
+            moves = board.get_valid_moves(color)
+            if not moves:
+                color = 'W' if color == 'B' else 'B'
+                moves = board.get_valid_moves(color)
+                if not moves:
+                    break
+            for side in 'BW':
+                snapshots.append((side, bitboard.stable_discs(*bitboard.from_board(board, side))))
+            r, c = rng.choice(moves)
+            board.place_disc(r, c, color)
+            color = 'W' if color == 'B' else 'B'
+        for side, stable in snapshots:
+            assert stable & ~bitboard.from_board(board, side)[0] == 0
+
+
+def test_full_board_is_stable():
+    me = 0x00FF00FF00FF00FF
+    opp = bitboard.FULL ^ me
+    assert bitboard.stable_discs(me, opp) == me
+    assert bitboard.stable_discs(opp, me) == opp
+
+
+def test_endgame_solver_is_exact():
+    rng = random.Random(3)
+    solved = 0
+    while solved < 3:
+        board, color = Board(), 'B'
+        for _ in range(54):
+            moves = board.get_valid_moves(color)
+            if not moves:
+                color = 'W' if color == 'B' else 'B'
+                moves = board.get_valid_moves(color)
+                if not moves:
+                    break
+            r, c = rng.choice(moves)
+            board.place_disc(r, c, color)
+            color = 'W' if color == 'B' else 'B'
+        if not board.get_valid_moves(color):
+            continue
+        score, move = ai.solve_endgame(board, color)
+        assert score == _exact(board, color)
+        assert move in board.get_valid_moves(color)
+        solved += 1
+
+
+def test_endgame_solver_respects_time_limit():
+    import time
+
+    rng = random.Random(7)
+    board, color = Board(), 'B'
+    for _ in range(46):
+        moves = board.get_valid_moves(color)
+        if not moves:
+            color = 'W' if color == 'B' else 'B'
+            moves = board.get_valid_moves(color)
+        r, c = rng.choice(moves)
+        board.place_disc(r, c, color)
+        color = 'W' if color == 'B' else 'B'
+    assert board.get_valid_moves(color)
+    start = time.perf_counter()
+    assert ai.solve_endgame(board, color, time_limit=0.01) == (None, None)
+    assert time.perf_counter() - start < 0.5
+    # A level whose solver runs out of time still answers with the search's move
+    ai.SEARCH_SETTINGS['test'] = {'depth': 4, 'probcut_t': None, 'time_limit': 0.02, 'endgame_empties': 18}
+    try:
+        assert ai.choose_move(board, color, 'test') in board.get_valid_moves(color)
+    finally:
+        del ai.SEARCH_SETTINGS['test']
+
+
+def test_evaluate_many_matches_scalar():
+    positions = _random_positions(40, seed=4)
+    packed = ai.pack_positions([b for b, _ in positions], [c for _, c in positions])
+    scores = ai.evaluate_many(packed, chunk_size=16)
+    assert list(scores) == [ai._evaluate(b, c) for b, c in positions]
+
+
+def test_fit_logistic_recovers_weights():
+    import json
+    import os
+    import tempfile
+
+    import numpy as np
+    import tune_weights
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(20000, len(ai.EVAL_TERMS))).astype(np.float32)
+    true_w = np.array([1.5, -0.5, 0.8, 0.2])
+    results = (rng.random(20000) < 1 / (1 + np.exp(-features @ true_w))).astype(np.float32)
+    w, _ = tune_weights.fit_logistic(features, results, chunk_size=3000, l2=0.0)
+    assert np.allclose(w, true_w, atol=0.1)
+
+    path = os.path.join(tempfile.mkdtemp(), 'eval_weights.json')
+    with open(path, 'w') as f:
+        json.dump({'weights': {'corner': 40.0, 'disc': 1.5}}, f)
+    weights = ai._load_eval_weights(path)
+    assert weights['corner'] == 40.0 and weights['disc'] == 1.5
+    assert weights['mobility'] == ai.DEFAULT_EVAL_WEIGHTS['mobility']
+
+
+def test_position_cache_shares_symmetric_positions():
+    import os
+    import tempfile
+
+    from position_cache import EXACT, PositionCache, position_key
+
+    path = os.path.join(tempfile.mkdtemp(), 'cache.bin')
+    cache = PositionCache(path, num_slots=1024)
+    board, color = _random_positions(1, seed=5)[0]
+    me, opp = bitboard.from_board(board, color)
+    move = board.get_valid_moves(color)[0]
+    cache.store(*position_key(me, opp), 5, EXACT, 12.0, move)
+
+    # A mirrored copy of the position hits the same entry with a mirrored move
+    mirrored = PositionCache(path)
+    entry = mirrored.lookup(*position_key(bitboard.mirror_horizontal(me), bitboard.mirror_horizontal(opp)))
+    assert entry == (5, EXACT, 12.0, (move[0], 7 - move[1]))
+    cache.close()
+    mirrored.close()
+
+
+def test_cached_search_matches_uncached():
+    import os
+    import tempfile
+
+    positions = _random_positions(3, seed=6)
+    expected = [ai._negamax(b, c, 3, -ai.INF, ai.INF)[0] for b, c in positions]
+    ai.use_position_cache(os.path.join(tempfile.mkdtemp(), 'cache.bin'), num_slots=4096)
+    try:
+        for _ in range(2):
+            assert [ai._negamax(b, c, 3, -ai.INF, ai.INF)[0] for b, c in positions] == expected
+    finally:
+        ai.use_position_cache(None)
+
+
+
+def test_cache_salt_tracks_probcut_params():
+    import os
+    import tempfile
+
+    plain, selective = ai._cache_salt(None), ai._cache_salt(1.5)
+    saved = ai.PROBCUT_PARAMS
+    ai.PROBCUT_PARAMS = {**saved, 3: [(1, 1.1, 0.0, 18.0)]}
+    try:
+        # A refit invalidates selective entries only
+        assert ai._cache_salt(None) == plain and ai._cache_salt(1.5) != selective
+    finally:
+        ai.PROBCUT_PARAMS = saved
+
+    # The salts are computed once per search, not per node
+    calls = []
+    salt = ai._cache_salt
+    ai._cache_salt = lambda probcut_t: calls.append(probcut_t) or salt(probcut_t)
+    ai.use_position_cache(os.path.join(tempfile.mkdtemp(), 'cache.bin'), num_slots=4096)
+    try:
+        ai.search(Board(), 'B', 5, probcut_t=1.5)
+    finally:
+        ai.use_position_cache(None)
+        ai._cache_salt = salt
+    assert sorted(calls, key=str) == [1.5, None]
+
+if __name__ == "__main__":
+    test_alphabeta_matches_minimax()
+    test_probcut_search_returns_legal_move()
+    test_time_limited_search_stops()
+    test_stable_discs_never_flip()
+    test_full_board_is_stable()
+    test_endgame_solver_is_exact()
+    test_endgame_solver_respects_time_limit()
+    test_evaluate_many_matches_scalar()
+    test_fit_logistic_recovers_weights()
+    test_position_cache_shares_symmetric_positions()
+    test_cached_search_matches_uncached()
+    test_cache_salt_tracks_probcut_params()
+    print("✅ All search tests passed")
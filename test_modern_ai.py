@@ -0,0 +1,884 @@
+"""
+Tests for the neural AI (modern_ai.py) and its helpers
+Run with: python -m pytest test_modern_ai.py
+"""
+
+import random
+import time
+
+import numpy as np
+import pytest
+
+import encoding
+from bitboard import from_board
+from board import Board
+
+
+def _random_positions(count, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        board, color = Board(), 'B'
+        for _ in range(rng.randint(0, 60)):
+            moves = board.get_valid_moves(color)
+            if not moves:
+                color = 'W' if color == 'B' else 'B'
+                moves = board.get_valid_moves(color)
+                if not moves:
+                    break
+            r, c = rng.choice(moves)
+            board.place_disc(r, c, color)
+            color = 'W' if color == 'B' else 'B'
+        positions.append((board, color))
+    return positions
+
+
+def _reference_planes(board, player):
+    state = np.zeros((3, 8, 8), dtype=np.float32)
+    for i in range(8):
+        for j in range(8):
+            cell = board.grid[i][j]
+            if cell == player:
+                state[0, i, j] = 1
+            elif cell is not None:
+                state[1, i, j] = 1
+            else:
+                state[2, i, j] = 1
+    return state
+
+
+def test_encoders_match_reference():
+    positions = _random_positions(50)
+    expected = np.stack([_reference_planes(b, c) for b, c in positions])
+    boards = [b for b, _ in positions]
+    players = [c for _, c in positions]
+    assert np.array_equal(encoding.encode_boards(boards, players), expected)
+    assert np.array_equal(encoding.board_planes(*positions[0]), expected[0])
+    packed = np.array([from_board(b, c) for b, c in positions], dtype=np.uint64)
+    assert np.array_equal(encoding.encode_bitboards(packed[:, 0], packed[:, 1]), expected)
+
+
+def test_model_tensors_match_reference():
+    torch = pytest.importorskip('torch')
+    from modern_ai import ModernOthelloAI
+
+    ai = ModernOthelloAI()
+    positions = _random_positions(8, seed=1)
+    expected = torch.from_numpy(np.stack([_reference_planes(b, c) for b, c in positions]))
+    out = torch.empty((8, 3, 8, 8))
+    batch = ai.boards_to_tensor([b for b, _ in positions], [c for _, c in positions], out=out)
+    assert torch.equal(batch.cpu(), expected)
+    assert torch.equal(ai.board_to_tensor(*positions[0]).cpu(), expected[:1])
+
+
+def test_inference_only_model_plays_like_training_model():
+    torch = pytest.importorskip('torch')
+    import os
+    import tempfile
+
+    from modern_ai import ModernOthelloAI
+
+    path = os.path.join(tempfile.mkdtemp(), 'model.pth')
+    trainer = ModernOthelloAI()
+    trainer.policy_net.eval()
+    trainer.save_model(path)
+
+    player = ModernOthelloAI.for_inference(path)
+    assert player.target_net is None and player.optimizer is None and player.memory is None
+    assert not player.policy_net.training
+    for board, color in _random_positions(5, seed=2):
+        moves = board.get_valid_moves(color)
+        if moves:
+            assert player.choose_move(board, color, moves) == trainer.choose_move(board, color, moves)
+    with pytest.raises(RuntimeError):
+        player.train_step()
+
+    # The weights are a private copy: rewriting the checkpoint in place leaves the model alone
+    states = torch.from_numpy(np.stack([_reference_planes(b, c) for b, c in _random_positions(4, seed=8)]))
+    with torch.inference_mode():
+        before = player.policy_net(states)
+        with open(path, 'wb') as f:
+            torch.save(ModernOthelloAI().checkpoint(), f)
+        assert torch.equal(player.policy_net(states), before)
+        open(path, 'wb').close()
+        assert torch.equal(player.policy_net(states), before)
+
+        # save_model replaces the file rather than rewriting it, so even a mapped reader is safe
+        trainer.save_model(path)
+        mapped = ModernOthelloAI.for_inference(path, mmap=True)
+        before = mapped.policy_net(states)
+        ModernOthelloAI().save_model(path)
+        assert torch.equal(mapped.policy_net(states), before)
+        assert os.listdir(os.path.dirname(path)) == ['model.pth']
+
+
+def test_cpu_optimised_model_matches_fp32():
+    torch = pytest.importorskip('torch')
+    from modern_ai import ModernOthelloAI, build_cpu_inference_net
+
+    ai = ModernOthelloAI(inference_only=True)
+    states = torch.from_numpy(np.stack([_reference_planes(b, c) for b, c in _random_positions(16, seed=3)]))
+    with torch.inference_mode():
+        expected = ai.policy_net.cpu()(states)
+        fused = build_cpu_inference_net(ai.policy_net, quantize=False, trace=True)(states)
+        quantized = build_cpu_inference_net(ai.policy_net, quantize=True, trace=True)(states)
+    assert torch.allclose(fused, expected, atol=1e-5)
+    assert torch.allclose(quantized, expected, atol=1e-2)
+
+    ai.optimize_for_cpu(num_threads=1)
+    assert ai.play_net is not ai.policy_net
+    board = Board()
+    assert ai.choose_move(board, 'B', board.get_valid_moves('B')) in board.get_valid_moves('B')
+
+
+def test_replay_buffer_ring_and_decoding():
+    pytest.importorskip('torch')
+    from modern_ai import ModernOthelloAI, ReplayBuffer
+
+    memory = ReplayBuffer(capacity=4, seed=0)
+    positions = _random_positions(6, seed=4)
+    packed = [from_board(b, c) for b, c in positions]
+    for i, state in enumerate(packed[:5]):
+        memory.push(state, i, float(i), packed[i + 1], i % 2)
+    assert len(memory) == 4 and memory.pos == 1
+    assert list(memory.actions) == [4, 1, 2, 3]
+    memory.push_many(np.array(packed[:2], dtype=np.uint64), [10, 11], [0.5, 0.5],
+                     np.array(packed[1:3], dtype=np.uint64), [0, 1])
+    assert list(memory.actions) == [4, 10, 11, 3] and memory.pos == 3
+
+    states, actions, rewards, next_states, dones = memory.sample(32)
+    assert states.shape == (32, 2) and set(actions) <= {3, 4, 10, 11}
+    ai = ModernOthelloAI()
+    planes = ai.bitboards_to_tensor(states[:, 0], states[:, 1]).cpu()
+    for row, action in zip(planes, actions):
+        board, color = positions[{4: 4, 10: 0, 11: 1, 3: 3}[action]]
+        assert np.array_equal(row.numpy(), _reference_planes(board, color))
+
+    ai.memory = memory
+    ai.batch_size = 4
+    assert ai.train_step() > 0
+
+
+def test_prioritized_replay_samples_by_priority():
+    pytest.importorskip('torch')
+    from modern_ai import ModernOthelloAI, PrioritizedReplayBuffer, SumTree
+
+    tree = SumTree(5)
+    tree.update(np.arange(5), [1.0, 2.0, 3.0, 4.0, 0.0])
+    assert tree.total == 10.0
+    assert list(tree.find([0.0, 0.99, 1.0, 2.99, 3.0, 5.99, 6.0, 9.99])) == [0, 0, 1, 1, 2, 2, 3, 3]
+    tree.update([1, 1], [5.0, 7.0])
+    assert tree.total == 15.0 and tree[1] == 7.0
+
+    memory = PrioritizedReplayBuffer(capacity=8, alpha=1.0, beta=1.0, eps=0.0, seed=0)
+    packed = [from_board(b, c) for b, c in _random_positions(9, seed=5)]
+    for i in range(8):
+        memory.push(packed[i], i, 0.0, packed[i + 1], 1)
+    memory.update_priorities(np.arange(8), np.array([1, 1, 1, 1, 1, 1, 1, 9.0]))
+    idx = np.concatenate([memory.sample_indices(64) for _ in range(50)])
+    assert abs(np.mean(idx == 7) - 9 / 16) < 0.03
+    idx, weights = memory.sample_prioritized(16)
+    assert np.allclose(weights[idx == 7], 1 / 9) and np.allclose(weights[idx != 7], 1.0)
+
+    ai = ModernOthelloAI(prioritized_replay=True)
+    ai.memory = memory
+    ai.batch_size = 8
+    ai.train_step()
+    assert memory.max_priority >= 9.0 and memory.samples == 2
+
+
+def test_actor_learner_trains_from_worker_games():
+    torch = pytest.importorskip('torch')
+    from actor_learner import ActorLearnerTrainer
+    from modern_ai import ModernOthelloAI
+
+    ai = ModernOthelloAI()
+    ai.batch_size = 16
+    trainer = ActorLearnerTrainer(ai, num_workers=1, publish_every=2)
+    saves = []
+    stats = trainer.train(steps=4, seconds=120, report_interval=0, on_save=saves.append)  # no save_interval
+    assert stats['steps'] == 4 and stats['games'] >= 1 and saves == []
+    assert len(ai.memory) == stats['transitions'] > 0
+    assert stats['weight_versions'] == 2 and 0 < stats['utilisation'] <= 1
+    published = trainer.shared_weights['fc3.weight']
+    assert torch.equal(published, ai.policy_net.state_dict()['fc3.weight'].cpu())
+
+
+def test_batched_selfplay_records_legal_games():
+    pytest.importorskip('torch')
+    from batched_selfplay import BatchedSelfPlayTrainer
+    from game import Game
+    from modern_ai import ModernOthelloAI, ReplayBuffer
+
+    ai = ModernOthelloAI()
+    ai.epsilon = 0.5
+    ai.memory = ReplayBuffer(capacity=5000)
+    trainer = BatchedSelfPlayTrainer(ai, num_slots=4, seed=0)
+    results = trainer.play_games(6)
+    assert len(results) == trainer.num_episodes == 6
+    assert len(ai.memory) == trainer.positions
+
+    # Games are stored one after another in finishing order: replay them on a Board
+    states, actions, rewards, next_states, dones = ai.memory.get(np.arange(len(ai.memory)))
+    i = 0
+    for winner, counts in results:
+        board = Board()
+        game = Game(board)
+        start = i
+        while not game.check_game_over():
+            moves = board.get_valid_moves(game.current_player)
+            if not moves:
+                game.switch_player()
+                continue
+            mover = game.current_player
+            assert tuple(int(x) for x in states[i]) == from_board(board, mover)
+            assert divmod(int(actions[i]), 8) in moves
+            board.place_disc(*divmod(int(actions[i]), 8), mover)
+            game.switch_player()
+            # The next state is seen from whoever moves next (the mover again after a pass)
+            side = game.current_player if board.get_valid_moves(game.current_player) else mover
+            assert tuple(int(x) for x in next_states[i]) == from_board(board, side)
+            legal = sum(1 << (r * 8 + c) for r, c in board.get_valid_moves(side))
+            assert int(ai.memory.next_legal[i]) == legal
+            i += 1
+        assert game.winner() == (winner, counts)
+        # Every move carries the game's result; draws are not terminal
+        assert (dones[start:i] == (winner is not None)).all()
+        if winner is not None:
+            assert (rewards[i - 1] > 0) == (winner == mover)
+    assert i == len(ai.memory)
+
+
+def test_symmetry_augmentation_matches_bitboard_transforms():
+    torch = pytest.importorskip('torch')
+    from bitboard import transform
+    from modern_ai import augment_batch
+
+    packed = np.array([from_board(b, c) for b, c in _random_positions(32, seed=6)], dtype=np.uint64)
+    states = torch.from_numpy(encoding.encode_bitboards(packed[:, 0], packed[:, 1]))
+    next_states = states.flip(0)
+    actions = torch.arange(32) * 2
+    new_states, new_actions, new_next = augment_batch(states, actions, next_states,
+                                                      generator=torch.Generator().manual_seed(0))
+    symmetries = torch.randint(0, 8, (32,), generator=torch.Generator().manual_seed(0))
+    assert len(set(symmetries.tolist())) > 1
+    for i, t in enumerate(symmetries.tolist()):
+        me, opp = (np.array([transform(int(x), t)], dtype=np.uint64) for x in packed[i])
+        assert np.array_equal(new_states[i].numpy(), encoding.encode_bitboards(me, opp)[0])
+        me, opp = (np.array([transform(int(x), t)], dtype=np.uint64) for x in packed[31 - i])
+        assert np.array_equal(new_next[i].numpy(), encoding.encode_bitboards(me, opp)[0])
+        assert 1 << int(new_actions[i]) == transform(1 << int(actions[i]), t)
+
+
+def test_mcts_finds_winning_endgame_moves():
+    from ai import solve_endgame
+    from bitboard import popcount
+    from bitboard import random_position
+    from mcts import MCTSPlayer
+
+    def uniform(me, opp):
+        return np.zeros((len(me), 64), dtype=np.float32)
+
+    rng = random.Random(7)
+    checked = 0
+    while checked < 5:
+        board, color = random_position(rng, 55, 55)
+        moves = board.get_valid_moves(color)
+        if len(moves) < 2:
+            continue
+        best, _ = solve_endgame(board, color)
+        player = MCTSPlayer(uniform, playouts=3000, batch_size=8)
+        move = player.choose_move(board, color, moves)
+        after = board.clone()
+        after.place_disc(*move, color)
+        opponent = 'W' if color == 'B' else 'B'
+        if after.get_valid_moves(opponent):
+            score = -solve_endgame(after, opponent)[0]
+        elif after.get_valid_moves(color):
+            score = solve_endgame(after, color)[0]
+        else:
+            me, opp = from_board(after, color)
+            score = popcount(me) - popcount(opp)
+        assert np.sign(score) == np.sign(best)
+        assert player.evals > 0 and sum(player.root.visits) == 3000 - 1  # the first playout expands the root
+        checked += 1
+
+
+def test_mcts_with_tiny_time_limit_still_moves():
+    import types
+
+    import mcts
+    from mcts import MCTSPlayer
+
+    def prefers_d3(me, opp):
+        q = np.zeros((len(me), 64), dtype=np.float32)
+        q[:, 19] = 1.0
+        return q
+
+    board = Board()
+    moves = board.get_valid_moves('B')
+    player = MCTSPlayer(prefers_d3, time_limit=0.001)
+    # A clock that jumps a second per read: the deadline has passed at the first check
+    clock = types.SimpleNamespace(now=0.0)
+    clock.perf_counter = lambda: setattr(clock, 'now', clock.now + 1.0) or clock.now
+    mcts.time = clock
+    try:
+        move = player.choose_move(board, 'B', moves)
+    finally:
+        mcts.time = time
+    # The root is still expanded, and its priors pick the move
+    assert move == (2, 3) and player.evals >= 1
+
+
+def test_training_checkpoint_round_trip():
+    torch = pytest.importorskip('torch')
+    import os
+    import tempfile
+
+    from modern_ai import ModernOthelloAI, SelfPlayTrainer
+    from game import Game
+    from training_checkpoint import (CheckpointWriter, capture_training_state, latest_checkpoint,
+                                     load_training_state, restore_training_state)
+
+    ai = ModernOthelloAI(prioritized_replay=True, batch_size=8, buffer_capacity=100)
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    trainer.play_game()
+    trainer.play_game()
+    ai.train_step()
+    state = capture_training_state(ai, trainer, {'lr': 0.001})
+    ai.train_step()  # the snapshot must not follow later updates
+
+    directory = tempfile.mkdtemp()
+    writer = CheckpointWriter(directory, keep=2)
+    for episode in (2, 4, 6):
+        writer.save(state, episode)
+    writer.close()
+    assert sorted(os.listdir(directory)) == ['checkpoint_ep000004.pt', 'checkpoint_ep000006.pt']
+    assert latest_checkpoint(directory).endswith('checkpoint_ep000006.pt')
+
+    # Periodic model saves go through the writer, never to disk on the training thread
+    model_dir = tempfile.mkdtemp()
+    model_writer = CheckpointWriter(model_dir, keep=1)
+    synchronous = []
+    ai.save_model = synchronous.append
+    trainer.train(num_episodes=4, save_interval=1, start_episode=2, checkpoint_dir=model_dir, writer=model_writer)
+    model_writer.close()
+    assert synchronous == [os.path.join(model_dir, 'othello_model_final.pth')]
+    assert sorted(os.listdir(model_dir)) == ['othello_model_ep3.pth', 'othello_model_ep4.pth']
+    del ai.save_model
+
+    loaded = load_training_state(latest_checkpoint(directory))
+    resumed = ModernOthelloAI(prioritized_replay=True, batch_size=8, buffer_capacity=50)
+    resumed_trainer = SelfPlayTrainer(resumed, Board, Game)
+    restore_training_state(resumed, resumed_trainer, loaded)
+    assert resumed_trainer.num_episodes == 2 and resumed.training_step == 1
+    for name, tensor in state['model']['policy_net_state_dict'].items():
+        assert torch.equal(resumed.policy_net.state_dict()[name].cpu(), tensor)
+    # A smaller buffer keeps the newest transitions, with their priorities
+    assert len(resumed.memory) == 50
+    assert np.array_equal(resumed.memory.actions[:50], state['replay_buffer']['actions'].numpy()[-50:])
+    assert np.allclose(resumed.memory.tree[np.arange(50)], state['replay_buffer']['priorities'].numpy()[-50:])
+    # RNG streams continue from the snapshot
+    first = random.random(), np.random.random(), torch.rand(1)
+    restore_training_state(resumed, resumed_trainer, loaded)
+    assert (random.random(), np.random.random()) == first[:2] and torch.equal(torch.rand(1), first[2])
+
+
+def test_training_metrics_stream():
+    pytest.importorskip('torch')
+    import json
+    import os
+    import tempfile
+
+    from game import Game
+    from modern_ai import ModernOthelloAI, SelfPlayTrainer
+    from training_metrics import PHASES, MetricsLogger, PhaseTimer, ProfilerCapture
+
+    directory = tempfile.mkdtemp()
+    ai = ModernOthelloAI(batch_size=8)
+    ai.timer = PhaseTimer()
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    metrics = MetricsLogger(os.path.join(directory, 'metrics.jsonl'), ai.timer)
+    profiler = ProfilerCapture(2, os.path.join(directory, 'trace.json'))
+    trainer.train(num_episodes=2, save_interval=2, checkpoint_dir=directory, metrics=metrics,
+                  metrics_interval=1, profiler=profiler)
+    metrics.close()
+
+    with open(os.path.join(directory, 'metrics.jsonl')) as f:
+        records = [json.loads(line) for line in f]
+    assert [r['episode'] for r in records] == [1, 2]
+    assert records[-1]['steps'] == 20 and records[-1]['samples_per_sec'] > 0 and records[-1]['rss_mb'] > 0
+    for name in ('movegen', 'encode', 'sample', 'train_forward', 'backward'):
+        assert sum(r[f'{name}_s'] for r in records) > 0
+    assert set(f'{name}_s' for name in PHASES) <= set(records[0])
+    assert ai.timer.totals['checkpoint'] > 0  # model saves after the last record
+    assert profiler.done and os.path.exists(os.path.join(directory, 'trace.json'))
+
+
+def test_selfplay_dataset_shards_round_trip():
+    pytest.importorskip('torch')
+    import tempfile
+
+    from batched_selfplay import BatchedSelfPlayTrainer
+    from bitboard import legal_moves
+    from game import Game
+    from modern_ai import ModernOthelloAI, ReplayBuffer, SelfPlayTrainer
+    from selfplay_dataset import ShardDataset, ShardWriter
+
+    directory = tempfile.mkdtemp()
+    ai = ModernOthelloAI(inference_only=True)
+    ai.memory = ReplayBuffer(capacity=1000)
+    batched = BatchedSelfPlayTrainer(ai, num_slots=4, seed=0)
+    with ShardWriter(directory, shard_records=50, buffer_records=32) as writer:
+        batched.dataset = writer
+        results = batched.play_games(4)
+    # A second run appends new shards and continues the game ids
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    with ShardWriter(directory, shard_records=50) as writer:
+        assert writer.next_game == 4
+        trainer.dataset = writer
+        winner, counts = trainer.play_game(training=False)
+
+    dataset = ShardDataset(directory)
+    records = np.concatenate(dataset.shards)
+    assert len(dataset) == len(ai.memory) and len(dataset.shards) > 2
+    assert all(len(shard) <= 50 for shard in dataset.shards)
+    assert sorted(set(records['game'])) == list(range(5))
+    last = records[records['game'] == 4]
+    assert list(last['ply']) == list(range(len(last)))
+    assert last['margin'][0] == counts['B'] - counts['W']  # black moves first
+    assert all(np.sign(r['margin']) == r['outcome'] for r in records)
+    assert sum(1 for g in range(4) if records['margin'][records['game'] == g][0] != 0) == \
+        sum(1 for w, _ in results if w is not None)
+    bits = np.left_shift(np.uint64(1), records['move'].astype(np.uint64))
+    assert (legal_moves(records['me'], records['opp']) & bits == bits).all()
+
+    seen = []
+    for batch in dataset.batches(batch_size=32, seed=1, prefetch=2):
+        assert batch.planes.shape[1:] == (3, 8, 8) and len(batch.moves) <= 32
+        mine = batch.planes[:, 0].reshape(-1, 64).numpy().astype(bool)
+        seen.extend(zip(np.packbits(mine, axis=1, bitorder='little').view('<u8').ravel(),
+                        batch.moves.tolist()))
+    assert sorted(seen) == sorted(zip(records['me'], records['move'].tolist()))
+    batch_sizes = [len(b.moves) for b in dataset.batches(batch_size=32, drop_last=True, shuffle=False)]
+    assert batch_sizes == [32] * (len(dataset) // 32)
+    # Abandoning a pass stops the prefetch thread
+    next(iter(dataset.batches(batch_size=8)))
+
+
+def test_arena_match_and_promotion():
+    pytest.importorskip('torch')
+    import os
+    import tempfile
+
+    from arena import promote, run_match, score_interval
+    from modern_ai import ModernOthelloAI
+
+    assert score_interval(10, 0, 0) == (1.0, 1.0, 1.0)
+    score, low, high = score_interval(4, 2, 4)
+    assert score == 0.5 and low < 0.5 < high and abs((0.5 - low) - (high - 0.5)) < 1e-12
+
+    directory = tempfile.mkdtemp()
+    candidate = os.path.join(directory, 'candidate.pth')
+    incumbent = os.path.join(directory, 'othello_model_final.pth')
+    ModernOthelloAI().save_model(candidate)
+    ModernOthelloAI().save_model(incumbent)
+    first = run_match(candidate, 'easy', games=3, workers=0, opening_plies=2, seed=5, verbose=False)
+    again = run_match(candidate, 'easy', games=4, workers=0, opening_plies=2, seed=5, verbose=False)
+    assert first['games'] == 4 and first['wins'] + first['draws'] + first['losses'] == 4
+    assert (first['wins'], first['draws'], first['mean_disc_margin']) == \
+        (again['wins'], again['draws'], again['mean_disc_margin'])
+    assert first['games_per_sec'] > 0 and first['score_low'] <= first['score'] <= first['score_high']
+
+    with open(incumbent, 'rb') as f:
+        old = f.read()
+    promote(candidate, incumbent)
+    with open(candidate, 'rb') as f, open(incumbent, 'rb') as g, open(incumbent + '.prev', 'rb') as h:
+        assert f.read() == g.read() and h.read() == old
+    assert sorted(os.listdir(directory)) == ['candidate.pth', 'othello_model_final.pth',
+                                             'othello_model_final.pth.prev']
+    # Beating anything but the incumbent never promotes
+    import subprocess
+    import sys
+    result = subprocess.run([sys.executable, 'arena.py', candidate, 'easy', '--promote', '--promote-to', incumbent],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 2 and 'incumbent' in result.stderr
+
+
+def test_distilled_small_model_loads_by_format():
+    pytest.importorskip('torch')
+    import os
+    import tempfile
+
+    import torch
+    from distill import compare_models, distill, selfplay_positions
+    from modern_ai import ModernOthelloAI, SmallOthelloNetwork
+    from selfplay_dataset import ShardDataset
+
+    directory = tempfile.mkdtemp()
+    torch.manual_seed(0)
+    teacher = ModernOthelloAI(inference_only=True)
+    selfplay_positions(teacher, 8, seed=0, directory=os.path.join(directory, 'data'))
+    student = ModernOthelloAI(model_format='small', model_options={'channels': 8})
+    losses = distill(teacher, student, ShardDataset(os.path.join(directory, 'data')), epochs=3,
+                     batch_size=64, report_every=0)
+    assert losses[-1] < losses[0]
+
+    path = os.path.join(directory, 'small.pth')
+    student.save_model(path)
+    for loaded in (ModernOthelloAI(model_path=path), ModernOthelloAI.for_inference(path)):
+        assert isinstance(loaded.policy_net, SmallOthelloNetwork) and loaded.model_format == 'small'
+        assert loaded.policy_net.conv1.out_channels == 8
+        for name, tensor in student.policy_net.state_dict().items():
+            assert torch.equal(loaded.policy_net.state_dict()[name], tensor)
+    if loaded.device.type == 'cpu':
+        loaded.optimize_for_cpu()
+    board = Board()
+    assert loaded.choose_move(board, 'B', board.get_valid_moves('B')) in board.get_valid_moves('B')
+
+    me, opp = selfplay_positions(teacher, 4, seed=1)
+    report = compare_models(teacher, student, me, opp, runs=5)
+    assert report['student']['parameters'] * 100 < report['teacher']['parameters']
+    assert report['student']['bytes'] < report['teacher']['bytes'] and 0.0 <= report['agreement'] <= 1.0
+
+
+def test_q_value_cache_shares_symmetric_positions():
+    pytest.importorskip('torch')
+    import torch
+    from bitboard import canonical, from_board, transform_square
+    from modern_ai import ModernOthelloAI, QValueCache
+
+    ai = ModernOthelloAI(q_cache_size=4, batch_size=8)
+    ai.policy_net.eval()
+    boards = [board for board, _ in _random_positions(12, seed=7)]
+    board = boards[0]
+    me, opp = from_board(board, 'B')
+    cm, co, t = canonical(me, opp)
+    with torch.inference_mode():
+        expected = ai.policy_net(ai.bitboards_to_tensor(np.array([cm], dtype=np.uint64),
+                                                        np.array([co], dtype=np.uint64)))[0].numpy()
+    q_values = ai.cached_q_values(board, 'B')
+    assert all(q_values[sq] == expected[transform_square(sq, t)] for sq in range(64))
+    assert (ai.q_cache.hits, ai.q_cache.misses) == (0, 1)
+
+    # A mirrored copy of the board is a cache hit with the values mirrored too
+    mirrored = Board()
+    mirrored.grid = [list(reversed(row)) for row in board.grid]
+    mirror_q = ai.cached_q_values(mirrored, 'B')
+    assert all(mirror_q[r * 8 + 7 - c] == q_values[r * 8 + c] for r in range(8) for c in range(8))
+    assert ai.q_cache.hits == 1
+    move = ai.choose_move(mirrored, 'B', mirrored.get_valid_moves('B'))
+    assert move in mirrored.get_valid_moves('B') and ai.q_cache.hits == 2
+
+    # Bounded LRU: the least recently used entries are evicted
+    for other in boards[1:]:
+        ai.cached_q_values(other, 'W')
+    assert len(ai.q_cache) == 4 and ai.q_cache.get((cm, co)) is None
+
+    # Weight changes invalidate
+    for other in boards:
+        ai.store_experience(from_board(other, 'B'), 0, 0.0, from_board(other, 'W'), 0.0)
+    ai.train_step()
+    assert len(ai.q_cache) == 0 and ai.q_cache.invalidations == 1
+    cache = QValueCache(capacity=2)
+    assert cache.hit_rate == 0.0 and cache.stats()['capacity'] == 2
+
+
+def test_numpy_backend_matches_torch_without_importing_it():
+    pytest.importorskip('torch')
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    import torch
+    from model_loader import BackgroundModelLoader
+    from modern_ai import ModernOthelloAI
+    from numpy_inference import NumpyOthelloAI, export_npz
+
+    directory = tempfile.mkdtemp()
+    positions = _random_positions(32, seed=11)
+    planes = np.stack([encoding.board_planes(board, color) for board, color in positions])
+    for model_format in ('dqn', 'small'):
+        torch.manual_seed(0)
+        ai = ModernOthelloAI(model_format=model_format)
+        for name, buffer in ai.policy_net.named_buffers():
+            if name.endswith('running_mean'):
+                buffer.normal_(0, 0.5)
+            elif name.endswith('running_var'):
+                buffer.uniform_(0.5, 2.0)
+        ai.policy_net.eval()
+        path = os.path.join(directory, f'{model_format}.pth')
+        ai.save_model(path)
+        player = NumpyOthelloAI(export_npz(path))
+        assert player.model_format == model_format
+        with torch.inference_mode():
+            expected = ai.policy_net(torch.from_numpy(planes)).numpy()
+        assert np.allclose(player.net(planes), expected, atol=1e-4)
+        for board, color in positions:
+            moves = board.get_valid_moves(color)
+            assert player.choose_move(board, color, moves) == ai.choose_move(board, color, moves)
+
+    # The game client falls back to the .npz model, and the backend never imports torch
+    loader = BackgroundModelLoader(model_paths=(), numpy_paths=(os.path.join(directory, 'small.npz'),))
+    loader.start()
+    assert loader.wait(30) and loader.backend == 'numpy'
+    # A one-file PyInstaller build finds the model where its bundle was extracted
+    from model_loader import find_model
+    assert find_model(('small.npz',)) is None
+    sys.frozen, sys._MEIPASS = True, directory
+    try:
+        assert find_model(('missing.npz', 'small.npz')) == os.path.join(directory, 'small.npz')
+    finally:
+        del sys.frozen, sys._MEIPASS
+    script = ("import sys; sys.modules['torch'] = None\n"
+              "from board import Board\n"
+              "from numpy_inference import NumpyOthelloAI\n"
+              f"ai = NumpyOthelloAI({os.path.join(directory, 'dqn.npz')!r})\n"
+              "board = Board()\n"
+              "print(ai.choose_move(board, 'B', board.get_valid_moves('B')))\n")
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+
+
+def test_background_loader_reports_readiness():
+    pytest.importorskip('torch')
+    import os
+    import tempfile
+
+    from model_loader import BackgroundModelLoader
+    from modern_ai import ModernOthelloAI
+
+    missing = BackgroundModelLoader(model_paths=('does_not_exist.pth',))
+    missing.start()
+    assert not missing.wait(10) and missing.status == 'unavailable'
+
+    path = os.path.join(tempfile.mkdtemp(), 'model.pth')
+    ModernOthelloAI().save_model(path)
+    loader = BackgroundModelLoader(model_paths=(path,))
+    assert loader.status == 'idle' and not loader.ready
+    loader.start()
+    assert loader.wait(60)
+    assert loader.model.inference_only
+
+
+def test_model_watcher_hot_swaps_between_moves():
+    pytest.importorskip('torch')
+    import os
+    import tempfile
+
+    import torch
+    from model_watcher import ModelWatcher, write_manifest
+    from modern_ai import ModernOthelloAI
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'model.pth')
+    torch.manual_seed(0)
+    ModernOthelloAI().save_model(path)
+    ai = ModernOthelloAI.for_inference(path, mmap=False, q_cache_size=64)
+    board = Board()
+    ai.choose_move(board, 'B', board.get_valid_moves('B'))
+    old_net, invalidations = ai.play_net, ai.q_cache.invalidations
+
+    # mtime mode: a changed file is only loaded once it is stable for two polls
+    watcher = ModelWatcher(ai, path, interval=0.05, canary=encoding.encode_boards(
+        [b for b, _ in _random_positions(8, seed=3)], 'B'))
+    assert watcher.check() is None
+    torch.manual_seed(1)
+    ModernOthelloAI(model_format='small', model_options={'channels': 8}).save_model(path)
+    assert watcher.check() is None and ai.play_net is old_net
+    info = watcher.check()
+    assert info is not None and ai.play_net is not old_net and ai.model_format == 'small'
+    assert len(ai.q_cache) == 0 and ai.q_cache.invalidations == invalidations + 1
+    assert info['swap_us'] >= 0 and info['old_mb'] > info['peak_extra_mb'] > 0
+    assert ai.choose_move(board, 'B', board.get_valid_moves('B')) in board.get_valid_moves('B')
+
+    # manifest mode: a model that does not match the manifest hash is rejected
+    manifest = os.path.join(directory, 'current.json')
+    candidate = os.path.join(directory, 'candidate.pth')
+    torch.manual_seed(2)
+    ModernOthelloAI().save_model(candidate)
+    write_manifest(candidate, manifest)
+    watcher = ModelWatcher(ai, manifest, canary=watcher.canary)
+    torch.manual_seed(3)
+    ModernOthelloAI().save_model(os.path.join(directory, 'next.pth'))
+    write_manifest(os.path.join(directory, 'next.pth'), manifest)
+    swapped = ai.play_net
+    assert watcher.check() is not None and ai.play_net is not swapped and ai.model_format == 'dqn'
+    write_manifest(candidate, manifest)
+    torch.manual_seed(4)
+    ModernOthelloAI().save_model(candidate)   # overwritten after the manifest was written
+    current = ai.play_net
+    assert watcher.check() is None and ai.play_net is current and 'sha256' in watcher.rejected[-1][1]
+
+    # The canary check can demand agreement with the current model
+    watcher = ModelWatcher(ai, manifest, canary=watcher.canary, min_agreement=1.01)
+    write_manifest(candidate, manifest)
+    assert watcher.check() is None and ai.play_net is current and 'agreement' in watcher.rejected[-1][1]
+
+    # The background thread picks up a new manifest by itself
+    watcher = ModelWatcher(ai, manifest, interval=0.02, canary=watcher.canary).start()
+    write_manifest(os.path.join(directory, 'model.pth'), manifest)
+    try:
+        for _ in range(250):
+            if watcher.swaps:
+                break
+            time.sleep(0.02)
+    finally:
+        watcher.stop()
+    assert watcher.swaps and ai.model_format == 'small'
+    with pytest.raises(ValueError):
+        ModelWatcher(ModernOthelloAI(), path)
+
+
+def test_inference_server_batches_concurrent_clients():
+    pytest.importorskip('torch')
+    import os
+    import tempfile
+    import threading
+
+    import torch
+    from arena import make_agent
+    from inference_server import InferenceClient, InferenceServer
+    from modern_ai import ModernOthelloAI
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'model.pth')
+    torch.manual_seed(0)
+    ModernOthelloAI().save_model(path)
+    socket_path = os.path.join(directory, 'ai.sock')
+    server = InferenceServer(path, socket_path, max_batch=8, max_wait_ms=50, optimize_cpu=False)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        for _ in range(500):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.01)
+        positions = _random_positions(40, seed=5)
+        packed = [from_board(board, color) for board, color in positions]
+        with torch.inference_mode():
+            expected = server.ai.policy_net(server.ai.bitboards_to_tensor(
+                np.array([p[0] for p in packed], dtype=np.uint64),
+                np.array([p[1] for p in packed], dtype=np.uint64))).numpy()
+        errors = []
+
+        def play(k):
+            try:
+                with InferenceClient(socket_path) as client:
+                    for i in range(k, len(positions), 4):
+                        board, color = positions[i]
+                        assert np.allclose(client.q_values(*packed[i]), expected[i], atol=1e-5)
+                        moves = board.get_valid_moves(color)
+                        move = client.choose_move(board, color, moves)
+                        if moves:
+                            best = max(moves, key=lambda m: expected[i][m[0] * 8 + m[1]])
+                            assert move == best
+                        else:
+                            assert move is None and client.best_move(*packed[i]) == -1
+            except Exception as e:   # surfaced in the main thread
+                errors.append(e)
+
+        clients = [threading.Thread(target=play, args=(k,)) for k in range(4)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        assert not errors, errors
+
+        # An unknown request kind closes only that connection; an idle connection never holds a batch back
+        import socket
+        from inference_server import REQUEST
+        bad = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        bad.settimeout(5)
+        bad.connect(socket_path)
+        bad.sendall(REQUEST.pack(*packed[0], 7))
+        assert bad.recv(1) == b''
+        bad.close()
+        with InferenceClient(socket_path) as idle, InferenceClient(socket_path) as client:
+            for _ in range(5):
+                start = time.perf_counter()
+                client.q_values(*packed[0])
+                assert time.perf_counter() - start < 0.04
+            assert idle.best_move(*packed[0]) >= 0
+
+        with InferenceClient(socket_path) as client:
+            stats = client.stats()
+            board = Board()
+            moves = board.get_valid_moves('B')
+            assert make_agent(f'unix:{socket_path}')(board, 'B', moves) in moves
+        assert stats['requests'] >= 40 and stats['mean_batch'] > 1
+        assert max(map(int, stats['batch_histogram'])) <= 8 and sum(stats['batch_histogram'].values()) == stats['batches']
+        assert 0 < stats['latency_ms']['p50'] <= stats['latency_ms']['p99'] <= stats['latency_ms']['max']
+    finally:
+        server.stop()
+        thread.join()
+    assert not os.path.exists(socket_path)
+
+
+def test_dqn_targets_use_legal_moves_of_the_side_to_move():
+    torch = pytest.importorskip('torch')
+    from bitboard import legal_moves
+    from game import Game
+    from modern_ai import ModernOthelloAI, SelfPlayTrainer, dqn_targets
+
+    next_q = torch.zeros(4, 64)
+    next_q[:, :3] = torch.tensor([9.0, 0.5, 0.2])
+    legal = torch.zeros(4, 64, dtype=torch.bool)
+    legal[:2, 1:3] = True
+    legal[3, 1:3] = True
+    rewards = torch.tensor([0.0, 0.0, 0.0, 0.7])
+    dones = torch.tensor([0.0, 0.0, 0.0, 1.0])
+    signs = torch.tensor([-1.0, 1.0, -1.0, -1.0])
+    # Square 0 is illegal however large its Q-value; the opponent's best is the mover's loss;
+    # a position without moves is worth 0 and a terminal transition only its reward
+    targets = dqn_targets(next_q, legal, rewards, dones, signs, 0.9)
+    assert torch.allclose(targets, torch.tensor([-0.45, 0.45, 0.0, 0.7]))
+    online = torch.zeros(4, 64)
+    online[:, 2] = 1.0
+    online[:, 0] = 5.0
+    double = dqn_targets(next_q, legal, rewards, dones, signs, 0.9, online_next_q_values=online)
+    assert torch.allclose(double, torch.tensor([-0.18, 0.18, 0.0, 0.7]))
+
+    ai = ModernOthelloAI(batch_size=16, double_dqn=True)
+    trainer = SelfPlayTrainer(ai, Board, Game)
+    for _ in range(2):
+        trainer.play_game()
+    states, actions, rewards, next_states, dones = ai.memory.get(np.arange(len(ai.memory)))
+    for state, next_state, next_legal in zip(states, next_states, ai.memory.next_legal[:len(ai.memory)]):
+        assert int(next_legal) == legal_moves(int(next_state[0]), int(next_state[1]))
+        # The opponent moves next unless it has to pass
+        if (int(next_state[0]) & int(state[0])) == int(state[0]):
+            assert legal_moves(int(next_state[1]), int(next_state[0])) == 0
+    # The gradient pass sees only current states; the next move is picked in a separate eval-mode pass
+    calls = []
+    ai.policy_net.register_forward_hook(lambda net, inputs, output: calls.append((net.training, len(inputs[0]))))
+    assert np.isfinite(ai.train_step())
+    assert calls == [(True, ai.batch_size), (False, ai.batch_size)] and ai.policy_net.training
+
+
+if __name__ == "__main__":
+    test_encoders_match_reference()
+    test_model_tensors_match_reference()
+    test_inference_only_model_plays_like_training_model()
+    test_cpu_optimised_model_matches_fp32()
+    test_replay_buffer_ring_and_decoding()
+    test_prioritized_replay_samples_by_priority()
+    test_actor_learner_trains_from_worker_games()
+    test_batched_selfplay_records_legal_games()
+    test_dqn_targets_use_legal_moves_of_the_side_to_move()
+    test_symmetry_augmentation_matches_bitboard_transforms()
+    test_mcts_finds_winning_endgame_moves()
+    test_mcts_with_tiny_time_limit_still_moves()
+    test_training_checkpoint_round_trip()
+    test_training_metrics_stream()
+    test_selfplay_dataset_shards_round_trip()
+    test_arena_match_and_promotion()
+    test_distilled_small_model_loads_by_format()
+    test_q_value_cache_shares_symmetric_positions()
+    test_numpy_backend_matches_torch_without_importing_it()
+    test_background_loader_reports_readiness()
+    test_model_watcher_hot_swaps_between_moves()
+    test_inference_server_batches_concurrent_clients()
+    print("✅ All modern AI tests passed")
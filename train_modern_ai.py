@@ -3,9 +3,13 @@ Training script for Modern AI
 Run this to train the neural network through self-play
 """
 
+import argparse
+import random
 import sys
 import os
 
+import numpy as np
+
 # Check if PyTorch is installed
 try:
     import torch
@@ -21,28 +25,112 @@ except ImportError:
 from board import Board
 from game import Game
 from modern_ai import ModernOthelloAI, SelfPlayTrainer
+from actor_learner import ActorLearnerTrainer
+from training_checkpoint import (CheckpointWriter, capture_training_state, latest_checkpoint,
+                                 load_training_state, restore_training_state)
+from training_metrics import MetricsLogger, PhaseTimer, ProfilerCapture
+from selfplay_dataset import ShardWriter
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the Modern AI through self-play")
+    parser.add_argument('--episodes', type=int, default=1000,
+                        help="total self-play games for the run (a resumed run continues towards it)")
+    parser.add_argument('--save-interval', type=int, default=100,
+                        help="save the model and a full training checkpoint every N episodes")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="self-play actor processes feeding a continuous learner (0 = play and train in turn)")
+    parser.add_argument('--seconds', type=float, default=3600,
+                        help="training time in actor/learner mode")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--buffer-size', type=int, default=10000, help="replay buffer capacity (transitions)")
+    parser.add_argument('--lr', type=float, default=0.001, help="Adam learning rate")
+    parser.add_argument('--prioritized', action='store_true', help="use prioritized experience replay")
+    parser.add_argument('--checkpoint-dir', default='.',
+                        help="directory for model files and full training checkpoints")
+    parser.add_argument('--keep-checkpoints', type=int, default=3)
+    parser.add_argument('--resume', metavar='PATH',
+                        help="full training checkpoint to resume from ('latest' = newest in --checkpoint-dir)")
+    parser.add_argument('--seed', type=int, help="seed Python, NumPy and PyTorch RNGs for a fresh run")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="append throughput/phase-timing records to PATH (.jsonl or .csv)")
+    parser.add_argument('--metrics-interval', type=int, default=10, help="episodes per metrics record")
+    parser.add_argument('--profile-steps', type=int, default=0,
+                        help="capture a torch.profiler trace of N training steps into the checkpoint directory")
+    parser.add_argument('--dataset', metavar='DIR',
+                        help="also append every self-play position to the sharded dataset in DIR")
+    args = parser.parse_args()
+    if args.dataset and args.workers:
+        parser.error("--dataset records games played in this process; it can't be combined with --workers")
+    if (args.metrics or args.profile_steps) and args.workers:
+        parser.error("--metrics and --profile-steps time the single-process trainer; "
+                     "they can't be combined with --workers")
+    
     print("=" * 60)
     print("🧠 MODERN AI TRAINING FOR OTHELLO")
     print("=" * 60)
     
     # Configuration
-    num_episodes = 1000  # Number of self-play games (increased for better learning)
-    save_interval = 100   # Save model every N episodes
+    num_episodes = args.episodes
+    save_interval = args.save_interval
+    config = {k: v for k, v in vars(args).items() if k not in ('resume', 'metrics', 'profile_steps', 'dataset')}
     
     print(f"\n⚙️  Configuration:")
-    print(f"   Episodes: {num_episodes}")
+    if args.workers:
+        print(f"   Actors: {args.workers} for {args.seconds:.0f}s")
+    else:
+        print(f"   Episodes: {num_episodes}")
     print(f"   Save Interval: {save_interval}")
+    print(f"   Batch Size: {args.batch_size} | Buffer: {args.buffer_size} | LR: {args.lr}")
+    print(f"   Checkpoints: {os.path.abspath(args.checkpoint_dir)}")
     print(f"   Device: {'CUDA (GPU)' if torch.cuda.is_available() else 'CPU'}")
     
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        torch.manual_seed(args.seed)
+    
     # Initialize AI
     print("\n🎯 Initializing Modern AI...")
-    ai = ModernOthelloAI()
+    ai = ModernOthelloAI(prioritized_replay=args.prioritized, learning_rate=args.lr,
+                         buffer_capacity=args.buffer_size, batch_size=args.batch_size)
+    if args.seed is not None:
+        ai.memory.rng = np.random.default_rng(args.seed)
     
     # Initialize trainer
     print("🏋️  Setting up Self-Play Trainer...")
-    trainer = SelfPlayTrainer(ai, Board, Game)
+    if args.workers:
+        trainer = ActorLearnerTrainer(ai, num_workers=args.workers)
+    else:
+        trainer = SelfPlayTrainer(ai, Board, Game)
+    
+    os.makedirs(args.checkpoint_dir, exist_ok=True)
+    writer = CheckpointWriter(args.checkpoint_dir, keep=args.keep_checkpoints)
+    
+    def save_checkpoint(episode):
+        # Snapshot now, write on the background thread
+        with ai.timer.phase('checkpoint'):
+            writer.save(capture_training_state(ai, trainer, config), episode)
+    
+    metrics = profiler = None
+    if args.metrics:
+        ai.timer = PhaseTimer()
+        metrics = MetricsLogger(args.metrics, ai.timer)
+        print(f"📈 Metrics every {args.metrics_interval} episodes -> {args.metrics}")
+    dataset = None
+    if args.dataset:
+        dataset = trainer.dataset = ShardWriter(args.dataset)
+        print(f"🗃️  Recording self-play positions to {args.dataset} (from game {dataset.next_game})")
+    if args.profile_steps:
+        profiler = ProfilerCapture(args.profile_steps, os.path.join(args.checkpoint_dir, 'profile_trace.json'))
+    
+    if args.resume:
+        path = latest_checkpoint(args.checkpoint_dir) if args.resume == 'latest' else args.resume
+        if path is None:
+            print(f"❌ No checkpoint found in {args.checkpoint_dir}")
+            sys.exit(1)
+        restore_training_state(ai, trainer, load_training_state(path, map_location=ai.device))
+        print(f"♻️  Resumed from {path}: {trainer.num_episodes} episodes, "
+              f"{len(ai.memory)} buffered transitions, ε={ai.epsilon:.4f}")
     
     # Start training
     print("\n" + "=" * 60)
@@ -52,11 +140,32 @@ def main():
     print("This may take several minutes to hours depending on your hardware.\n")
     
     try:
-        trainer.train(num_episodes=num_episodes, save_interval=save_interval)
+        if args.workers:
+            stats = trainer.train(seconds=args.seconds, save_interval=save_interval, on_save=save_checkpoint)
+            ai.save_model(os.path.join(args.checkpoint_dir, 'othello_model_final.pth'))
+            save_checkpoint(trainer.num_episodes)
+            print(f"📈 {stats['games_per_sec']:.2f} games/s | {stats['samples_per_sec']:.0f} samples/s | "
+                  f"learner busy {stats['utilisation']:.0%}")
+        else:
+            trainer.train(num_episodes=num_episodes, save_interval=save_interval,
+                          start_episode=trainer.num_episodes, checkpoint_dir=args.checkpoint_dir,
+                          on_save=save_checkpoint, metrics=metrics, metrics_interval=args.metrics_interval,
+                          profiler=profiler, writer=writer)
+            if trainer.num_episodes % save_interval:
+                save_checkpoint(trainer.num_episodes)
     except KeyboardInterrupt:
         print("\n\n⚠️  Training interrupted by user")
-        print("💾 Saving current model...")
-        ai.save_model('othello_model_interrupted.pth')
+        print("💾 Saving current model and training state...")
+        ai.save_model(os.path.join(args.checkpoint_dir, 'othello_model_interrupted.pth'))
+        save_checkpoint(trainer.num_episodes)
+        print(f"   Resume with: python train_modern_ai.py --resume latest --checkpoint-dir {args.checkpoint_dir}")
+    finally:
+        writer.close()
+        if metrics:
+            metrics.close()
+        if dataset:
+            dataset.close()
+            print(f"🗃️  {dataset.records:,} positions from this run written to {args.dataset}")
     
     print("\n" + "=" * 60)
     print("✅ TRAINING COMPLETE!")
@@ -64,6 +173,7 @@ def main():
     print("\n📁 Model files saved:")
     print("   - othello_model_final.pth (final model)")
     print("   - othello_model_ep*.pth (checkpoints)")
+    print("   - checkpoint_ep*.pt (full training state, for --resume)")
     
     print("\n🎮 To use the trained AI in game:")
     print("   1. Run: python main.py")
@@ -0,0 +1,162 @@
+"""
+Full-state training checkpoints for the neural AI
+
+A training checkpoint holds everything needed to resume a run where it
+stopped: networks and optimizer (ModernOthelloAI.checkpoint()), the replay
+buffer in its packed form, Python/NumPy/PyTorch RNG states and the
+trainer's episode and win counters.
+
+capture_training_state() snapshots the live objects (tensors are cloned),
+so CheckpointWriter can serialise it on a background thread while
+training carries on.  Files are written to a temporary name and renamed
+into place, so a crash mid-write never leaves a truncated checkpoint.
+"""
+
+import glob
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+import torch
+
+CHECKPOINT_PATTERN = 'checkpoint_ep{:06d}.pt'
+TRAINER_COUNTERS = ('num_episodes', 'total_wins_black', 'total_wins_white', 'total_draws')
+
+
+def _snapshot(obj):
+    """Deep copy of nested dicts/lists with every tensor cloned to the CPU."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_snapshot(v) for v in obj)
+    return obj
+
+
+def _rng_state():
+    np_state = np.random.get_state(legacy=False)
+    np_state['state']['key'] = np_state['state']['key'].tolist()
+    state = {'python': random.getstate(), 'numpy': np_state, 'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def _set_rng_state(state):
+    random.setstate(state['python'])
+    np_state = dict(state['numpy'])
+    np_state['state'] = dict(np_state['state'], key=np.array(np_state['state']['key'], dtype=np.uint32))
+    np.random.set_state(np_state)
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def capture_training_state(ai, trainer, config=None):
+    """Snapshot of a training run that stays valid while training continues."""
+    return {
+        'model': _snapshot(ai.checkpoint()),
+        'policy_training': ai.policy_net.training,
+        'replay_buffer': _snapshot(ai.memory.state_dict()),
+        'rng': _snapshot(_rng_state()),
+        'trainer': {name: getattr(trainer, name) for name in TRAINER_COUNTERS},
+        'config': dict(config or {}),
+    }
+
+
+def restore_training_state(ai, trainer, state):
+    """Load a capture_training_state() dict into a fresh AI and trainer."""
+    ai.load_checkpoint(state['model'])
+    ai.policy_net.train(state['policy_training'])
+    ai.memory.load_state_dict(state['replay_buffer'])
+    for name, value in state['trainer'].items():
+        setattr(trainer, name, value)
+    _set_rng_state(state['rng'])
+
+
+def load_training_state(path, map_location=None):
+    return torch.load(path, map_location=map_location)
+
+
+def atomic_save(obj, path):
+    """torch.save to a temporary file in the same directory, then rename over `path`."""
+    tmp = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp, 'wb') as f:
+            torch.save(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def latest_checkpoint(directory):
+    """Path of the newest checkpoint_ep*.pt in `directory`, or None."""
+    paths = sorted(glob.glob(os.path.join(directory, CHECKPOINT_PATTERN.replace('{:06d}', '*'))))
+    return paths[-1] if paths else None
+
+
+class CheckpointWriter:
+    """Write checkpoints on a daemon thread, keeping the newest `keep` files"""
+
+    def __init__(self, directory, keep=3):
+        self.directory = directory
+        self.keep = keep
+        self.error = None
+        self.written = []
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+
+    def save(self, state, episode):
+        """Queue a captured state for writing; returns the path it will be written to."""
+        path = os.path.join(self.directory, CHECKPOINT_PATTERN.format(episode))
+        self._queue.put((state, path, True))
+        return path
+
+    def save_model(self, ai, path):
+        """Snapshot `ai`'s model checkpoint (as save_model writes it) and queue it for `path`.
+
+        Model files are not counted towards `keep`.
+        """
+        self._queue.put((_snapshot(ai.checkpoint()), path, False))
+        return path
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                state, path, rotate = item
+                try:
+                    atomic_save(state, path)
+                except Exception as e:
+                    self.error = e
+                    print(f"❌ Checkpoint {path} failed: {e}")
+                    continue
+                print(f"💾 Checkpoint saved to {path}")
+                if not rotate:
+                    continue
+                self.written.append(path)
+                while len(self.written) > self.keep:
+                    old = self.written.pop(0)
+                    if os.path.exists(old):
+                        os.remove(old)
+            finally:
+                self._queue.task_done()
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk."""
+        self._queue.join()
+
+    def close(self):
+        self.wait()
+        self._queue.put(None)
+        self._thread.join()
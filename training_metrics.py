@@ -0,0 +1,151 @@
+"""
+Training throughput metrics for the neural AI
+
+PhaseTimer accumulates wall time per training phase (move generation,
+encoding, forward passes, replay sampling, backward pass, checkpoint I/O);
+ModernOthelloAI and SelfPlayTrainer report into `ai.timer`, which is a
+no-op NULL_TIMER unless a PhaseTimer is installed.  MetricsLogger writes one
+record per interval as JSON lines or CSV (chosen by file extension), and
+ProfilerCapture records a torch.profiler trace of N training steps.
+"""
+
+import contextlib
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+
+PHASES = ('movegen', 'encode', 'forward', 'sample', 'train_forward', 'backward', 'checkpoint')
+
+
+def rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _NullTimer:
+    _context = contextlib.nullcontext()
+
+    def phase(self, name):
+        return self._context
+
+
+NULL_TIMER = _NullTimer()
+
+
+class PhaseTimer:
+    """Accumulated seconds per named phase: `with timer.phase('backward'): ...`"""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] += time.perf_counter() - start
+
+    def snapshot(self):
+        return dict(self.totals)
+
+
+class MetricsLogger:
+    """Interval throughput records for a SelfPlayTrainer, appended to a .jsonl or .csv file"""
+
+    def __init__(self, path, timer):
+        self.path = path
+        self.timer = timer
+        self.format = 'csv' if path.endswith('.csv') else 'jsonl'
+        self._file = open(path, 'a', newline='')
+        self._csv = None
+        self._start = self._last_time = time.perf_counter()
+        self._last = {'games': 0, 'steps': 0, 'phases': {}}
+
+    def log(self, trainer, steps, losses=()):
+        """Write one record covering the time since the previous call; returns it."""
+        ai = trainer.ai
+        now = time.perf_counter()
+        interval = max(now - self._last_time, 1e-9)
+        phases = self.timer.snapshot()
+        games = trainer.num_episodes
+        record = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'elapsed_s': round(now - self._start, 3),
+            'episode': games,
+            'steps': steps,
+            'games_per_sec': (games - self._last['games']) / interval,
+            'samples_per_sec': (steps - self._last['steps']) * ai.batch_size / interval,
+            'steps_per_sec': (steps - self._last['steps']) / interval,
+            'loss': float(sum(losses) / len(losses)) if losses else None,
+            'epsilon': ai.epsilon,
+            'buffer': len(ai.memory),
+            'rss_mb': round(rss_mb(), 1),
+            'black_win_rate': trainer.total_wins_black / games if games else 0.0,
+            'white_win_rate': trainer.total_wins_white / games if games else 0.0,
+        }
+        timed = 0.0
+        for name in PHASES:
+            seconds = phases.get(name, 0.0) - self._last['phases'].get(name, 0.0)
+            record[f'{name}_s'] = round(seconds, 4)
+            timed += seconds
+        record['other_s'] = round(max(interval - timed, 0.0), 4)
+        self._last = {'games': games, 'steps': steps, 'phases': phases}
+        self._last_time = now
+        self._write(record)
+        return record
+
+    def _write(self, record):
+        if self.format == 'jsonl':
+            self._file.write(json.dumps(record) + '\n')
+        else:
+            if self._csv is None:
+                self._csv = csv.DictWriter(self._file, fieldnames=list(record))
+                if self._file.tell() == 0:
+                    self._csv.writeheader()
+            self._csv.writerow(record)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ProfilerCapture:
+    """torch.profiler trace of the first `steps` training steps after the first call to step()"""
+
+    def __init__(self, steps, trace_path, row_limit=15):
+        self.steps = steps
+        self.trace_path = trace_path
+        self.row_limit = row_limit
+        self._profiler = None
+        self._count = 0
+        self.done = steps <= 0
+
+    def step(self):
+        """Call after every train_step; starts the capture on the first call and ends it after `steps`."""
+        if self.done:
+            return
+        import torch.profiler as profiler
+
+        if self._profiler is None:
+            activities = [profiler.ProfilerActivity.CPU]
+            import torch
+            if torch.cuda.is_available():
+                activities.append(profiler.ProfilerActivity.CUDA)
+            self._profiler = profiler.profile(activities=activities, record_shapes=True)
+            self._profiler.__enter__()
+            return
+        self._count += 1
+        if self._count >= self.steps:
+            self._profiler.__exit__(None, None, None)
+            self._profiler.export_chrome_trace(self.trace_path)
+            print(self._profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=self.row_limit))
+            print(f"🔬 Profiler trace of {self.steps} training steps saved to {self.trace_path}")
+            self.done = True
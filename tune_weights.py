@@ -0,0 +1,202 @@
+"""
+Tune the classic AI evaluation weights from labelled positions.
+
+Positions are stored as .npz files with a `positions` array of (player,
+opponent) uint64 masks (side to move first) and a `results` array holding
+the final game result for the side to move (1 win, 0.5 draw, 0 loss).
+The weights of ai._eval_terms are fitted by logistic regression (Newton
+iterations with gradient and Hessian accumulated over fixed-size chunks)
+and written to eval_weights.json, which ai.py loads at import.
+
+Usage:
+    python tune_weights.py generate --games 2000 --output selfplay_positions.npz
+    python tune_weights.py fit selfplay_positions.npz [more.npz ...]
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+import ai
+from bitboard import from_board
+from board import Board
+
+# Weights are stored in centi-logits: an evaluation of 100 means the side to
+# move wins with probability sigmoid(1) ~ 73%.
+EVAL_SCALE = 100.0
+
+
+def generate_games(num_games, epsilon=0.2, difficulty='medium', seed=None):
+    """Self-play `num_games` classic-AI games; return (positions, results) arrays.
+
+    Each move is random with probability `epsilon` so the games cover a wide
+    range of positions; every position is labelled with the final result for
+    the side to move.
+    """
+    rng = random.Random(seed)
+    positions, results = [], []
+    for game in range(num_games):
+        board, color, history = Board(), 'B', []
+        while True:
+            moves = board.get_valid_moves(color)
+            if not moves:
+                color = 'W' if color == 'B' else 'B'
+                moves = board.get_valid_moves(color)
+                if not moves:
+                    break
+            history.append((from_board(board, color), color))
+            if rng.random() < epsilon:
+                move = rng.choice(moves)
+            else:
+                move = ai.choose_move(board, color, difficulty)
+            board.place_disc(move[0], move[1], color)
+            color = 'W' if color == 'B' else 'B'
+
+        black, white = from_board(board, 'B')
+        diff = bin(black).count('1') - bin(white).count('1')
+        for packed, side in history:
+            mine = diff if side == 'B' else -diff
+            positions.append(packed)
+            results.append(1.0 if mine > 0 else 0.0 if mine < 0 else 0.5)
+        if (game + 1) % 100 == 0:
+            print(f"   {game + 1}/{num_games} games, {len(positions)} positions")
+    return np.array(positions, dtype=np.uint64).reshape(-1, 2), np.array(results, dtype=np.float32)
+
+
+def load_datasets(paths):
+    """Concatenate the positions and results of several .npz files."""
+    positions, results = [], []
+    for path in paths:
+        with np.load(path) as data:
+            positions.append(data['positions'].astype(np.uint64).reshape(-1, 2))
+            results.append(data['results'].astype(np.float32))
+    return np.concatenate(positions), np.concatenate(results)
+
+
+def compute_features(positions, chunk_size=65536):
+    """(N, len(EVAL_TERMS)) float32 feature matrix, computed chunk by chunk."""
+    features = np.empty((len(positions), len(ai.EVAL_TERMS)), dtype=np.float32)
+    for i in range(0, len(positions), chunk_size):
+        chunk = positions[i:i + chunk_size]
+        features[i:i + chunk_size] = np.stack(ai._eval_terms(chunk[:, 0], chunk[:, 1]), axis=1)
+    return features
+
+
+def _log_loss(features, results, w, chunk_size):
+    """Mean cross-entropy and accuracy (decisive positions) of logits features @ w."""
+    total = correct = decisive = 0.0
+    for i in range(0, len(features), chunk_size):
+        x = features[i:i + chunk_size].astype(np.float64)
+        y = results[i:i + chunk_size].astype(np.float64)
+        z = x @ w
+        # log(1 + e^z) - y*z, computed stably
+        total += float(np.sum(np.logaddexp(0.0, z) - y * z))
+        mask = y != 0.5
+        correct += float(np.sum((z[mask] > 0) == (y[mask] > 0.5)))
+        decisive += float(mask.sum())
+    return total / len(features), correct / max(decisive, 1.0)
+
+
+def fit_logistic(features, results, epochs=10, chunk_size=262144, l2=1e-3, tol=1e-7):
+    """Fit logistic-regression weights (no intercept; the evaluation is antisymmetric).
+
+    Each epoch is one Newton step whose gradient and Hessian are accumulated
+    over chunks, so memory stays bounded by `chunk_size`.
+    Returns (weights, history) where history holds (loss, seconds) per epoch.
+    """
+    k = features.shape[1]
+    w = np.zeros(k)
+    history = []
+    n = len(features)
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        grad = l2 * w
+        hess = l2 * np.eye(k)
+        for i in range(0, n, chunk_size):
+            x = features[i:i + chunk_size].astype(np.float64)
+            y = results[i:i + chunk_size].astype(np.float64)
+            p = 1.0 / (1.0 + np.exp(-(x @ w)))
+            grad += x.T @ (p - y) / n
+            hess += (x * (p * (1.0 - p))[:, None]).T @ x / n
+        step = np.linalg.solve(hess, grad)
+        w -= step
+        elapsed = time.perf_counter() - start
+        loss, _ = _log_loss(features, results, w, chunk_size)
+        history.append((loss, elapsed))
+        print(f"   epoch {epoch + 1}: log loss {loss:.5f}  ({elapsed:.3f}s)")
+        if np.abs(step).max() < tol:
+            break
+    return w, history
+
+
+def cmd_generate(args):
+    print(f"🎲 Playing {args.games} self-play games...")
+    positions, results = generate_games(args.games, args.epsilon, args.difficulty, args.seed)
+    np.savez(args.output, positions=positions, results=results)
+    print(f"💾 Saved {len(positions)} positions to {args.output}")
+
+
+def cmd_fit(args):
+    positions, results = load_datasets(args.datasets)
+    print(f"📂 Loaded {len(positions)} positions from {len(args.datasets)} file(s)")
+
+    start = time.perf_counter()
+    features = compute_features(positions, args.chunk_size)
+    print(f"🧮 Features computed in {time.perf_counter() - start:.2f}s")
+
+    # Hold out a validation slice to report fit quality
+    order = np.random.default_rng(args.seed).permutation(len(positions))
+    n_val = max(1, int(len(order) * args.validation))
+    val, train = order[:n_val], order[n_val:]
+
+    print(f"📈 Fitting on {len(train)} positions...")
+    w, history = fit_logistic(features[train], results[train], args.epochs, args.chunk_size, args.l2)
+
+    default = np.array([ai.DEFAULT_EVAL_WEIGHTS[t] for t in ai.EVAL_TERMS]) / EVAL_SCALE
+    val_loss, val_acc = _log_loss(features[val], results[val], w, args.chunk_size)
+    base_loss, base_acc = _log_loss(features[val], results[val], default, args.chunk_size)
+    print(f"\n{'':<18}{'val log loss':>14}{'val accuracy':>14}")
+    print(f"{'default weights':<18}{base_loss:>14.5f}{base_acc * 100:>13.1f}%")
+    print(f"{'fitted weights':<18}{val_loss:>14.5f}{val_acc * 100:>13.1f}%")
+    print(f"{'coin flip':<18}{np.log(2):>14.5f}")
+    print(f"Mean time per epoch: {np.mean([t for _, t in history]):.3f}s")
+
+    weights = {term: round(float(v) * EVAL_SCALE, 3) for term, v in zip(ai.EVAL_TERMS, w)}
+    with open(args.output, 'w') as f:
+        json.dump({'weights': weights, 'scale': EVAL_SCALE, 'positions': int(len(train)),
+                   'val_log_loss': val_loss, 'val_accuracy': val_acc}, f, indent=2)
+    print(f"💾 Weights {weights} saved to {args.output}")
+    print("   Re-run fit_probcut.py so the ProbCut regressions match the new scale.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune classic AI evaluation weights")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    gen = sub.add_parser('generate', help="create labelled positions by self-play")
+    gen.add_argument('--games', type=int, default=1000)
+    gen.add_argument('--epsilon', type=float, default=0.2, help="probability of a random move")
+    gen.add_argument('--difficulty', default='medium')
+    gen.add_argument('--output', default='selfplay_positions.npz')
+    gen.add_argument('--seed', type=int, default=None)
+    gen.set_defaults(func=cmd_generate)
+
+    fit = sub.add_parser('fit', help="fit weights from .npz position files")
+    fit.add_argument('datasets', nargs='+')
+    fit.add_argument('--epochs', type=int, default=10)
+    fit.add_argument('--chunk-size', type=int, default=262144)
+    fit.add_argument('--l2', type=float, default=1e-3)
+    fit.add_argument('--validation', type=float, default=0.1, help="fraction held out for reporting")
+    fit.add_argument('--output', default=ai.EVAL_WEIGHTS_FILE)
+    fit.add_argument('--seed', type=int, default=0)
+    fit.set_defaults(func=cmd_fit)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()